@@ -18,6 +18,7 @@ from app.core.config import settings
 from app.core.context import RequestContext
 from app.finance.fin_service import FinService
 from app.finance.sec_service import SecService
+from app.llm.llm_scheduler import LlmPriority, llm_priority
 from app.prompt.prompt_service import PromptService
 from app.utils.modified_langfuse_decorator import observe  # type: ignore
 
@@ -119,13 +120,15 @@ class TickerAgent:
         cfg["configurable"]["_sec_api_key"] = sec_api_key
 
         logger.info("Invoking workflow...")
-        summary = await self.agent.ainvoke(
-            {
-                "symbol": symbol,
-            },
-            config=cfg,
-            stream_mode="values",
-        )
+        # Reports yield the LLM quota to interactive chat.
+        with llm_priority(LlmPriority.BATCH):
+            summary = await self.agent.ainvoke(
+                {
+                    "symbol": symbol,
+                },
+                config=cfg,
+                stream_mode="values",
+            )
 
         logger.info("Returning summary response...")
 
@@ -1,8 +1,10 @@
 from dependency_injector import containers, providers
 from langchain_openai import AzureChatOpenAI
 
+from app.assistant_v2.common.checkpointer import CheckpointerManager
 from app.assistant_v2.primary.controller import AssistantController
 from app.assistant_v2.primary.graph import AssistantGraph
+from app.assistant_v2.primary.intent_router import IntentRouter
 from app.core.config import settings
 from app.llm.llm_wrapper import AzureChatOpenAIWrapper
 from app.prompt.prompt_module import PromptModule
@@ -15,10 +17,35 @@ class AssistantModule(containers.DeclarativeContainer):
         temperature=settings.llm_temperature,
     )
 
-    graph: providers.Provider[AssistantGraph] = providers.Factory(
+    intent_router: providers.Provider[IntentRouter] = providers.Singleton(
+        IntentRouter.from_file,
+        threshold=settings.assistant_intent_router_threshold,
+        margin=settings.assistant_intent_router_margin,
+        shadow_rate=settings.assistant_intent_router_shadow_rate,
+    )
+
+    graph: providers.Provider[AssistantGraph] = providers.Singleton(
         AssistantGraph,
         prompt_srv=PromptModule.prompt_srv,
         llm=llm,
+        intent_router=(
+            intent_router if settings.assistant_intent_router_enabled else None
+        ),
+    )
+
+    checkpointer_manager: providers.Provider[CheckpointerManager] = providers.Singleton(
+        CheckpointerManager,
+        path=settings.assistant_state_path,
+        pool_size=settings.assistant_state_pool_size,
+        max_batch_size=settings.assistant_state_max_batch_size,
+        busy_timeout_ms=settings.assistant_state_busy_timeout_ms,
+        cache_size_kb=settings.assistant_state_cache_size_kb,
+        mmap_size=settings.assistant_state_mmap_size,
+        write_timeout=settings.assistant_state_write_timeout,
+        max_checkpoints_per_thread=settings.assistant_state_max_checkpoints_per_thread,
+        thread_ttl=settings.assistant_state_thread_ttl,
+        compaction_interval=settings.assistant_state_compaction_interval,
+        vacuum_min_free_ratio=settings.assistant_state_vacuum_min_free_ratio,
     )
 
     controller: providers.Provider[AssistantController] = providers.Singleton(
@@ -26,4 +53,5 @@ class AssistantModule(containers.DeclarativeContainer):
         prompt_srv=PromptModule.prompt_srv,
         llm=llm,
         graph=graph,
+        checkpointer_manager=checkpointer_manager,
     )
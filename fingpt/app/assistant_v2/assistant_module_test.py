@@ -0,0 +1,29 @@
+import importlib
+
+import app.assistant_v2.assistant_module as assistant_module
+from app.core.config import settings
+
+
+def test_checkpointer_manager_uses_state_settings(monkeypatch):
+    overrides = {
+        "assistant_state_write_timeout": 5.0,
+        "assistant_state_max_checkpoints_per_thread": 3,
+        "assistant_state_thread_ttl": 60.0,
+        "assistant_state_compaction_interval": 0.0,
+        "assistant_state_vacuum_min_free_ratio": 0.5,
+    }
+    try:
+        with monkeypatch.context() as patch:
+            for name, value in overrides.items():
+                patch.setattr(settings, name, value)
+            # Provider arguments are read from the settings when the module loads.
+            module = importlib.reload(assistant_module).AssistantModule()
+            manager = module.checkpointer_manager()
+    finally:
+        importlib.reload(assistant_module)
+
+    assert manager.write_timeout == 5.0
+    assert manager.max_checkpoints_per_thread == 3
+    assert manager.thread_ttl == 60.0
+    assert manager.compaction_interval == 0.0
+    assert manager.vacuum_min_free_ratio == 0.5
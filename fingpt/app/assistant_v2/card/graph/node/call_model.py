@@ -13,6 +13,7 @@ from app.assistant_v2.constant import (
     PROMPT_SERVICE_KEY,
     THREAD_ID_KEY,
 )
+from app.assistant_v2.util.context_window import window_messages
 from app.assistant_v2.util.misc import build_chain
 from app.core import RequestContext
 from app.core.config import settings
@@ -45,7 +46,9 @@ async def call_model_func(
         prompt_label,
         tool_list,
     )
-    response = await chain_ainvoke(chain, {"messages": messages})
+    response = await chain_ainvoke(
+        chain, {"messages": window_messages(messages, "card.call_model")}
+    )
     output[CardAgentStateFields.MESSAGES] = [response]
     if not response.tool_calls:
         chat_response = ChatRespDto(
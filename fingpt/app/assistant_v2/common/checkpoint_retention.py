@@ -0,0 +1,257 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Sequence, TypeVar
+
+import aiosqlite
+from loguru import logger
+
+if TYPE_CHECKING:
+    from .checkpointer import PooledSqliteSaver
+
+REGISTER_THREADS = (
+    "INSERT OR IGNORE INTO thread_activity (thread_id, updated_at) "
+    "SELECT DISTINCT thread_id, ? FROM checkpoints"
+)
+EXPIRED_THREADS = "SELECT thread_id FROM thread_activity WHERE updated_at < ?"
+DELETE_THREAD_CHECKPOINTS = "DELETE FROM checkpoints WHERE thread_id = ?"
+DELETE_THREAD_WRITES = "DELETE FROM writes WHERE thread_id = ?"
+DELETE_THREAD_ACTIVITY = "DELETE FROM thread_activity WHERE thread_id = ?"
+OLD_CHECKPOINTS = """
+SELECT rowid FROM (
+    SELECT rowid, ROW_NUMBER() OVER (
+        PARTITION BY thread_id ORDER BY thread_ts DESC
+    ) AS position
+    FROM checkpoints
+)
+WHERE position > ?
+"""
+ORPHAN_WRITES = """
+SELECT rowid FROM writes WHERE NOT EXISTS (
+    SELECT 1 FROM checkpoints c
+    WHERE c.thread_id = writes.thread_id AND c.thread_ts = writes.thread_ts
+)
+"""
+DELETE_CHECKPOINT = "DELETE FROM checkpoints WHERE rowid = ?"
+DELETE_WRITE = "DELETE FROM writes WHERE rowid = ?"
+
+# PRAGMA auto_vacuum value of databases that release free pages on demand.
+INCREMENTAL_VACUUM = 2
+
+T = TypeVar("T")
+
+
+@dataclass
+class CompactionStats:
+    threads_expired: int = 0
+    checkpoints_deleted: int = 0
+    writes_deleted: int = 0
+    vacuumed: bool = False
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def bytes_reclaimed(self) -> int:
+        return max(self.bytes_before - self.bytes_after, 0)
+
+
+class CheckpointCompactor:
+    """Applies the checkpoint retention policy and reclaims disk space.
+
+    Only the latest `max_checkpoints_per_thread` checkpoints of a thread are
+    kept, threads without a new checkpoint for `thread_ttl` seconds are
+    dropped, and the free pages are released once they reach
+    `vacuum_min_free_ratio` of the database.
+
+    The rows to delete are found on a reader connection. They are then
+    deleted in transactions of at most `batch_size` rows on the writer, and
+    pages are released `vacuum_pages` at a time. Chat writes queued
+    meanwhile are committed between these steps. A step that takes longer
+    than `timeout` fails the run, and the timeout is capped below the write
+    timeout.
+    """
+
+    def __init__(
+        self,
+        saver: "PooledSqliteSaver",
+        max_checkpoints_per_thread: int = 20,
+        thread_ttl: float = 604800.0,
+        interval: float = 3600.0,
+        vacuum_min_free_ratio: float = 0.2,
+        timeout: Optional[float] = None,
+        batch_size: int = 500,
+        vacuum_pages: int = 1000,
+    ):
+        if max_checkpoints_per_thread < 1:
+            raise ValueError("At least one checkpoint per thread must be kept")
+        self.saver = saver
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.thread_ttl = thread_ttl
+        self.interval = interval
+        self.vacuum_min_free_ratio = vacuum_min_free_ratio
+        max_timeout = saver.write_timeout / 2
+        self.timeout = max_timeout if timeout is None else min(timeout, max_timeout)
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.last_stats: Optional[CompactionStats] = None
+        self.total_bytes_reclaimed = 0
+        self.runs = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.error(f"Checkpoint compaction failed: {e}")
+
+    async def compact(self) -> CompactionStats:
+        stats = CompactionStats(bytes_before=await self._step(self._size))
+        await self._prune(stats)
+        await self._vacuum(stats)
+        await self._step(self._checkpoint_wal)
+        stats.bytes_after = await self._step(self._size)
+        self.last_stats = stats
+        self.total_bytes_reclaimed += stats.bytes_reclaimed
+        self.runs += 1
+        logger.info(
+            f"Checkpoint compaction: expired {stats.threads_expired} threads, "
+            f"deleted {stats.checkpoints_deleted} checkpoints and "
+            f"{stats.writes_deleted} writes, vacuumed={stats.vacuumed}, "
+            f"reclaimed {stats.bytes_reclaimed} bytes"
+        )
+        return stats
+
+    async def _step(self, action: Callable[[aiosqlite.Connection], Awaitable[T]]) -> T:
+        return await self.saver.run_maintenance(action, timeout=self.timeout)
+
+    async def _delete(
+        self,
+        statements: Sequence[str],
+        params: list[tuple],
+    ) -> list[int]:
+        """Run the statements for every row of `params`, in batches. Return
+        the number of rows each statement deleted."""
+        deleted = [0] * len(statements)
+        for start in range(0, len(params), self.batch_size):
+            counts = await self._step(
+                partial(
+                    self._execute, statements, params[start : start + self.batch_size]
+                )
+            )
+            deleted = [total + count for total, count in zip(deleted, counts)]
+        return deleted
+
+    @staticmethod
+    async def _execute(
+        statements: Sequence[str],
+        params: list[tuple],
+        conn: aiosqlite.Connection,
+    ) -> list[int]:
+        counts = []
+        for sql in statements:
+            cursor = await conn.executemany(sql, params)
+            counts.append(cursor.rowcount)
+        await conn.commit()
+        return counts
+
+    @staticmethod
+    async def _select(
+        sql: str,
+        params: tuple,
+        conn: aiosqlite.Connection,
+    ) -> list[tuple]:
+        async with conn.execute(sql, params) as cursor:
+            return [tuple(row) for row in await cursor.fetchall()]
+
+    async def _register_threads(self, conn: aiosqlite.Connection) -> None:
+        await conn.execute(REGISTER_THREADS, (time.time(),))
+        await conn.commit()
+
+    async def _prune(self, stats: CompactionStats) -> None:
+        await self._step(self._register_threads)
+        expired = await self.saver.run_read(
+            partial(self._select, EXPIRED_THREADS, (time.time() - self.thread_ttl,))
+        )
+        checkpoints, writes, _ = await self._delete(
+            [DELETE_THREAD_CHECKPOINTS, DELETE_THREAD_WRITES, DELETE_THREAD_ACTIVITY],
+            expired,
+        )
+        stats.threads_expired = len(expired)
+        stats.checkpoints_deleted += checkpoints
+        stats.writes_deleted += writes
+
+        # Checkpoints written meanwhile are newer, the old ones stay old.
+        old = await self.saver.run_read(
+            partial(self._select, OLD_CHECKPOINTS, (self.max_checkpoints_per_thread,))
+        )
+        (checkpoints,) = await self._delete([DELETE_CHECKPOINT], old)
+        stats.checkpoints_deleted += checkpoints
+        orphans = await self.saver.run_read(partial(self._select, ORPHAN_WRITES, ()))
+        (writes,) = await self._delete([DELETE_WRITE], orphans)
+        stats.writes_deleted += writes
+
+    async def _vacuum(self, stats: CompactionStats) -> None:
+        if await self._step(self._free_ratio) < self.vacuum_min_free_ratio:
+            return
+        auto_vacuum = await self._step(partial(self._pragma, name="auto_vacuum"))
+        if auto_vacuum != INCREMENTAL_VACUUM:
+            logger.warning(
+                f"{self.saver.path} does not use incremental vacuum, its free "
+                "pages are reused but not released until it is vacuumed offline"
+            )
+            return
+        free = None
+        while free != 0:
+            remaining = await self._step(self._release_pages)
+            stats.vacuumed = True
+            if remaining == free:
+                break
+            free = remaining
+
+    async def _release_pages(self, conn: aiosqlite.Connection) -> int:
+        """Release up to `vacuum_pages` free pages, return how many are left."""
+        async with conn.execute(
+            f"PRAGMA incremental_vacuum({self.vacuum_pages})"
+        ) as cursor:
+            await cursor.fetchall()
+        await conn.commit()
+        return await self._pragma(conn, "freelist_count")
+
+    @staticmethod
+    async def _checkpoint_wal(conn: aiosqlite.Connection) -> None:
+        await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    @staticmethod
+    async def _pragma(conn: aiosqlite.Connection, name: str) -> int:
+        async with conn.execute(f"PRAGMA {name}") as cursor:
+            row = await cursor.fetchone()
+        return int(row[0]) if row else 0
+
+    async def _free_ratio(self, conn: aiosqlite.Connection) -> float:
+        page_count = await self._pragma(conn, "page_count")
+        if not page_count:
+            return 0.0
+        return await self._pragma(conn, "freelist_count") / page_count
+
+    async def _size(self, conn: aiosqlite.Connection) -> int:
+        if os.path.exists(self.saver.path):
+            wal = f"{self.saver.path}-wal"
+            return os.path.getsize(self.saver.path) + (
+                os.path.getsize(wal) if os.path.exists(wal) else 0
+            )
+        page_size = await self._pragma(conn, "page_size")
+        return page_size * await self._pragma(conn, "page_count")
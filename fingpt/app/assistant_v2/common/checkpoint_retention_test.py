@@ -0,0 +1,115 @@
+import asyncio
+from typing import TypedDict
+
+import pytest
+from langgraph.graph import END, StateGraph
+
+from app.assistant_v2.common.checkpoint_retention import (
+    INCREMENTAL_VACUUM,
+    CheckpointCompactor,
+)
+from app.assistant_v2.common.checkpointer import CheckpointerManager, PooledSqliteSaver
+
+
+class CounterState(TypedDict):
+    count: int
+
+
+@pytest.fixture
+async def saver(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "state.db"), pool_size=1)
+    yield saver
+    await saver.aclose()
+
+
+async def _run_turns(saver, thread_id: str, turns: int) -> None:
+    workflow = StateGraph(CounterState)
+    workflow.add_node("increment", lambda state: {"count": state["count"] + 1})
+    workflow.set_entry_point("increment")
+    workflow.add_edge("increment", END)
+    agent = workflow.compile().copy(update={"checkpointer": saver})
+    for _ in range(turns):
+        await agent.ainvoke({"count": 0}, {"configurable": {"thread_id": thread_id}})
+
+
+async def _count_checkpoints(saver, thread_id: str) -> int:
+    return len(
+        [c async for c in saver.alist({"configurable": {"thread_id": thread_id}})]
+    )
+
+
+async def test_compact_keeps_latest_checkpoints_per_thread(saver):
+    await _run_turns(saver, "thread-1", 5)
+    await _run_turns(saver, "thread-2", 1)
+    latest = await saver.aget_tuple({"configurable": {"thread_id": "thread-1"}})
+
+    stats = await CheckpointCompactor(saver, max_checkpoints_per_thread=2).compact()
+
+    assert await _count_checkpoints(saver, "thread-1") == 2
+    assert await _count_checkpoints(saver, "thread-2") == 2
+    assert stats.checkpoints_deleted > 0
+    remaining = await saver.aget_tuple({"configurable": {"thread_id": "thread-1"}})
+    assert remaining.config == latest.config
+
+
+async def test_compact_expires_idle_threads_and_vacuums(saver):
+    await _run_turns(saver, "thread-1", 20)
+
+    stats = await CheckpointCompactor(
+        saver, thread_ttl=-1, vacuum_min_free_ratio=0.0
+    ).compact()
+
+    assert stats.threads_expired == 1
+    assert stats.vacuumed
+    assert stats.bytes_reclaimed > 0
+    assert await _count_checkpoints(saver, "thread-1") == 0
+
+
+async def test_compact_deletes_in_batches_between_writes(saver, mocker):
+    await _run_turns(saver, "thread-1", 5)
+    checkpoints = await _count_checkpoints(saver, "thread-1")
+    maintenance = mocker.spy(saver, "run_maintenance")
+    compactor = CheckpointCompactor(
+        saver, max_checkpoints_per_thread=1, batch_size=2, vacuum_min_free_ratio=0.0
+    )
+
+    compaction = asyncio.create_task(compactor.compact())
+    await asyncio.sleep(0)
+    await _run_turns(saver, "thread-2", 1)
+    stats = await compaction
+
+    assert stats.checkpoints_deleted == checkpoints - 1
+    assert await _count_checkpoints(saver, "thread-1") == 1
+    latest = await saver.aget_tuple({"configurable": {"thread_id": "thread-2"}})
+    assert latest.checkpoint["channel_values"]["count"] == 1
+    # Every batch of old checkpoints is its own step on the writer.
+    assert maintenance.call_count > (checkpoints - 1) // 2
+
+
+async def test_new_database_releases_free_pages_incrementally(saver):
+    await saver.setup()
+
+    async with saver.conn.execute("PRAGMA auto_vacuum") as cursor:
+        assert (await cursor.fetchone())[0] == INCREMENTAL_VACUUM
+
+
+async def test_compactor_timeout_stays_below_write_timeout(saver):
+    assert CheckpointCompactor(saver, timeout=600).timeout < saver.write_timeout
+    assert CheckpointCompactor(saver).timeout < saver.write_timeout
+
+
+async def test_compactor_rejects_empty_retention(saver):
+    with pytest.raises(ValueError):
+        CheckpointCompactor(saver, max_checkpoints_per_thread=0)
+
+
+async def test_manager_runs_and_stops_compactor(tmp_path):
+    manager = CheckpointerManager(str(tmp_path / "state.db"), compaction_interval=60)
+
+    await manager.start()
+    compactor = manager.compactor
+    assert compactor is not None and compactor._task is not None
+
+    await manager.stop()
+    assert compactor._task is None
+    assert manager.compactor is None
@@ -0,0 +1,465 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.aiosqlite import AsyncSqliteSaver
+from langgraph.checkpoint.base import (
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+)
+from loguru import logger
+
+from app.entity.error import CheckpointWriterError
+
+from .checkpoint_retention import CheckpointCompactor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    thread_ts TEXT NOT NULL,
+    parent_ts TEXT,
+    checkpoint BLOB,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, thread_ts)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    thread_ts TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    value BLOB,
+    PRIMARY KEY (thread_id, thread_ts, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS thread_activity (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+"""
+
+INSERT_CHECKPOINT = (
+    "INSERT OR REPLACE INTO checkpoints "
+    "(thread_id, thread_ts, parent_ts, checkpoint, metadata) VALUES (?, ?, ?, ?, ?)"
+)
+INSERT_WRITES = (
+    "INSERT OR REPLACE INTO writes "
+    "(thread_id, thread_ts, task_id, idx, channel, value) VALUES (?, ?, ?, ?, ?, ?)"
+)
+TOUCH_THREAD = (
+    "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)"
+)
+
+IN_MEMORY_PATHS = ("", ":memory:")
+
+Statement = tuple[str, list[tuple[Any, ...]]]
+MaintenanceAction = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+@dataclass
+class PendingWrite:
+    future: asyncio.Future = field(repr=False)
+    statements: list[Statement] = field(default_factory=list)
+    # Maintenance actions run alone on the writer connection and manage
+    # their own transactions.
+    action: Optional[MaintenanceAction] = None
+
+
+STOP_WRITER = None
+
+
+class PooledSqliteSaver(AsyncSqliteSaver):
+    """AsyncSqliteSaver with a reader connection pool and a group-commit writer.
+
+    Reads borrow one of `pool_size` connections, so concurrent turns no longer
+    queue behind a single connection. Writes are serialised through one writer
+    connection: every write queued while the previous commit is running is
+    flushed in a single transaction, and callers only return once their write
+    is committed, so a turn always reads its own checkpoints.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        pool_size: int = 4,
+        max_batch_size: int = 64,
+        busy_timeout_ms: int = 5000,
+        cache_size_kb: int = 16384,
+        mmap_size: int = 268435456,
+        write_timeout: float = 30.0,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(conn=aiosqlite.connect(path), serde=serde)
+        self.path = path
+        # Every connection to an in-memory database is a separate database.
+        self.pool_size = 0 if path in IN_MEMORY_PATHS else pool_size
+        self.max_batch_size = max_batch_size
+        self.write_timeout = write_timeout
+        self.pragmas = (
+            f"PRAGMA synchronous=NORMAL;"
+            f"PRAGMA busy_timeout={busy_timeout_ms};"
+            f"PRAGMA cache_size=-{cache_size_kb};"
+            f"PRAGMA temp_store=MEMORY;"
+            f"PRAGMA mmap_size={mmap_size};"
+        )
+        self._readers: asyncio.Queue[AsyncSqliteSaver] = asyncio.Queue()
+        self._reader_conns: list[aiosqlite.Connection] = []
+        self._write_queue: asyncio.Queue[Union[PendingWrite, None]] = asyncio.Queue()
+        self._writer_task: Optional[asyncio.Task] = None
+        self.batches_committed = 0
+        self.writes_committed = 0
+
+    async def setup(self) -> None:
+        async with self.lock:
+            if self.is_setup:
+                return
+            if not self.conn.is_alive():
+                await self.conn
+            await self.conn.executescript(
+                # Only takes effect on a new file, before the tables exist.
+                "PRAGMA auto_vacuum=INCREMENTAL;"
+                f"PRAGMA journal_mode=WAL;{self.pragmas}{SCHEMA}"
+            )
+            await self.conn.commit()
+
+            for _ in range(self.pool_size):
+                conn = await aiosqlite.connect(self.path)
+                await conn.executescript(f"{self.pragmas}PRAGMA query_only=ON;")
+                self._reader_conns.append(conn)
+                reader = AsyncSqliteSaver(conn, serde=self.serde)
+                reader.is_setup = True
+                self._readers.put_nowait(reader)
+            if not self.pool_size:
+                reader = AsyncSqliteSaver(self.conn, serde=self.serde)
+                reader.is_setup = True
+                self._readers.put_nowait(reader)
+
+            self._writer_task = asyncio.create_task(self._write_loop())
+            self.is_setup = True
+
+    async def aclose(self) -> None:
+        async with self.lock:
+            if not self.is_setup:
+                return
+            try:
+                writer_task = self._writer_task
+                if writer_task is not None and not writer_task.done():
+                    self._write_queue.put_nowait(STOP_WRITER)
+                    await asyncio.gather(writer_task, return_exceptions=True)
+            finally:
+                for conn in self._reader_conns:
+                    await conn.close()
+                await self.conn.close()
+                self._reader_conns = []
+                self._readers = asyncio.Queue()
+                self._writer_task = None
+                self.is_setup = False
+
+    async def __aexit__(self, *args: Any) -> Optional[bool]:
+        await self.aclose()
+        return None
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[AsyncSqliteSaver]:
+        await self.setup()
+        reader = await self._readers.get()
+        try:
+            yield reader
+        finally:
+            self._readers.put_nowait(reader)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        async with self._reader() as reader:
+            return await reader.aget_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        # Materialise the rows so the reader goes back to the pool even when
+        # the caller stops iterating early.
+        async with self._reader() as reader:
+            checkpoints = [
+                checkpoint
+                async for checkpoint in reader.alist(
+                    config, filter=filter, before=before, limit=limit
+                )
+            ]
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        await self._write(
+            [
+                (
+                    INSERT_CHECKPOINT,
+                    [
+                        (
+                            thread_id,
+                            checkpoint["id"],
+                            config["configurable"].get("thread_ts"),
+                            self.serde.dumps(checkpoint),
+                            self.serde.dumps(metadata),
+                        )
+                    ],
+                ),
+                (TOUCH_THREAD, [(thread_id, time.time())]),
+            ]
+        )
+        return {
+            "configurable": {
+                "thread_id": config["configurable"]["thread_id"],
+                "thread_ts": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+    ) -> None:
+        await self._write(
+            [
+                (
+                    INSERT_WRITES,
+                    [
+                        (
+                            str(config["configurable"]["thread_id"]),
+                            str(config["configurable"]["thread_ts"]),
+                            task_id,
+                            idx,
+                            channel,
+                            self.serde.dumps(value),
+                        )
+                        for idx, (channel, value) in enumerate(writes)
+                    ],
+                )
+            ]
+        )
+
+    async def _write(self, statements: list[Statement]) -> None:
+        await self._enqueue(statements=statements)
+
+    async def run_maintenance(
+        self,
+        action: MaintenanceAction,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Run `action` on the writer connection, between two write batches."""
+        return await self._enqueue(action=action, timeout=timeout)
+
+    async def run_read(self, action: MaintenanceAction) -> Any:
+        """Run `action` on a pooled reader connection."""
+        async with self._reader() as reader:
+            return await action(reader.conn)
+
+    async def _enqueue(
+        self,
+        statements: Optional[list[Statement]] = None,
+        action: Optional[MaintenanceAction] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        await self.setup()
+        if self._writer_task is None or self._writer_task.done():
+            raise CheckpointWriterError("Checkpoint writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait(
+            PendingWrite(future, statements=statements or [], action=action)
+        )
+        timeout = timeout or self.write_timeout
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise CheckpointWriterError(
+                f"Checkpoint write not committed after {timeout}s"
+            )
+
+    async def _write_loop(self) -> None:
+        batch: list[PendingWrite] = []
+        next_write: Optional[PendingWrite] = None
+        stopping = False
+        try:
+            while not stopping:
+                write = next_write or await self._write_queue.get()
+                next_write = None
+                if write is STOP_WRITER:
+                    break
+                if write.action is not None:
+                    batch = [write]
+                    await self._run_action(write)
+                    batch = []
+                    continue
+                batch = [write]
+                while (
+                    len(batch) < self.max_batch_size and not self._write_queue.empty()
+                ):
+                    write = self._write_queue.get_nowait()
+                    if write is STOP_WRITER:
+                        stopping = True
+                        break
+                    if write.action is not None:
+                        next_write = write
+                        break
+                    batch.append(write)
+                try:
+                    await self._flush(batch)
+                except Exception as e:
+                    logger.error(f"Checkpoint writer failed to flush batch: {e}")
+                    self._fail(batch, e)
+                batch = []
+        finally:
+            error = CheckpointWriterError("Checkpoint writer stopped")
+            self._fail(batch, error)
+            if next_write is not None:
+                self._fail([next_write], error)
+            while not self._write_queue.empty():
+                write = self._write_queue.get_nowait()
+                if write is not STOP_WRITER:
+                    self._fail([write], error)
+
+    @staticmethod
+    def _fail(batch: list[PendingWrite], error: BaseException) -> None:
+        for write in batch:
+            if not write.future.done():
+                write.future.set_exception(error)
+
+    async def _run_action(self, write: PendingWrite) -> None:
+        try:
+            result = await write.action(self.conn)  # type: ignore
+        except Exception as e:
+            logger.error(f"Checkpoint maintenance failed: {e}")
+            try:
+                await self.conn.rollback()
+            except Exception as rollback_error:
+                logger.error(f"Checkpoint rollback failed: {rollback_error}")
+            self._fail([write], e)
+            return
+        if not write.future.done():
+            write.future.set_result(result)
+
+    async def _flush(self, batch: list[PendingWrite]) -> None:
+        try:
+            for write in batch:
+                for sql, params in write.statements:
+                    await self.conn.executemany(sql, params)
+            await self.conn.commit()
+        except Exception as e:
+            logger.warning(f"Checkpoint batch of {len(batch)} failed: {e}")
+            try:
+                await self.conn.rollback()
+            except Exception as rollback_error:
+                logger.error(f"Checkpoint rollback failed: {rollback_error}")
+                self._fail(batch, e)
+                return
+            if len(batch) > 1:
+                # Retry one by one so a single bad write does not fail the others.
+                for write in batch:
+                    await self._flush([write])
+            else:
+                self._fail(batch, e)
+            return
+
+        self.batches_committed += 1
+        self.writes_committed += len(batch)
+        for write in batch:
+            if not write.future.done():
+                write.future.set_result(None)
+
+
+class CheckpointerManager:
+    """Owns the process-wide checkpointer for the assistant state database."""
+
+    def __init__(
+        self,
+        path: str,
+        pool_size: int = 4,
+        max_batch_size: int = 64,
+        busy_timeout_ms: int = 5000,
+        cache_size_kb: int = 16384,
+        mmap_size: int = 268435456,
+        write_timeout: float = 30.0,
+        max_checkpoints_per_thread: int = 20,
+        thread_ttl: float = 604800.0,
+        compaction_interval: float = 3600.0,
+        vacuum_min_free_ratio: float = 0.2,
+    ):
+        self.path = path
+        self.pool_size = pool_size
+        self.max_batch_size = max_batch_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.write_timeout = write_timeout
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.thread_ttl = thread_ttl
+        self.compaction_interval = compaction_interval
+        self.vacuum_min_free_ratio = vacuum_min_free_ratio
+        self.compactor: Optional[CheckpointCompactor] = None
+        self._saver: Optional[PooledSqliteSaver] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> PooledSqliteSaver:
+        async with self._lock:
+            if self._saver is None:
+                saver = PooledSqliteSaver(
+                    self.path,
+                    pool_size=self.pool_size,
+                    max_batch_size=self.max_batch_size,
+                    busy_timeout_ms=self.busy_timeout_ms,
+                    cache_size_kb=self.cache_size_kb,
+                    mmap_size=self.mmap_size,
+                    write_timeout=self.write_timeout,
+                )
+                await saver.setup()
+                self._saver = saver
+                self.compactor = CheckpointCompactor(
+                    saver,
+                    max_checkpoints_per_thread=self.max_checkpoints_per_thread,
+                    thread_ttl=self.thread_ttl,
+                    interval=self.compaction_interval,
+                    vacuum_min_free_ratio=self.vacuum_min_free_ratio,
+                )
+                if self.compaction_interval > 0:
+                    self.compactor.start()
+            return self._saver
+
+    async def stop(self) -> None:
+        async with self._lock:
+            if self.compactor is not None:
+                await self.compactor.stop()
+                self.compactor = None
+            if self._saver is not None:
+                await self._saver.aclose()
+                self._saver = None
+
+    async def get_checkpointer(self) -> PooledSqliteSaver:
+        if self._saver is not None:
+            return self._saver
+        return await self.start()
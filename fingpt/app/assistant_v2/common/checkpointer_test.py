@@ -0,0 +1,104 @@
+import asyncio
+from typing import TypedDict
+
+import pytest
+from langgraph.graph import END, StateGraph
+
+from app.assistant_v2.common.checkpointer import CheckpointerManager, PooledSqliteSaver
+from app.entity.error import CheckpointWriterError
+
+
+class CounterState(TypedDict):
+    count: int
+
+
+def _build_graph():
+    workflow = StateGraph(CounterState)
+    workflow.add_node("increment", lambda state: {"count": state["count"] + 1})
+    workflow.set_entry_point("increment")
+    workflow.add_edge("increment", END)
+    return workflow.compile()
+
+
+@pytest.fixture
+async def saver(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "state.db"), pool_size=2)
+    yield saver
+    await saver.aclose()
+
+
+async def test_saver_round_trip(saver):
+    agent = _build_graph().copy(update={"checkpointer": saver})
+    config = {"configurable": {"thread_id": "thread-1"}}
+
+    await agent.ainvoke({"count": 1}, config)
+    snapshot = await agent.aget_state(config)
+
+    assert snapshot.values == {"count": 2}
+    assert len([c async for c in saver.alist(config)]) > 0
+
+
+async def test_saver_batches_concurrent_writes(saver):
+    agent = _build_graph().copy(update={"checkpointer": saver})
+
+    await asyncio.gather(
+        *[
+            agent.ainvoke({"count": i}, {"configurable": {"thread_id": f"t-{i}"}})
+            for i in range(10)
+        ]
+    )
+
+    for i in range(10):
+        snapshot = await agent.aget_state({"configurable": {"thread_id": f"t-{i}"}})
+        assert snapshot.values == {"count": i + 1}
+    assert saver.batches_committed < saver.writes_committed
+
+
+async def test_saver_uses_wal_mode(saver):
+    await saver.setup()
+    async with saver.conn.execute("PRAGMA journal_mode") as cursor:
+        row = await cursor.fetchone()
+
+    assert row[0] == "wal"
+
+
+async def test_saver_alist_releases_reader_on_early_exit(saver):
+    agent = _build_graph().copy(update={"checkpointer": saver})
+    config = {"configurable": {"thread_id": "thread-1"}}
+    await agent.ainvoke({"count": 1}, config)
+
+    for _ in range(saver.pool_size + 1):
+        async for _checkpoint in saver.alist(config):
+            break
+
+    assert saver._readers.qsize() == saver.pool_size
+
+
+async def test_saver_write_fails_when_writer_stopped(saver, mocker):
+    await saver.setup()
+    mocker.patch.object(saver.conn, "executemany", side_effect=Exception("boom"))
+    mocker.patch.object(saver.conn, "rollback", side_effect=Exception("closed"))
+    config = {"configurable": {"thread_id": "t", "thread_ts": "1"}}
+
+    with pytest.raises(Exception, match="boom"):
+        await saver.aput_writes(config, [("channel", 1)], "task")
+    assert not saver._writer_task.done()
+
+    saver._writer_task.cancel()
+    with pytest.raises(CheckpointWriterError):
+        await saver.aput_writes(config, [("channel", 1)], "task")
+
+
+async def test_manager_reuses_and_closes_saver(tmp_path):
+    manager = CheckpointerManager(str(tmp_path / "state.db"), pool_size=1)
+
+    first = await manager.get_checkpointer()
+    second = await manager.get_checkpointer()
+    assert first is second
+    assert first.is_setup
+
+    await manager.stop()
+    assert not first.is_setup
+    restarted = await manager.get_checkpointer()
+    assert restarted is not first
+    await manager.stop()
@@ -0,0 +1,100 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Mapping, Optional, TypeVar
+
+from app.assistant_v2.constant import PREFETCH_KEY
+from app.bb_retail.request import (
+    list_accounts,
+    list_contacts,
+    list_term_deposit_accounts,
+)
+from app.core.context import RequestContext
+from app.core.metrics import record_cache
+from app.entity import BbQueryPaging
+from app.entity.bb_api import BbApiConfig
+
+T = TypeVar("T")
+
+CONTACTS_PREFETCH = "contacts"
+ACCOUNTS_PREFETCH = "accounts"
+TERM_DEPOSIT_ACCOUNTS_PREFETCH = "term_deposit_accounts"
+
+CONTACTS_PAGING = BbQueryPaging(fr0m=0, size=500)
+
+# What the delegated agent fetches first, keyed by the delegation tool.
+PREFETCH_PLANS: dict[str, tuple[str, ...]] = {
+    "ToTransferAgent": (CONTACTS_PREFETCH, ACCOUNTS_PREFETCH),
+    "ToTermDepositAgent": (TERM_DEPOSIT_ACCOUNTS_PREFETCH, ACCOUNTS_PREFETCH),
+}
+
+
+class PrefetchCache:
+    """Request-scoped futures of Backbase calls started ahead of the tools.
+
+    Each prefetched result is handed to the first tool asking for it; a failed
+    prefetch is retried by the tool, and whatever is left unused at the end of
+    the turn is cancelled.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.used = 0
+
+    def start(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> None:
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.ensure_future(fetch())
+            self.started += 1
+
+    def start_for(
+        self,
+        tool: str,
+        ctx: RequestContext,
+        api_config: BbApiConfig,
+    ) -> None:
+        fetchers: dict[str, Callable[[], Awaitable[Any]]] = {
+            CONTACTS_PREFETCH: lambda: list_contacts(
+                ctx=ctx, config=api_config, params=CONTACTS_PAGING
+            ),
+            ACCOUNTS_PREFETCH: lambda: list_accounts(ctx=ctx, config=api_config),
+            TERM_DEPOSIT_ACCOUNTS_PREFETCH: lambda: list_term_deposit_accounts(
+                ctx=ctx, config=api_config
+            ),
+        }
+        for key in PREFETCH_PLANS.get(tool, ()):
+            self.start(key, fetchers[key])
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            try:
+                result = await task
+                self.used += 1
+                record_cache("prefetch", True)
+                return result
+            except Exception:
+                pass
+        record_cache("prefetch", False)
+        return await fetch()
+
+    def cancel_unused(self) -> int:
+        unused = 0
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Retrieve it so a failed prefetch is not reported as unhandled.
+                task.exception()
+            unused += 1
+        self._tasks.clear()
+        return unused
+
+
+async def get_prefetched(
+    config_data: Mapping[str, Any],
+    key: str,
+    fetch: Callable[[], Awaitable[T]],
+) -> T:
+    prefetch: Optional[PrefetchCache] = config_data.get(PREFETCH_KEY)
+    if prefetch is None:
+        return await fetch()
+    return await prefetch.get(key, fetch)
@@ -0,0 +1,72 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.assistant_v2.common.prefetch import (
+    ACCOUNTS_PREFETCH,
+    CONTACTS_PREFETCH,
+    TERM_DEPOSIT_ACCOUNTS_PREFETCH,
+    PrefetchCache,
+    get_prefetched,
+)
+from app.assistant_v2.constant import PREFETCH_KEY
+
+
+async def test_prefetched_result_is_used_once():
+    prefetch = PrefetchCache()
+    prefetch.start(ACCOUNTS_PREFETCH, AsyncMock(return_value=["prefetched"]))
+    fetch = AsyncMock(return_value=["fresh"])
+
+    assert await prefetch.get(ACCOUNTS_PREFETCH, fetch) == ["prefetched"]
+    assert await prefetch.get(ACCOUNTS_PREFETCH, fetch) == ["fresh"]
+    assert prefetch.used == 1
+    fetch.assert_awaited_once()
+
+
+async def test_failed_prefetch_is_fetched_again():
+    prefetch = PrefetchCache()
+    prefetch.start(ACCOUNTS_PREFETCH, AsyncMock(side_effect=Exception("EBP down")))
+    fetch = AsyncMock(return_value=["fresh"])
+
+    assert await prefetch.get(ACCOUNTS_PREFETCH, fetch) == ["fresh"]
+    assert prefetch.used == 0
+
+
+async def test_cancel_unused_prefetches():
+    prefetch = PrefetchCache()
+    prefetch.start(CONTACTS_PREFETCH, lambda: asyncio.sleep(10))
+    prefetch.start(ACCOUNTS_PREFETCH, AsyncMock(side_effect=Exception("EBP down")))
+    await asyncio.sleep(0)
+
+    assert prefetch.cancel_unused() == 2
+    assert prefetch.cancel_unused() == 0
+
+
+async def test_start_for_follows_prefetch_plan():
+    prefetch = PrefetchCache()
+    with (
+        patch(
+            "app.assistant_v2.common.prefetch.list_term_deposit_accounts",
+            AsyncMock(return_value=["td"]),
+        ),
+        patch(
+            "app.assistant_v2.common.prefetch.list_accounts",
+            AsyncMock(return_value=["account"]),
+        ),
+    ):
+        prefetch.start_for("ToTermDepositAgent", MagicMock(), MagicMock())
+        prefetch.start_for("ToCardAgent", MagicMock(), MagicMock())
+        fetch = AsyncMock()
+
+        assert await prefetch.get(TERM_DEPOSIT_ACCOUNTS_PREFETCH, fetch) == ["td"]
+        assert await prefetch.get(ACCOUNTS_PREFETCH, fetch) == ["account"]
+    assert prefetch.started == 2
+    fetch.assert_not_awaited()
+
+
+@pytest.mark.parametrize("config_data", [{}, {PREFETCH_KEY: PrefetchCache()}])
+async def test_get_prefetched_without_prefetch(config_data):
+    fetch = AsyncMock(return_value=["fresh"])
+
+    assert await get_prefetched(config_data, ACCOUNTS_PREFETCH, fetch) == ["fresh"]
@@ -0,0 +1,97 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from app.entity.error import ThreadBusyError, TurnSupersededError
+
+
+@dataclass
+class ThreadTurns:
+    running: bool = False
+    waiters: deque[asyncio.Future] = field(default_factory=deque)
+
+
+class ThreadLockRegistry:
+    """Serialises chat turns of the same thread.
+
+    At most `max_waiters` turns may queue behind the running one, each for at
+    most `timeout` seconds; otherwise `ThreadBusyError` is raised. With
+    `supersede`, a new turn replaces the queued ones, which fail with
+    `TurnSupersededError`, so a double-tapped request runs only once.
+    """
+
+    def __init__(
+        self,
+        max_waiters: int = 1,
+        timeout: float = 30.0,
+        supersede: bool = False,
+    ):
+        self.max_waiters = max_waiters
+        self.timeout = timeout
+        self.supersede = supersede
+        self._turns: dict[str, ThreadTurns] = {}
+        self.rejected = 0
+        self.superseded = 0
+
+    def is_running(self, thread_id: str) -> bool:
+        turns = self._turns.get(thread_id)
+        return turns is not None and turns.running
+
+    @asynccontextmanager
+    async def acquire(self, thread_id: str) -> AsyncIterator[None]:
+        await self._acquire(thread_id)
+        try:
+            yield
+        finally:
+            self._release(thread_id)
+
+    async def _acquire(self, thread_id: str) -> None:
+        turns = self._turns.setdefault(thread_id, ThreadTurns())
+        if not turns.running and not turns.waiters:
+            turns.running = True
+            return
+
+        if self.supersede:
+            while turns.waiters:
+                waiter = turns.waiters.popleft()
+                if not waiter.done():
+                    self.superseded += 1
+                    waiter.set_exception(
+                        TurnSupersededError(
+                            f"Turn superseded by a newer request on thread {thread_id}"
+                        )
+                    )
+        if len(turns.waiters) >= self.max_waiters:
+            self.rejected += 1
+            raise ThreadBusyError(f"Too many turns queued on thread {thread_id}")
+
+        waiter = asyncio.get_running_loop().create_future()
+        turns.waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled() and not waiter.exception():
+                # The turn was handed over just as we gave up, pass it on.
+                self._release(thread_id)
+            elif waiter in turns.waiters:
+                turns.waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise ThreadBusyError(
+                    f"Timed out waiting for the running turn on thread {thread_id}"
+                )
+            raise
+
+    def _release(self, thread_id: str) -> None:
+        turns = self._turns.get(thread_id)
+        if turns is None:
+            return
+        while turns.waiters:
+            waiter = turns.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        turns.running = False
+        del self._turns[thread_id]
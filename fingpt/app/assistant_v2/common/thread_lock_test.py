@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.assistant_v2.common.thread_lock import ThreadLockRegistry
+from app.entity.error import ThreadBusyError, TurnSupersededError
+
+
+async def test_turns_of_a_thread_run_in_order():
+    registry = ThreadLockRegistry(max_waiters=2)
+    order = []
+
+    async def turn(name: str):
+        async with registry.acquire("thread-1"):
+            order.append(f"{name}-start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name}-end")
+
+    await asyncio.gather(turn("a"), turn("b"), turn("c"))
+
+    assert order == ["a-start", "a-end", "b-start", "b-end", "c-start", "c-end"]
+    assert not registry.is_running("thread-1")
+
+
+async def test_other_threads_are_not_blocked():
+    registry = ThreadLockRegistry(max_waiters=0)
+
+    async with registry.acquire("thread-1"):
+        async with registry.acquire("thread-2"):
+            assert registry.is_running("thread-2")
+
+
+async def test_full_queue_is_rejected():
+    registry = ThreadLockRegistry(max_waiters=0)
+
+    async with registry.acquire("thread-1"):
+        with pytest.raises(ThreadBusyError):
+            async with registry.acquire("thread-1"):
+                pass
+
+    assert registry.rejected == 1
+
+
+async def test_waiting_turn_times_out():
+    registry = ThreadLockRegistry(max_waiters=1, timeout=0.01)
+
+    async with registry.acquire("thread-1"):
+        with pytest.raises(ThreadBusyError):
+            async with registry.acquire("thread-1"):
+                pass
+
+    async with registry.acquire("thread-1"):
+        assert registry.is_running("thread-1")
+
+
+async def test_newer_turn_supersedes_queued_turn():
+    registry = ThreadLockRegistry(max_waiters=1, supersede=True)
+    release = asyncio.Event()
+    ran = []
+
+    async def turn(name: str):
+        async with registry.acquire("thread-1"):
+            ran.append(name)
+            if name == "running":
+                await release.wait()
+
+    running = asyncio.create_task(turn("running"))
+    await asyncio.sleep(0)
+    older = asyncio.create_task(turn("older"))
+    await asyncio.sleep(0)
+    newer = asyncio.create_task(turn("newer"))
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(running, older, newer, return_exceptions=True)
+
+    assert isinstance(results[1], TurnSupersededError)
+    assert ran == ["running", "newer"]
+    assert registry.superseded == 1
@@ -10,3 +10,4 @@ EBP_EDGE_DOMAIN_KEY = "ebp_edge_domain"
 USER_QUERY_KEY = "user_query"
 USER_CHOICE_ID_KEY = "user_choice_id"
 LAST_SUMMARY_MESSAGE_ID_KEY = "last_summary_message_id"
+PREFETCH_KEY = "prefetch"
@@ -1,3 +1,5 @@
+import asyncio
+import random
 from typing import Any, Optional, no_type_check
 
 from langchain_core.messages import AIMessage
@@ -15,13 +17,15 @@ from app.assistant_v2.primary.constant import (
     AGAINST_POLICY_CONTENT,
     PRIMARY_ASSISTANT_TOOLS,
 )
+from app.assistant_v2.util.context_window import window_messages
 from app.core.config import settings
 from app.core.context import RequestContext
 from app.entity.chat_response import ChatRespAction, ChatRespDto
 from app.prompt.prompt_service import PromptService
 
 from ...assistant.base_agent_state import BaseAgentStateFields
-from ..util.handle_ai_message import verify_ai_message
+from ..util.handle_ai_message import bound_tool_names, verify_ai_message
+from .intent_router import IntentDecision, IntentRouter
 from .state import AssistantConfig, AssistantState, AssistantStateFields
 
 
@@ -30,11 +34,15 @@ class Assistant:
         self,
         prompt_srv: PromptService,
         llm: AzureChatOpenAI,
+        intent_router: Optional[IntentRouter] = None,
     ) -> None:
         self.prompt_srv = prompt_srv
         self.llm = llm
+        self.intent_router = intent_router
         self.ready = False
         self.agent = None
+        self._audits: set[asyncio.Task] = set()
+        self.tool_names = bound_tool_names(PRIMARY_ASSISTANT_TOOLS)
 
     @staticmethod
     async def build_agent(  # type: ignore
@@ -88,16 +96,31 @@ class Assistant:
             logger.info("There is a response to be sent. Skip LLM.")
             need_llm = False
 
+        result = None
+        decision: Optional[IntentDecision] = None
+        if need_llm and self.intent_router is not None:
+            decision = self.intent_router.route(state[AssistantStateFields.MESSAGES])
+            if decision is not None and decision.confident:
+                logger.info(
+                    f"Intent router delegated to {decision.tool} "
+                    f"({decision.source}, {decision.confidence:.2f}). Skip LLM."
+                )
+                result = self.intent_router.to_message(decision)
+                need_llm = False
+                if random.random() < self.intent_router.shadow_rate:
+                    self._start_audit(state, config, decision)
+
         logger.info(f"Enter {type(self).__name__} decision loop...")
         retry_counter = 0
-        result = None
         while need_llm:
             logger.debug(f"Invoking {type(self).__name__}...")
             agent = await self.get_agent(ctx)
             try:
                 result = await agent.ainvoke(  # type: ignore
                     {
-                        "messages": state[AssistantStateFields.MESSAGES],
+                        "messages": window_messages(
+                            state[AssistantStateFields.MESSAGES], type(self).__name__
+                        ),
                     },
                     RunnableConfig(configurable=dict(config)),
                 )
@@ -116,7 +139,12 @@ class Assistant:
                 raise e
 
             new_message = verify_ai_message(
-                ctx, state, result, retry_counter, maximum_tool_calls=1
+                ctx,
+                state,
+                result,
+                retry_counter,
+                maximum_tool_calls=1,
+                expected_tools=self.tool_names,
             )
             retry_counter += 1
 
@@ -136,8 +164,43 @@ class Assistant:
                         metadata=None,
                     )
                     config_data[PENDING_RESPONSE_KEY].append(resp)
+                if decision is not None:
+                    self.intent_router.record_llm_decision(decision, result)
                 break
 
         return {
             AssistantStateFields.MESSAGES: [result] if result else [],
         }
+
+    def _start_audit(
+        self,
+        state: AssistantState,
+        config: AssistantConfig,
+        decision: IntentDecision,
+    ) -> None:
+        task = asyncio.create_task(self._audit(state, config, decision))
+        self._audits.add(task)
+        task.add_done_callback(self._audits.discard)
+
+    @no_type_check
+    async def _audit(
+        self,
+        state: AssistantState,
+        config: AssistantConfig,
+        decision: IntentDecision,
+    ) -> None:
+        """Ask the LLM anyway to measure how often the router disagrees."""
+        ctx = config.get(CONFIGURABLE_CONTEXT_KEY, {})[CONTEXT_KEY]
+        try:
+            agent = await self.get_agent(ctx)
+            result = await agent.ainvoke(
+                {
+                    "messages": window_messages(
+                        state[AssistantStateFields.MESSAGES], type(self).__name__
+                    )
+                },
+                RunnableConfig(configurable=dict(config)),
+            )
+            self.intent_router.record_llm_decision(decision, result)
+        except Exception as e:
+            ctx.logger().error(f"Intent router audit failed: {e}")
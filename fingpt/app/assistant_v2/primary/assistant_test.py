@@ -11,6 +11,7 @@ from app.assistant_v2.constant import (
     PENDING_RESPONSE_KEY,
 )
 from app.assistant_v2.primary.assistant import Assistant
+from app.assistant_v2.primary.intent_router import IntentRouter
 from app.assistant_v2.primary.state import AssistantState, AssistantStateFields
 from app.core.context import RequestContext
 
@@ -107,3 +108,53 @@ async def test_call_with_exception():
     with patch.object(assistant, "get_agent", return_value=llm):
         with pytest.raises(Exception, match="Test exception"):
             await assistant(state, config)
+
+
+@pytest.mark.asyncio
+async def test_call_with_intent_router_skips_llm():
+    llm = AsyncMock()
+    router = IntentRouter([("send money to my mom", "ToTransferAgent")])
+    assistant = Assistant(MagicMock(), llm, intent_router=router)
+    state = AssistantState(
+        {AssistantStateFields.MESSAGES: [HumanMessage(content="Send $100 to Sara")]}
+    )
+    config = {
+        CONFIGURABLE_CONTEXT_KEY: {
+            PENDING_RESPONSE_KEY: [],
+            CONTEXT_KEY: MagicMock(RequestContext),
+        }
+    }
+
+    with patch.object(assistant, "get_agent", return_value=llm):
+        result = await assistant(state, config)
+
+    message = result[AssistantStateFields.MESSAGES][0]
+    assert message.tool_calls[0]["name"] == "ToTransferAgent"
+    llm.ainvoke.assert_not_called()
+    assert router.stats.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_call_with_intent_router_fallback_records_llm_decision():
+    llm = AsyncMock()
+    router = IntentRouter([("send money to my mom", "ToTransferAgent")])
+    assistant = Assistant(MagicMock(), llm, intent_router=router)
+    state = AssistantState(
+        {AssistantStateFields.MESSAGES: [HumanMessage(content="What can you do?")]}
+    )
+    config = {
+        CONFIGURABLE_CONTEXT_KEY: {
+            PENDING_RESPONSE_KEY: [],
+            CONTEXT_KEY: MagicMock(RequestContext),
+        }
+    }
+    llm.ainvoke.return_value = AIMessage(content="I can help with banking.")
+
+    with patch.object(assistant, "get_agent", return_value=llm):
+        result = await assistant(state, config)
+
+    assert (
+        result[AssistantStateFields.MESSAGES][0].content == "I can help with banking."
+    )
+    assert router.stats.hits == 0
+    assert router.stats.compared == 1
@@ -107,6 +107,11 @@ GUARDRAIL_ERROR_CONTENT = (
     "Please try again with a different input."
 )
 
+TECHNICAL_GLITCH_CONTENT = (
+    "There is a technical glitch and I couldn't complete your request. "
+    "Let's try again!"
+)
+
 TRANSACTION_START_ROUTE = Literal[
     "filter_transaction",
     "select_beneficiary_node",
@@ -147,3 +152,12 @@ CARD_CONTROLLER_TOOLS: list[Any] = [
     ToCardFlow,
     CompleteOrEscalateTool,
 ]
+
+# A choice made in a workflow subgraph resumes at the node entering it, without
+# asking the controller that delegated to the subgraph again.
+SUBGRAPH_ENTER_NODES: dict[str, str] = {
+    TRANSACTION_AGENT_NODE: ENTER_TRANSACTION_REPORT_GENERATOR_SUBGRAPH_NODE,
+    TRANSFER_AGENT_NODE: ENTER_MONEY_TRANSFER_SUBGRAPH_NODE,
+    TERM_DEPOSIT_CONTROLLER_NODE: ENTER_TERM_DEPOSIT_SUBGRAPH_NODE,
+    CARD_CONTROLLER_NODE: ENTER_CARD_SUBGRAPH_NODE,
+}
@@ -1,16 +1,22 @@
+import asyncio
 import traceback
+from contextvars import ContextVar
+from dataclasses import asdict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, AsyncIterator, Optional, get_args
 
 from fastapi import HTTPException
 from langchain_core.messages import HumanMessage, RemoveMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_openai import AzureChatOpenAI
-from langgraph.checkpoint.aiosqlite import AsyncSqliteSaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import START
 from langgraph.graph.state import CompiledStateGraph
 
 from app.assistant_v2.common.base_agent_config import extract_bb_retail_api_config
+from app.assistant_v2.common.checkpointer import CheckpointerManager
+from app.assistant_v2.common.prefetch import PrefetchCache
+from app.assistant_v2.common.thread_lock import ThreadLockRegistry
 from app.assistant_v2.constant import (
     CONFIGURABLE_CONTEXT_KEY,
     CONTEXT_KEY,
@@ -18,18 +24,26 @@ from app.assistant_v2.constant import (
     EBP_COOKIE_KEY,
     EBP_EDGE_DOMAIN_KEY,
     PENDING_RESPONSE_KEY,
+    PREFETCH_KEY,
     THREAD_ID_KEY,
     USER_CHOICE_ID_KEY,
     USER_QUERY_KEY,
 )
-from app.assistant_v2.primary.constant import GUARDRAIL_ERROR_CONTENT
+from app.assistant_v2.primary.constant import (
+    GUARDRAIL_ERROR_CONTENT,
+    SUBGRAPH_ENTER_NODES,
+    TECHNICAL_GLITCH_CONTENT,
+    DialogController,
+)
 from app.assistant_v2.primary.graph import AssistantGraph
+from app.assistant_v2.primary.rolling_summary import compute_rolling_summary
 from app.assistant_v2.term_deposit.graph.node import present_offer_node
 from app.assistant_v2.term_deposit.graph.utils import update_term_deposit
 from app.assistant_v2.term_deposit.state import TermDepositAgentStateFields
 from app.bb_retail.request import list_td_products, list_term_deposit_accounts
 from app.core.config import settings
 from app.core.context import RequestContext
+from app.core.metrics import MetricsCallbackHandler
 from app.entity import (
     ApiHeader,
     AssistantStatus,
@@ -42,18 +56,47 @@ from app.entity import (
     ChatRespDto,
     ChatRespMetadataForOffer,
     ChatRespMetadataType,
+    ChatRespUsage,
+    ChatRespUsageEntry,
+    ChatStreamEvent,
+    ChatStreamEventType,
     OfferProduct,
     OfferReqDataForTermDeposit,
     OfferType,
 )
-from app.entity.error import GuardrailInputError, UnauthorizedError
+from app.entity.error import (
+    GuardrailInputError,
+    ThreadBusyError,
+    TurnSupersededError,
+    UnauthorizedError,
+)
 
 # from app.nemo_config.guardrails import guardrails_input
 from app.entity.offer import OfferReq, OfferResp, OfferRespDataForCard
+from app.llm.usage import LlmUsage, RequestUsage, thread_usage, usage_scope
 from app.prompt.prompt_service import PromptService
 from app.utils.modified_langfuse_decorator import observe  # type: ignore
 
-from .state import AssistantConfig, AssistantStateFields
+from .state import AssistantConfig, AssistantStateFields, agent_state_key_map
+
+# Set by `chat_stream` so that agent runs publish their events to the stream.
+_stream_events: ContextVar[Optional[asyncio.Queue]] = ContextVar(
+    "stream_events", default=None
+)
+
+
+def _usage_entry(usage: LlmUsage) -> ChatRespUsageEntry:
+    return ChatRespUsageEntry(**asdict(usage))
+
+
+def _usage_summary(usage: RequestUsage, thread_id: str) -> ChatRespUsage:
+    thread = thread_usage.get(thread_id)
+    return ChatRespUsage(
+        total=_usage_entry(usage.total),
+        by_node={k: _usage_entry(v) for k, v in usage.by_node.items()},
+        by_prompt={k: _usage_entry(v) for k, v in usage.by_prompt.items()},
+        thread=_usage_entry(thread) if thread else None,
+    )
 
 
 class AssistantController:
@@ -62,15 +105,34 @@ class AssistantController:
         prompt_srv: PromptService,
         llm: AzureChatOpenAI,
         graph: AssistantGraph,
+        checkpointer_manager: CheckpointerManager,
         debug: bool = False,
+        thread_locks: Optional[ThreadLockRegistry] = None,
     ) -> None:
         self.llm = llm
         self.prompt_srv = prompt_srv
         self.debug = debug
         self.graph = graph
+        self.checkpointer_manager = checkpointer_manager
+        self.thread_locks = thread_locks or ThreadLockRegistry(
+            max_waiters=settings.assistant_thread_max_waiters,
+            timeout=settings.assistant_thread_wait_timeout,
+            supersede=settings.assistant_thread_supersede,
+        )
+        self._background: set[asyncio.Task] = set()
+
+    async def stop(self) -> None:
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
 
-    async def _get_workflow(self):
-        return await self.graph.get_graph()
+    async def _get_agent(
+        self,
+        ctx: RequestContext,
+        checkpointer: BaseCheckpointSaver,
+    ) -> CompiledStateGraph:
+        compiled = await self.graph.get_compiled_graph(ctx)
+        return compiled.copy(update={"checkpointer": checkpointer})
 
     def _get_config(self) -> RunnableConfig:
         return RunnableConfig(
@@ -87,9 +149,175 @@ class AssistantController:
                     ebp_cookie=None,
                     ebp_edge_domain=None,
                 )
-            )
+            ),
+            callbacks=[MetricsCallbackHandler()],
         )
 
+    def _start_prefetch(
+        self,
+        ctx: RequestContext,
+        cfg: RunnableConfig,
+        user_query: str,
+    ) -> PrefetchCache:
+        """Start the Backbase calls of the agent the query is likely routed to.
+
+        They run while the primary assistant and controller LLMs are thinking,
+        the tools pick them up through the config.
+        """
+        prefetch = PrefetchCache()
+        config_data = cfg[CONFIGURABLE_CONTEXT_KEY]  # type: ignore
+        config_data[PREFETCH_KEY] = prefetch
+        router = self.graph.intent_router
+        if not settings.assistant_prefetch_enabled or router is None:
+            return prefetch
+
+        decision = router.classify(user_query)
+        if (
+            decision.tool is not None
+            and decision.confidence >= settings.assistant_prefetch_min_confidence
+        ):
+            prefetch.start_for(
+                decision.tool, ctx, extract_bb_retail_api_config(config_data)
+            )
+        return prefetch
+
+    def _schedule_summary(
+        self,
+        ctx: RequestContext,
+        agent: CompiledStateGraph,
+        cfg: RunnableConfig,
+        thread_id: str,
+    ) -> None:
+        if not settings.assistant_rolling_summary_enabled:
+            return
+        task = asyncio.create_task(self._refresh_summary(ctx, agent, cfg, thread_id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh_summary(
+        self,
+        ctx: RequestContext,
+        agent: CompiledStateGraph,
+        cfg: RunnableConfig,
+        thread_id: str,
+    ) -> None:
+        """Update the rolling summary of a thread once its response is sent.
+
+        The summary is only stored while no turn runs on the thread and none
+        has replaced it meanwhile; otherwise the next exit node covers it.
+        """
+        logger = ctx.logger()
+        try:
+            update = await compute_rolling_summary(agent, cfg)
+            if update is None or self.thread_locks.is_running(str(thread_id)):
+                return
+            async with self.thread_locks.acquire(str(thread_id)):
+                snapshot = await agent.aget_state(cfg)
+                current = snapshot.values.get(
+                    AssistantStateFields.ROLLING_SUMMARY_MESSAGE_ID
+                )
+                if current != update.based_on:
+                    return
+                await agent.aupdate_state(cfg, update.values, as_node=START)
+            logger.debug(f"Rolling summary of thread {thread_id} updated")
+        except Exception as e:
+            logger.error(f"Failed to update rolling summary: {e}")
+
+    async def _invoke_agent(
+        self,
+        agent: CompiledStateGraph,
+        input: Optional[dict[str, Any]],
+        config: RunnableConfig,
+    ) -> None:
+        events = _stream_events.get()
+        if events is None:
+            await agent.ainvoke(
+                input=input,
+                config=config,
+                stream_mode="values",
+                debug=self.debug,
+            )
+            return
+
+        streamed_nodes = get_args(DialogController)
+        async for event in agent.astream_events(
+            input,
+            config,
+            version="v2",
+            stream_mode="values",
+            debug=self.debug,
+        ):
+            node = event.get("metadata", {}).get("langgraph_node")
+            if event["event"] == "on_chain_start" and event["name"] == node:
+                events.put_nowait(
+                    ChatStreamEvent(
+                        event=ChatStreamEventType.PROGRESS,
+                        data={"node": node},
+                    )
+                )
+            elif event["event"] == "on_chat_model_stream" and node in streamed_nodes:
+                content = event["data"]["chunk"].content
+                if content and isinstance(content, str):
+                    events.put_nowait(
+                        ChatStreamEvent(
+                            event=ChatStreamEventType.TOKEN,
+                            data={
+                                "node": node,
+                                "run_id": event["run_id"],
+                                "content": content,
+                            },
+                        )
+                    )
+
+    async def chat_stream(
+        self,
+        ctx: RequestContext,
+        header: ApiHeader,
+        req: ChatReqDto,
+    ) -> AsyncIterator[ChatStreamEvent]:
+        """Run `chat` and yield its progress, tokens and final response.
+
+        Tokens are forwarded as soon as the dialog agents produce them. A retried
+        LLM attempt starts a new `run_id`, so clients should reset the partial
+        text on a new run. The last event is always the final `ChatRespDto` or
+        an error.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        token = _stream_events.set(events)
+        try:
+            task = asyncio.create_task(self.chat(ctx, header, req))
+        finally:
+            _stream_events.reset(token)
+
+        try:
+            while not task.done() or not events.empty():
+                getter = asyncio.ensure_future(events.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+
+            response = task.result()
+            yield ChatStreamEvent(
+                event=ChatStreamEventType.RESPONSE,
+                data=response.model_dump(mode="json"),
+            )
+        except HTTPException as e:
+            yield ChatStreamEvent(
+                event=ChatStreamEventType.ERROR,
+                data={"status_code": e.status_code, "detail": e.detail},
+            )
+        except Exception as e:
+            ctx.logger().error(f"Assistant stream error: {e}")
+            yield ChatStreamEvent(
+                event=ChatStreamEventType.ERROR,
+                data={"status_code": 500, "detail": str(e)},
+            )
+        finally:
+            if not task.done():
+                task.cancel()
+
     @observe()
     async def chat(
         self,
@@ -99,14 +327,39 @@ class AssistantController:
     ) -> ChatRespDto:
         logger = ctx.logger()
         logger.info(f'Received user input: "{req}"')
-        state_storage = settings.assistant_state_path
-        memory = AsyncSqliteSaver.from_conn_string(state_storage)
-        agent: Optional[CompiledStateGraph] = None
+        thread_id = str(req.metadata.thread_id)
         try:
-            logger.debug("Compling agent with memory...")
-            agent = (await self._get_workflow()).compile(
-                checkpointer=memory,
+            async with self.thread_locks.acquire(thread_id):
+                with usage_scope() as usage:
+                    response = await self._chat(ctx, header, req)
+                if settings.llm_usage_in_response:
+                    response.usage = _usage_summary(usage, thread_id)
+                return response
+        except ThreadBusyError as e:
+            logger.warn(f"Thread busy: {e}")
+            raise HTTPException(
+                status_code=429,
+                detail="Another request for this conversation is in progress",
+            )
+        except TurnSupersededError as e:
+            logger.info(f"Turn superseded: {e}")
+            raise HTTPException(
+                status_code=409,
+                detail="The request was superseded by a newer one",
             )
+
+    async def _chat(
+        self,
+        ctx: RequestContext,
+        header: ApiHeader,
+        req: ChatReqDto,
+    ) -> ChatRespDto:
+        logger = ctx.logger()
+        memory = await self.checkpointer_manager.get_checkpointer()
+        agent: Optional[CompiledStateGraph] = None
+        try:
+            logger.debug("Attaching memory to the compiled agent...")
+            agent = await self._get_agent(ctx, memory)
             if req.action == ChatReqAction.QUERY:
                 return await self._query(
                     ctx,
@@ -191,26 +444,34 @@ class AssistantController:
                 USER_QUERY_KEY: req_data.user_query,
             }
         )
-        logger.debug("Clear WAIT_FOR_CHOICE state if it is set...")
-        await agent.aupdate_state(
-            config=cfg,
-            values={
-                AssistantStateFields.STATUS: AssistantStatus.WAIT_FOR_QUERY,
-            },
-            as_node=START,
-        )
-        logger.debug("Invoking agent...")
-        await agent.ainvoke(
-            input={
-                AssistantStateFields.MESSAGES: [HumanMessage(req_data.user_query)],
-            },
-            config=cfg,
-            stream_mode="values",
-            debug=self.debug,
-        )
+        prefetch = self._start_prefetch(ctx, cfg, req_data.user_query)
+        try:
+            logger.debug("Clear WAIT_FOR_CHOICE state if it is set...")
+            await agent.aupdate_state(
+                config=cfg,
+                values={
+                    AssistantStateFields.STATUS: AssistantStatus.WAIT_FOR_QUERY,
+                },
+                as_node=START,
+            )
+            logger.debug("Invoking agent...")
+            await self._invoke_agent(
+                agent,
+                input={
+                    AssistantStateFields.MESSAGES: [HumanMessage(req_data.user_query)],
+                },
+                config=cfg,
+            )
+        finally:
+            unused = prefetch.cancel_unused()
+            logger.debug(
+                f"Prefetch: started {prefetch.started}, used {prefetch.used}, "
+                f"dropped {unused}"
+            )
         config_data: AssistantConfig = cfg.get(CONFIGURABLE_CONTEXT_KEY, {})
         response: ChatRespDto = config_data[PENDING_RESPONSE_KEY].pop()
         response.thread_id = req_data.thread_id
+        self._schedule_summary(ctx, agent, cfg, req_data.thread_id)
         logger.info("Returning response...")
         return response
 
@@ -252,23 +513,50 @@ class AssistantController:
                 metadata=None,
             )
 
-        logger.debug("Resuming assistant...")
-        await agent.ainvoke(
-            input={
-                AssistantStateFields.MESSAGES: [
-                    HumanMessage("Great!"),
-                ],
-            },
-            config=cfg,
-            stream_mode="values",
-            debug=self.debug,
-        )
+        resume_from = self._choice_resume_node(state)
+        if resume_from is not None:
+            logger.debug(f"Resuming the waiting subgraph after {resume_from}...")
+            await agent.aupdate_state(
+                cfg,
+                {AssistantStateFields.STATUS: AssistantStatus.WAIT_FOR_CHOICE},
+                as_node=resume_from,
+            )
+            await self._invoke_agent(agent, input=None, config=cfg)
+        else:
+            logger.debug("Resuming assistant...")
+            await self._invoke_agent(
+                agent,
+                input={
+                    AssistantStateFields.MESSAGES: [
+                        HumanMessage("Great!"),
+                    ],
+                },
+                config=cfg,
+            )
         config_data: AssistantConfig = cfg.get(CONFIGURABLE_CONTEXT_KEY, {})
         response: ChatRespDto = config_data[PENDING_RESPONSE_KEY].pop()
         response.thread_id = req_data.thread_id
+        self._schedule_summary(ctx, agent, cfg, req_data.thread_id)
         logger.info("Returning response...")
         return response
 
+    @staticmethod
+    def _choice_resume_node(state: dict[str, Any]) -> Optional[str]:
+        """The node after which a choice resumes its subgraph, skipping the
+        controller LLM that would only delegate to the subgraph again."""
+        if not settings.assistant_choice_fast_path_enabled:
+            return None
+        if state.get(AssistantStateFields.STATUS) != AssistantStatus.WAIT_FOR_CHOICE:
+            return None
+        controller_stack = state.get(AssistantStateFields.CONTROLLER_STACK) or []
+        if not controller_stack or controller_stack[-1] not in SUBGRAPH_ENTER_NODES:
+            return None
+        controller = controller_stack[-1]
+        agent_state = state.get(agent_state_key_map[controller]) or {}
+        if not agent_state.get(AssistantStateFields.RESUME_NODE):
+            return None
+        return SUBGRAPH_ENTER_NODES[controller]
+
     async def _get_offer(
         self,
         ctx: RequestContext,
@@ -386,15 +674,14 @@ Earn points on every purchase for great rewards.
             as_node=START,
         )
         logger.debug("Invoking agent...")
-        await agent.ainvoke(
+        await self._invoke_agent(
+            agent,
             input={
                 AssistantStateFields.MESSAGES: [
                     HumanMessage(str(config_data[USER_QUERY_KEY])),
                 ],
             },
             config=cfg,
-            stream_mode="values",
-            debug=self.debug,
         )
         config_data: AssistantConfig = cfg.get(CONFIGURABLE_CONTEXT_KEY, {})
         response: ChatRespDto = config_data[PENDING_RESPONSE_KEY].pop()
@@ -405,11 +692,19 @@ Earn points on every purchase for great rewards.
     async def _reset_state(
         self,
         ctx: RequestContext,
-        agent: CompiledStateGraph,
+        agent: Optional[CompiledStateGraph],
         cfg: RunnableConfig,
         thread_id: str,
     ) -> ChatRespDto:
         logger = ctx.logger()
+        if agent is None:
+            logger.error("Agent is not available, skip resetting state.")
+            return ChatRespDto(
+                action=ChatRespAction.SHOW_REPLY,
+                thread_id=thread_id,
+                response=TECHNICAL_GLITCH_CONTENT,
+                metadata=None,
+            )
         logger.info("Resetting agent state...")
         current_state = await agent.aget_state(config=cfg)
         messages = current_state.values.get(AssistantStateFields.MESSAGES, [])
@@ -430,10 +725,7 @@ Earn points on every purchase for great rewards.
         response = ChatRespDto(
             action=ChatRespAction.SHOW_REPLY,
             thread_id=thread_id,
-            response=(
-                "There is a technical glitch and I couldn't complete your request. "
-                "Let's try again!"
-            ),
+            response=TECHNICAL_GLITCH_CONTENT,
             metadata=None,
         )
         logger.info("Returning response...")
@@ -3,38 +3,59 @@ from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi import HTTPException
+from langchain_core.messages import AIMessageChunk
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.pregel import StateSnapshot
 
+from app.assistant_v2.common.checkpointer import CheckpointerManager
+from app.assistant_v2.common.prefetch import PrefetchCache
+from app.assistant_v2.common.thread_lock import ThreadLockRegistry
 from app.assistant_v2.constant import (
     CONFIGURABLE_CONTEXT_KEY,
     CONTEXT_KEY,
     LLM_MODEL_KEY,
 )
+from app.assistant_v2.primary.constant import (
+    ENTER_MONEY_TRANSFER_SUBGRAPH_NODE,
+    TRANSFER_AGENT_NODE,
+)
 from app.assistant_v2.primary.controller import AssistantController
 from app.assistant_v2.primary.graph import AssistantGraph
+from app.assistant_v2.primary.intent_router import IntentRouter
+from app.assistant_v2.primary.rolling_summary import RollingSummaryUpdate
 from app.assistant_v2.primary.state import AssistantConfig, AssistantStateFields
 from app.assistant_v2.transfer.state import TransferAgentStateFields
 from app.core import RequestContext
+from app.core.config import settings
 from app.entity import (
     ApiHeader,
+    AssistantStatus,
     ChatReqAction,
     ChatReqDto,
     ChatReqMetadataForChoice,
     ChatReqMetadataForQuery,
     ChatReqMetadataType,
     ChatRespDto,
+    ChatStreamEventType,
     Contact,
     UnauthorizedError,
 )
 from app.entity.chat_request import ChatReqMetadataForOffer
 from app.entity.chat_response import ChatRespAction
 from app.entity.offer import OfferProduct, OfferReq, OfferReqDataForCard, OfferType
+from app.llm.usage import record_usage
+
+
+@pytest.fixture
+async def checkpointer_manager(tmp_path):
+    manager = CheckpointerManager(str(tmp_path / "state.db"), pool_size=1)
+    yield manager
+    await manager.stop()
 
 
 @pytest.fixture
-def controller(mocker, agent_config, prompt_service):
+def controller(mocker, agent_config, prompt_service, checkpointer_manager):
     llm_service = agent_config.get(CONFIGURABLE_CONTEXT_KEY, {}).get(LLM_MODEL_KEY)
     assistant_graph = AssistantGraph(prompt_service, llm_service)
     mocked_config = RunnableConfig(
@@ -62,7 +83,9 @@ def controller(mocker, agent_config, prompt_service):
         CompiledStateGraph, "aupdate_state", AsyncMock(return_value=None)
     )
     mocker.patch.object(AssistantController, "_get_config", return_value=mocked_config)
-    controller = AssistantController(prompt_service, llm_service, assistant_graph, True)
+    controller = AssistantController(
+        prompt_service, llm_service, assistant_graph, checkpointer_manager, True
+    )
     return controller
 
 
@@ -86,6 +109,42 @@ async def test_chat_query(mocker, agent_config, controller, mock_guardrails_pass
     assert response.metadata is None
 
 
+@pytest.mark.asyncio
+async def test_chat_reports_llm_usage(
+    mocker, agent_config, controller, mock_guardrails_pass
+):
+    mocker.patch.object(settings, "llm_usage_in_response", True)
+
+    async def ainvoke(*args, **kwargs):
+        record_usage(
+            deployment="gpt-4o",
+            prompt="router",
+            node="primary_agent",
+            thread_id="usage-thread",
+            prompt_tokens=100,
+            completion_tokens=20,
+            latency=0.1,
+        )
+
+    mocker.patch.object(CompiledStateGraph, "ainvoke", side_effect=ainvoke)
+    ctx = agent_config.get(CONFIGURABLE_CONTEXT_KEY, {}).get(CONTEXT_KEY)
+    request = ChatReqDto(
+        action=ChatReqAction.QUERY,
+        metadata=ChatReqMetadataForQuery(
+            type=ChatReqMetadataType.QUERY_DATA,
+            thread_id="usage-thread",
+            user_query="Tell me about Tesla",
+        ),
+    )
+
+    response = await controller.chat(ctx, ApiHeader(cookie="c", token="t"), request)
+
+    assert response.usage.total.calls == 1
+    assert response.usage.by_node["primary_agent"].prompt_tokens == 100
+    assert response.usage.by_prompt["router"].completion_tokens == 20
+    assert response.usage.thread.calls >= 1
+
+
 @pytest.mark.asyncio
 async def test_chat_make_choice(mocker, agent_config, controller):
     mocker.patch.object(CompiledStateGraph, "ainvoke", AsyncMock(return_value=None))
@@ -123,6 +182,57 @@ async def test_chat_make_choice(mocker, agent_config, controller):
     assert response.metadata is None
 
 
+@pytest.mark.asyncio
+async def test_chat_make_choice_resumes_waiting_subgraph(
+    mocker, agent_config, controller
+):
+    ainvoke = mocker.patch.object(
+        CompiledStateGraph, "ainvoke", AsyncMock(return_value=None)
+    )
+    snapshot_state = StateSnapshot(
+        values={
+            AssistantStateFields.STATUS: AssistantStatus.WAIT_FOR_CHOICE,
+            AssistantStateFields.CONTROLLER_STACK: [TRANSFER_AGENT_NODE],
+            AssistantStateFields.TRANSFER_AGENT_STATE: {
+                TransferAgentStateFields.RESUME_NODE: "select_contact_node",
+            },
+        },
+        next=(),
+        config=agent_config,
+        metadata={},
+        created_at="now",
+    )
+    mocker.patch.object(
+        CompiledStateGraph, "aget_state", AsyncMock(return_value=snapshot_state)
+    )
+    ctx = agent_config.get(CONFIGURABLE_CONTEXT_KEY, {}).get(CONTEXT_KEY)
+    request = ChatReqDto(
+        action=ChatReqAction.MAKE_CHOICE,
+        metadata=ChatReqMetadataForChoice(
+            type=ChatReqMetadataType.CHOICE_DATA,
+            thread_id="12345",
+            choice_id="123",
+        ),
+    )
+
+    response = await controller.chat(ctx, ApiHeader(cookie="c", token="t"), request)
+
+    assert response.response == "This is a fake response"
+    update = CompiledStateGraph.aupdate_state.call_args
+    assert update.kwargs["as_node"] == ENTER_MONEY_TRANSFER_SUBGRAPH_NODE
+    assert ainvoke.call_args.kwargs["input"] is None
+
+
+def test_choice_resume_node_requires_waiting_subgraph():
+    state = {
+        AssistantStateFields.STATUS: AssistantStatus.WAIT_FOR_CHOICE,
+        AssistantStateFields.CONTROLLER_STACK: [TRANSFER_AGENT_NODE],
+        AssistantStateFields.TRANSFER_AGENT_STATE: {},
+    }
+    assert AssistantController._choice_resume_node(state) is None
+    assert AssistantController._choice_resume_node({}) is None
+
+
 # @pytest.mark.asyncio
 # async def test_guardrail_error(mocker, agent_config, controller, mock_guardrails_fail):
 #     mocker.patch.object(CompiledStateGraph, "ainvoke", AsyncMock(return_value=None))
@@ -174,11 +284,10 @@ async def test_get_offer_credit_card():
     header = ApiHeader(token="test_token", cookie="test_cookie")
 
     # Create controller instance
-    controller = AssistantController(prompt_srv, llm, graph)
+    controller = AssistantController(prompt_srv, llm, graph, MagicMock())
 
-    # Mock the get_graph method
-    controller._get_workflow = AsyncMock(return_value=MagicMock())
-    controller._get_workflow.return_value.compile = MagicMock(return_value=agent)
+    # Mock the compiled graph lookup
+    controller._get_agent = AsyncMock(return_value=agent)
 
     # Prepare test data
     req_data = ChatReqMetadataForOffer(
@@ -211,3 +320,155 @@ async def test_get_offer_credit_card():
     assert "No annual fee" in result.response
     assert "10,000 Bonus Points" in result.response
     assert "Complementary Travel Insurance" in result.response
+
+
+@pytest.mark.asyncio
+async def test_chat_returns_glitch_when_graph_unavailable(
+    mocker, agent_config, controller
+):
+    mocker.patch.object(
+        controller.graph,
+        "get_compiled_graph",
+        AsyncMock(side_effect=Exception("Langfuse is down")),
+    )
+    ctx = agent_config.get(CONFIGURABLE_CONTEXT_KEY, {}).get(CONTEXT_KEY)
+    header = ApiHeader(cookie="cookie", token="access_token")
+    request = ChatReqDto(
+        action=ChatReqAction.QUERY,
+        metadata=ChatReqMetadataForQuery(
+            type=ChatReqMetadataType.QUERY_DATA,
+            thread_id="12345",
+            user_query="Hello",
+        ),
+    )
+
+    response = await controller.chat(ctx, header, request)
+
+    assert response.action == ChatRespAction.SHOW_REPLY
+    assert response.thread_id == "12345"
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_query(mocker, agent_config, controller):
+    async def fake_events(*args, **kwargs):
+        yield {
+            "event": "on_chain_start",
+            "name": "PRIMARY_ASSISTANT",
+            "run_id": "1",
+            "metadata": {"langgraph_node": "PRIMARY_ASSISTANT"},
+            "data": {},
+        }
+        yield {
+            "event": "on_chat_model_stream",
+            "name": "AzureChatOpenAI",
+            "run_id": "2",
+            "metadata": {"langgraph_node": "PRIMARY_ASSISTANT"},
+            "data": {"chunk": AIMessageChunk(content="Hello")},
+        }
+        yield {
+            "event": "on_chat_model_stream",
+            "name": "AzureChatOpenAI",
+            "run_id": "3",
+            "metadata": {"langgraph_node": "return_control_node"},
+            "data": {"chunk": AIMessageChunk(content="internal summary")},
+        }
+
+    mocker.patch.object(CompiledStateGraph, "astream_events", fake_events)
+    ctx = agent_config.get(CONFIGURABLE_CONTEXT_KEY, {}).get(CONTEXT_KEY)
+    header = ApiHeader(cookie="cookie", token="access_token")
+    request = ChatReqDto(
+        action=ChatReqAction.QUERY,
+        metadata=ChatReqMetadataForQuery(
+            type=ChatReqMetadataType.QUERY_DATA,
+            thread_id="12345",
+            user_query="Hello",
+        ),
+    )
+
+    events = [event async for event in controller.chat_stream(ctx, header, request)]
+
+    assert [event.event for event in events] == [
+        ChatStreamEventType.PROGRESS,
+        ChatStreamEventType.TOKEN,
+        ChatStreamEventType.RESPONSE,
+    ]
+    assert events[1].data["content"] == "Hello"
+    assert events[-1].data["response"] == "This is a fake response"
+    assert events[-1].data["thread_id"] == "12345"
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_reports_http_errors(mocker, agent_config, controller):
+    mocker.patch.object(
+        controller,
+        "chat",
+        AsyncMock(side_effect=HTTPException(status_code=401, detail="Invalid")),
+    )
+    ctx = agent_config.get(CONFIGURABLE_CONTEXT_KEY, {}).get(CONTEXT_KEY)
+    header = ApiHeader(cookie="cookie", token="access_token")
+    request = ChatReqDto(
+        action=ChatReqAction.QUERY,
+        metadata=ChatReqMetadataForQuery(thread_id="12345", user_query="Hello"),
+    )
+
+    events = [event async for event in controller.chat_stream(ctx, header, request)]
+
+    assert len(events) == 1
+    assert events[0].event == ChatStreamEventType.ERROR
+    assert events[0].data["status_code"] == 401
+
+
+@pytest.mark.asyncio
+async def test_chat_rejects_concurrent_turn_on_same_thread(agent_config, controller):
+    controller.thread_locks = ThreadLockRegistry(max_waiters=0)
+    ctx = agent_config.get(CONFIGURABLE_CONTEXT_KEY, {}).get(CONTEXT_KEY)
+    header = ApiHeader(cookie="cookie", token="access_token")
+    request = ChatReqDto(
+        action=ChatReqAction.QUERY,
+        metadata=ChatReqMetadataForQuery(thread_id="12345", user_query="Hello"),
+    )
+
+    async with controller.thread_locks.acquire("12345"):
+        with pytest.raises(HTTPException) as exc_info:
+            await controller.chat(ctx, header, request)
+
+    assert exc_info.value.status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_query_prefetches_for_predicted_route(mocker, agent_config, controller):
+    controller.graph.intent_router = IntentRouter([])
+    start_for = mocker.patch.object(PrefetchCache, "start_for")
+    cancel_unused = mocker.patch.object(PrefetchCache, "cancel_unused", return_value=0)
+    ctx = agent_config.get(CONFIGURABLE_CONTEXT_KEY, {}).get(CONTEXT_KEY)
+    agent = AsyncMock()
+
+    await controller._query(
+        ctx,
+        agent,
+        ApiHeader(cookie="cookie", token="access_token"),
+        ChatReqMetadataForQuery(thread_id="12345", user_query="Send $100 to Sara"),
+    )
+
+    assert start_for.call_args.args[0] == "ToTransferAgent"
+    cancel_unused.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_refresh_summary_skips_busy_thread(mocker, agent_config, controller):
+    update = RollingSummaryUpdate(based_on=None, values={"rolling_summary": "s"})
+    mocker.patch(
+        "app.assistant_v2.primary.controller.compute_rolling_summary",
+        AsyncMock(return_value=update),
+    )
+    ctx = agent_config.get(CONFIGURABLE_CONTEXT_KEY, {}).get(CONTEXT_KEY)
+    agent = AsyncMock()
+    agent.aget_state.return_value = MagicMock(values={})
+
+    async with controller.thread_locks.acquire("12345"):
+        await controller._refresh_summary(ctx, agent, {}, "12345")
+    agent.aupdate_state.assert_not_called()
+
+    await controller._refresh_summary(ctx, agent, {}, "12345")
+    agent.aupdate_state.assert_awaited_once()
+    assert agent.aupdate_state.call_args.args[1] == update.values
@@ -1,7 +1,10 @@
-from typing import get_args, no_type_check
+import asyncio
+import time
+from typing import Optional, get_args, no_type_check
 
 from langchain_openai import AzureChatOpenAI
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import tools_condition
 
 from app.assistant_v2.card.graph.card_graph import CardGraph
@@ -28,6 +31,8 @@ from app.assistant_v2.transfer.money_transfer_agent import MoneyTransferAgent
 from app.assistant_v2.transfer.tool.to_transfer_money_flow import ToMoneyTransferFlow
 from app.assistant_v2.util.complete_or_escalate import CompleteOrEscalateTool
 from app.assistant_v2.util.create_tool import create_tool_node_with_fallback
+from app.core.config import settings
+from app.core.context import RequestContext
 from app.prompt.prompt_service import PromptService
 
 from .assistant import Assistant
@@ -74,6 +79,7 @@ from .constant import (
     TRANSFER_AGENT_TOOLS_NODE,
     DialogController,
 )
+from .intent_router import IntentRouter
 from .state import AssistantConfig, AssistantState, AssistantStateFields
 from .term_deposit_controller import TermDepositController
 from .tool.to_card_flow import ToCardFlow
@@ -88,9 +94,91 @@ class AssistantGraph:
         self,
         prompt_srv: PromptService,
         llm: AzureChatOpenAI,
+        intent_router: Optional[IntentRouter] = None,
     ):
         self.prompt_srv = prompt_srv
         self.llm = llm
+        self.intent_router = intent_router
+        self._compiled_graph: Optional[CompiledStateGraph] = None
+        self._prompt_versions: dict[str, Optional[int]] = {}
+        self._versions_checked_at = 0.0
+        self._compile_lock = asyncio.Lock()
+
+    @staticmethod
+    def _agent_prompts() -> list[tuple[str, str]]:
+        """Prompts memoized by the agent nodes for the lifetime of the graph."""
+        return [
+            (settings.assistant_primary_prompt, settings.assistant_primary_label),
+            (
+                settings.ticker_report_symbol_identifier_agent_prompt,
+                settings.ticker_report_symbol_identifier_agent_label,
+            ),
+            (
+                settings.transaction_report_agent_prompt,
+                settings.transaction_report_agent_label,
+            ),
+            (settings.money_transfer_agent_prompt, settings.money_transfer_agent_label),
+            (
+                settings.term_deposit_controller_prompt,
+                settings.term_deposit_controller_label,
+            ),
+            (settings.card_controller_prompt, settings.card_controller_label),
+        ]
+
+    async def _get_prompt_versions(
+        self,
+        ctx: RequestContext,
+    ) -> dict[str, Optional[int]]:
+        agent_prompts = self._agent_prompts()
+        prompts = await asyncio.gather(
+            *[
+                self.prompt_srv.get_prompt(ctx, name=name, label=label, type="chat")
+                for name, label in agent_prompts
+            ]
+        )
+        return {
+            f"{name}:{label}": prompt.version
+            for (name, label), prompt in zip(agent_prompts, prompts)
+        }
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._compiled_graph is not None
+            and time.monotonic() - self._versions_checked_at
+            < settings.assistant_graph_refresh_interval
+        )
+
+    async def get_compiled_graph(self, ctx: RequestContext) -> CompiledStateGraph:
+        """Return the process-wide compiled graph, without a checkpointer.
+
+        The graph is rebuilt only when one of the agent prompt versions in
+        Langfuse changes. Versions are re-checked at most once every
+        `assistant_graph_refresh_interval` seconds. Callers attach their own
+        checkpointer with `compiled.copy(update={"checkpointer": ...})`.
+        """
+        if self._is_fresh():
+            return self._compiled_graph  # type: ignore
+
+        async with self._compile_lock:
+            if self._is_fresh():
+                return self._compiled_graph  # type: ignore
+
+            logger = ctx.logger()
+            try:
+                versions = await self._get_prompt_versions(ctx)
+            except Exception as e:
+                if self._compiled_graph is None:
+                    raise
+                # Keep serving the graph we have and retry after the interval.
+                logger.error(f"Failed to check assistant prompt versions: {e}")
+                self._versions_checked_at = time.monotonic()
+                return self._compiled_graph
+            if self._compiled_graph is None or versions != self._prompt_versions:
+                logger.info(f"Compiling assistant graph for prompts {versions}...")
+                self._compiled_graph = (await self.get_graph()).compile()
+                self._prompt_versions = versions
+            self._versions_checked_at = time.monotonic()
+            return self._compiled_graph
 
     @staticmethod
     @no_type_check
@@ -554,6 +642,7 @@ class AssistantGraph:
             Assistant(
                 prompt_srv=self.prompt_srv,
                 llm=self.llm,
+                intent_router=self.intent_router,
             ),
         )
         workflow.add_node(
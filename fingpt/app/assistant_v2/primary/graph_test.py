@@ -1,7 +1,11 @@
 import pytest
 from langchain_core.messages import AIMessage, ToolCall
 
-from app.assistant_v2.constant import CONFIGURABLE_CONTEXT_KEY, LLM_MODEL_KEY
+from app.assistant_v2.constant import (
+    CONFIGURABLE_CONTEXT_KEY,
+    CONTEXT_KEY,
+    LLM_MODEL_KEY,
+)
 from app.assistant_v2.primary.constant import (
     ENTER_CARD_SUBGRAPH_NODE,
     ENTER_TERM_DEPOSIT_SUBGRAPH_NODE,
@@ -23,6 +27,7 @@ from app.assistant_v2.primary.tool.to_ticker_agent import ToTickerAgent
 from app.assistant_v2.primary.tool.to_transaction_agent import ToTransactionAgent
 from app.assistant_v2.primary.tool.to_transfer_agent import ToTransferAgent
 from app.assistant_v2.util.complete_or_escalate import CompleteOrEscalateTool
+from app.core.config import settings
 
 
 @pytest.fixture
@@ -184,3 +189,45 @@ def test_router_card_to_return_control():
     state = AssistantState(messages=[ai_tools_call_message])
     output = AssistantGraph.route_card_controller_to_tools(state)
     assert output == RETURN_CONTROL_NODE
+
+
+async def test_get_compiled_graph_is_reused(mocker, graph, agent_config):
+    ctx = agent_config[CONFIGURABLE_CONTEXT_KEY][CONTEXT_KEY]
+    mocker.patch.object(settings, "assistant_graph_refresh_interval", 60.0)
+    get_graph = mocker.spy(graph, "get_graph")
+
+    first = await graph.get_compiled_graph(ctx)
+    second = await graph.get_compiled_graph(ctx)
+
+    assert first is second
+    assert first.checkpointer is None
+    get_graph.assert_called_once()
+
+
+async def test_get_compiled_graph_rebuilds_on_prompt_version_change(
+    mocker, graph, agent_config, prompt_service
+):
+    ctx = agent_config[CONFIGURABLE_CONTEXT_KEY][CONTEXT_KEY]
+    mocker.patch.object(settings, "assistant_graph_refresh_interval", 0.0)
+    get_graph = mocker.spy(graph, "get_graph")
+    prompt_service.get_prompt.return_value.version = 1
+
+    first = await graph.get_compiled_graph(ctx)
+    unchanged = await graph.get_compiled_graph(ctx)
+    prompt_service.get_prompt.return_value.version = 2
+    changed = await graph.get_compiled_graph(ctx)
+
+    assert first is unchanged
+    assert changed is not first
+    assert get_graph.call_count == 2
+
+
+async def test_get_compiled_graph_keeps_serving_when_version_check_fails(
+    mocker, graph, agent_config, prompt_service
+):
+    ctx = agent_config[CONFIGURABLE_CONTEXT_KEY][CONTEXT_KEY]
+    mocker.patch.object(settings, "assistant_graph_refresh_interval", 0.0)
+    compiled = await graph.get_compiled_graph(ctx)
+    prompt_service.get_prompt.side_effect = Exception("Langfuse is down")
+
+    assert await graph.get_compiled_graph(ctx) is compiled
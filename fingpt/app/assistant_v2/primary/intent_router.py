@@ -0,0 +1,250 @@
+import json
+import os
+import re
+import sys
+import zlib
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+from uuid import uuid4
+
+import numpy as np
+import yaml
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from loguru import logger
+
+from .constant import PRIMARY_ASSISTANT_TOOLS
+
+DEFAULT_EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), "intent_examples.json")
+
+# Rules only fire when exactly one tool matches, anything else goes to the
+# nearest-neighbour model.
+KEYWORD_RULES: dict[str, list[str]] = {
+    "ToTickerAgent": [
+        r"\bfinancial (report|statement)s?\b",
+        r"\b(ticker|stock price|share price|market cap)\b",
+    ],
+    "ToTransactionAgent": [
+        r"\b(my|recent|last|latest)\s+(\w+\s+)?transactions?\b",
+        r"\bspending\b",
+    ],
+    "ToTransferAgent": [
+        r"\b(send|transfer)\s+(some\s+)?(money|funds|\$\s?\d+)",
+    ],
+    "ToTermDepositAgent": [r"\bterm[\s-]deposits?\b"],
+    "ToCardAgent": [r"\b(my|new|credit|debit)\s+cards?\b"],
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9$]+")
+
+
+@dataclass
+class IntentDecision:
+    tool: Optional[str]
+    confidence: float
+    source: str
+    confident: bool
+
+
+@dataclass
+class IntentRouterStats:
+    routed: int = 0
+    hits: int = 0
+    compared: int = 0
+    disagreements: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.routed if self.routed else 0.0
+
+    @property
+    def disagreement_rate(self) -> float:
+        return self.disagreements / self.compared if self.compared else 0.0
+
+
+def _tokens(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def encode(text: str, dim: int = 2048) -> np.ndarray:
+    """Hashed bag of words, word bigrams and character trigrams."""
+    vector = np.zeros(dim, dtype=np.float32)
+    tokens = _tokens(text)
+    features = [(token, 1.0) for token in tokens]
+    features += [(f"{a} {b}", 1.0) for a, b in zip(tokens, tokens[1:])]
+    for token in tokens:
+        padded = f"<{token}>"
+        features += [(padded[i : i + 3], 0.5) for i in range(len(padded) - 2)]
+    for feature, weight in features:
+        vector[zlib.crc32(feature.encode()) % dim] += weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class IntentRouter:
+    """Picks the delegation tool of the primary assistant without the LLM.
+
+    A turn close to a negative example of the promptfoo corpus is left to the
+    LLM, otherwise keyword rules are tried, then the nearest labelled example.
+    Only decisions above `threshold`, ahead of the runner-up by `margin`, are
+    confident; the others fall back to the LLM and are compared with its
+    choice.
+    """
+
+    def __init__(
+        self,
+        examples: Iterable[tuple[str, Optional[str]]],
+        threshold: float = 0.8,
+        margin: float = 0.15,
+        min_tokens: int = 2,
+        shadow_rate: float = 0.0,
+        dim: int = 2048,
+    ):
+        examples = list(examples)
+        self.threshold = threshold
+        self.margin = margin
+        self.min_tokens = min_tokens
+        self.shadow_rate = shadow_rate
+        self.dim = dim
+        self.labels = [tool for _, tool in examples]
+        self.vectors = (
+            np.stack([encode(text, dim) for text, _ in examples])
+            if examples
+            else np.zeros((0, dim), dtype=np.float32)
+        )
+        self.rules = {
+            tool: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            for tool, patterns in KEYWORD_RULES.items()
+        }
+        self.stats = IntentRouterStats()
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_EXAMPLES_PATH, **kwargs) -> "IntentRouter":
+        with open(path) as f:
+            examples = [(item["text"], item["tool"]) for item in json.load(f)]
+        return cls(examples, **kwargs)
+
+    def classify(self, text: str) -> IntentDecision:
+        if len(_tokens(text)) < self.min_tokens:
+            return IntentDecision(None, 0.0, "length", False)
+
+        neighbour = self._nearest(text)
+        if neighbour.tool is None and neighbour.confidence >= self.threshold:
+            # Close to a turn the LLM has to answer or clarify itself.
+            return neighbour
+
+        matched = {
+            tool
+            for tool, patterns in self.rules.items()
+            if any(pattern.search(text) for pattern in patterns)
+        }
+        if len(matched) == 1:
+            return IntentDecision(matched.pop(), 1.0, "keyword", True)
+        return neighbour
+
+    def _nearest(self, text: str) -> IntentDecision:
+        if not self.labels:
+            return IntentDecision(None, 0.0, "neighbour", False)
+        similarities = self.vectors @ encode(text, self.dim)
+        best: dict[Optional[str], float] = {}
+        for label, similarity in zip(self.labels, similarities.tolist()):
+            best[label] = max(best.get(label, -1.0), similarity)
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        tool, confidence = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        confident = (
+            tool is not None
+            and confidence >= self.threshold
+            and confidence - runner_up >= self.margin
+        )
+        return IntentDecision(tool, confidence, "neighbour", confident)
+
+    def route(self, messages: list[BaseMessage]) -> Optional[IntentDecision]:
+        """Classify the user turn that the primary assistant has to answer."""
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return None
+        content = messages[-1].content
+        if not isinstance(content, str):
+            return None
+
+        decision = self.classify(content)
+        self.stats.routed += 1
+        if decision.confident:
+            self.stats.hits += 1
+        return decision
+
+    @staticmethod
+    def to_message(decision: IntentDecision) -> AIMessage:
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": decision.tool, "args": {}, "id": f"call_{uuid4().hex}"}
+            ],
+        )
+
+    def record_llm_decision(self, decision: IntentDecision, message: Any) -> None:
+        tool_calls = getattr(message, "tool_calls", None)
+        llm_tool = tool_calls[0]["name"] if tool_calls else None
+        self.stats.compared += 1
+        if llm_tool != decision.tool:
+            self.stats.disagreements += 1
+            logger.info(
+                f"Intent router chose {decision.tool} ({decision.source}, "
+                f"{decision.confidence:.2f}), LLM chose {llm_tool}"
+            )
+        logger.info(
+            f"Intent router hit rate {self.stats.hit_rate:.2%}, "
+            f"disagreement rate {self.stats.disagreement_rate:.2%}"
+        )
+
+
+def _tool_of_assertion(assertion: Any) -> Optional[str]:
+    reference = str(assertion.get("value") or assertion.get("$ref") or "")
+    match = re.search(r"to_?(\w+?)_?agent", reference, re.IGNORECASE)
+    if match is None:
+        return None
+    key = match.group(1).replace("_", "").lower()
+    for tool in PRIMARY_ASSISTANT_TOOLS:
+        if tool.__name__.lower() == f"to{key}agent":
+            return tool.__name__
+    return None
+
+
+def load_promptfoo_examples(directory: str) -> list[tuple[str, Optional[str]]]:
+    """Label the last user message of each promptfoo test by its asserted tool.
+
+    Tests without a delegation assertion, or where asking for clarification
+    also passes, become negative examples, as do conflicting labels.
+    """
+    examples: dict[str, Optional[str]] = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".yaml"):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            document = yaml.safe_load(f)
+        tests = document.get("tests", []) if isinstance(document, dict) else document
+        for test in tests or []:
+            if not isinstance(test, dict):
+                continue
+            messages = test.get("vars", {}).get("messages") or []
+            user_messages = [m["content"] for m in messages if m["role"] == "user"]
+            if not user_messages:
+                continue
+            assertions = test.get("assert", [])
+            tools = {_tool_of_assertion(a) for a in assertions}
+            tools.discard(None)
+            ambiguous = len(tools) != 1 or any(
+                a.get("type") == "assert-set" for a in assertions
+            )
+            text = user_messages[-1].strip()
+            tool = None if ambiguous else tools.pop()
+            examples[text] = tool if examples.get(text, tool) == tool else None
+    return list(examples.items())
+
+
+if __name__ == "__main__":
+    # python -m app.assistant_v2.primary.intent_router promptfoo/primary_assistant
+    corpus = load_promptfoo_examples(sys.argv[1])
+    with open(DEFAULT_EXAMPLES_PATH, "w") as f:
+        json.dump([{"text": t, "tool": tool} for t, tool in corpus], f, indent=2)
+        f.write("\n")
+    print(f"Exported {len(corpus)} examples to {DEFAULT_EXAMPLES_PATH}")
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.assistant_v2.primary.intent_router import (
+    IntentRouter,
+    load_promptfoo_examples,
+)
+
+PROMPTFOO_DIR = os.path.join(
+    os.path.dirname(__file__), "../../../promptfoo/primary_assistant"
+)
+
+
+@pytest.fixture
+def router():
+    return IntentRouter.from_file()
+
+
+@pytest.mark.parametrize(
+    "text, tool",
+    [
+        ("Send $50 to John", "ToTransferAgent"),
+        ("Show my recent transactions", "ToTransactionAgent"),
+        ("I want to open a term deposit", "ToTermDepositAgent"),
+        ("Generate financial report for Microsoft", "ToTickerAgent"),
+        ("Block my credit card", "ToCardAgent"),
+    ],
+)
+def test_classify_confident(router, text, tool):
+    decision = router.classify(text)
+
+    assert decision.confident
+    assert decision.tool == tool
+
+
+@pytest.mark.parametrize(
+    "text", ["$100", "What's the weather like?", "Term deposit", "How are you?"]
+)
+def test_classify_falls_back_to_llm(router, text):
+    assert not router.classify(text).confident
+
+
+def test_route_only_user_turns(router):
+    tool_turn = [
+        HumanMessage(content="Send $50 to John"),
+        AIMessage(content="", tool_calls=[{"name": "x", "args": {}, "id": "1"}]),
+        ToolMessage(content="done", tool_call_id="1"),
+    ]
+
+    assert router.route(tool_turn) is None
+    assert router.route(tool_turn[:1]).tool == "ToTransferAgent"
+    assert router.stats.routed == 1
+    assert router.stats.hit_rate == 1.0
+
+
+def test_record_llm_decision_counts_disagreements(router):
+    decision = router.classify("Send $50 to John")
+
+    router.record_llm_decision(decision, router.to_message(decision))
+    router.record_llm_decision(decision, AIMessage(content="Hello"))
+
+    assert router.stats.compared == 2
+    assert router.stats.disagreement_rate == 0.5
+
+
+@pytest.mark.skipif(not os.path.isdir(PROMPTFOO_DIR), reason="no promptfoo corpus")
+def test_bundled_examples_match_promptfoo_corpus(router):
+    examples = load_promptfoo_examples(PROMPTFOO_DIR)
+
+    assert router.labels == [tool for _, tool in examples]
+    for text, tool in examples:
+        decision = router.classify(text)
+        if decision.confident:
+            assert decision.tool == tool, text
@@ -1,4 +1,5 @@
 from typing import Any, cast
+from uuid import uuid4
 
 from langchain_core.messages import (
     AIMessage,
@@ -7,7 +8,6 @@ from langchain_core.messages import (
     ToolCall,
     ToolMessage,
 )
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables.config import RunnableConfig
 from langgraph.errors import GraphInterrupt
 from langgraph.graph.state import CompiledStateGraph
@@ -18,7 +18,6 @@ from app.assistant_v2.constant import (
     CONTEXT_KEY,
     LAST_SUMMARY_MESSAGE_ID_KEY,
     PENDING_RESPONSE_KEY,
-    PROMPT_SERVICE_KEY,
     USER_CHOICE_ID_KEY,
     USER_QUERY_KEY,
 )
@@ -29,6 +28,10 @@ from app.assistant_v2.primary.constant import (
     TICKER_AGENT_NODE,
     DialogController,
 )
+from app.assistant_v2.primary.rolling_summary import (
+    conversation_lines,
+    summarize_conversation,
+)
 from app.assistant_v2.primary.state import (
     AssistantConfig,
     AssistantState,
@@ -39,7 +42,6 @@ from app.core.config import settings
 from app.core.context import RequestContext
 from app.entity.assistant import AssistantStatus
 from app.entity.error import InterruptionNotAllowedError, MissingConfigDataError
-from app.prompt.prompt_service import PromptService
 from app.utils.modified_langfuse_decorator import observe  # type: ignore
 
 
@@ -100,43 +102,41 @@ async def _summary_previous_messages(
 ) -> AIMessage:
     """
     Summarize the previous messages for the user.
+
+    The rolling summary kept up to date in the background is reused as is when
+    only a few replies came after it, otherwise they are summarized with it.
     """
     config_data: AssistantConfig = config.get(CONFIGURABLE_CONTEXT_KEY, {})
-    last_summary_message_id = state.get(AssistantStateFields.LAST_SUMMARY_MESSAGE_ID)
+    rolling_summary = state.get(AssistantStateFields.ROLLING_SUMMARY)
+    if rolling_summary:
+        last_summary_message_id = state.get(
+            AssistantStateFields.ROLLING_SUMMARY_MESSAGE_ID
+        )
+    else:
+        last_summary_message_id = state.get(
+            AssistantStateFields.LAST_SUMMARY_MESSAGE_ID
+        )
     ctx: RequestContext = config_data[CONTEXT_KEY]
     logger = ctx.logger()
     logger.info(f"Summarizing previous messages from {last_summary_message_id}...")
 
     messages = state.get(AssistantStateFields.MESSAGES, [])
-    need_summary_messages = []
-    for message in messages[::-1][2:]:  # skip last HumanMessage and last AIMessage
-        if message.id == last_summary_message_id:
-            break
-        if isinstance(message, AIMessage) and not message.tool_calls:
-            need_summary_messages.append(f"AI: {message.content}")
-        if isinstance(message, HumanMessage):
-            need_summary_messages.append(f"User: {message.content}")
-    need_summary_messages_str = "\n".join(need_summary_messages[::-1])
-
-    prompt_service: PromptService = config_data[PROMPT_SERVICE_KEY]
-    prompt = await prompt_service.get_prompt(
-        ctx=ctx,
-        name=settings.assistant_primary_summarize_messages_prompt,
-        label=settings.assistant_primary_summarize_messages_label,
-        type="chat",
-    )
-    prompt_tmpl = prompt.tmpl + ChatPromptTemplate.from_messages(
-        [
-            ("user", "This is the conversation: {messages}"),
-        ]
-    )
-    chain = prompt_tmpl | prompt.llm_model
-    response = await chain.ainvoke(
-        input={
-            "messages": need_summary_messages_str,
-        },
-        config=config,
-    )
+    # skip last HumanMessage and last AIMessage
+    need_summary_messages = conversation_lines(messages[:-2], last_summary_message_id)
+    if rolling_summary:
+        if len(need_summary_messages) <= settings.assistant_summary_max_tail:
+            logger.debug(
+                f"Reusing rolling summary with {len(need_summary_messages)} messages"
+            )
+            return AIMessage(
+                content="\n".join([rolling_summary, *need_summary_messages]),
+                id=str(uuid4()),
+            )
+        need_summary_messages.insert(
+            0, f"Summary of the earlier conversation: {rolling_summary}"
+        )
+
+    response = await summarize_conversation("\n".join(need_summary_messages), config)
     logger.debug(
         f"Summary {len(need_summary_messages)} messages to new message: {response}"
     )
@@ -201,12 +201,16 @@ async def controller_exit_node(
                 AssistantStateFields.CONTROLLER_STACK: current_stack,
                 agent_state_key: {},
                 AssistantStateFields.LAST_SUMMARY_MESSAGE_ID: summary_message.id,
+                AssistantStateFields.ROLLING_SUMMARY: summary_message.content,
+                AssistantStateFields.ROLLING_SUMMARY_MESSAGE_ID: summary_message.id,
             }
         if controller == TICKER_AGENT_NODE:
             return {
                 AssistantStateFields.MESSAGES: new_messages,
                 AssistantStateFields.CONTROLLER_STACK: current_stack,
                 AssistantStateFields.LAST_SUMMARY_MESSAGE_ID: summary_message.id,
+                AssistantStateFields.ROLLING_SUMMARY: summary_message.content,
+                AssistantStateFields.ROLLING_SUMMARY_MESSAGE_ID: summary_message.id,
             }
 
     return {
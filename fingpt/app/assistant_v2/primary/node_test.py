@@ -118,6 +118,33 @@ async def test_summary_previous_messages():
     config_data[CONTEXT_KEY].logger().debug.assert_called()
 
 
+@pytest.mark.asyncio
+async def test_summary_previous_messages_reuses_rolling_summary():
+    state = BaseAgentState()
+    state[AssistantStateFields.MESSAGES] = [
+        AIMessage(id="1", content="Summary so far"),
+        HumanMessage(id="2", content="User message 1"),
+        AIMessage(id="3", content="AI message 1"),
+        HumanMessage(id="4", content="User message 2"),
+        AIMessage(id="5", content="", tool_calls=[]),
+    ]
+    state[AssistantStateFields.ROLLING_SUMMARY] = "Summary so far"
+    state[AssistantStateFields.ROLLING_SUMMARY_MESSAGE_ID] = "1"
+    prompt_service = MagicMock(PromptService)
+    config = {
+        CONFIGURABLE_CONTEXT_KEY: {
+            CONTEXT_KEY: MagicMock(RequestContext),
+            PROMPT_SERVICE_KEY: prompt_service,
+        }
+    }
+
+    result = await _summary_previous_messages(state, config)
+
+    assert result.content == "Summary so far\nUser: User message 1\nAI: AI message 1"
+    assert result.id
+    prompt_service.get_prompt.assert_not_called()
+
+
 def test_prepare_response_node():
     state = {AssistantStateFields.MESSAGES: [MagicMock()]}
     config = RunnableConfig()
@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.graph.state import CompiledStateGraph
+
+from app.assistant_v2.constant import (
+    CONFIGURABLE_CONTEXT_KEY,
+    CONTEXT_KEY,
+    PROMPT_SERVICE_KEY,
+)
+from app.core.config import settings
+from app.core.context import RequestContext
+from app.prompt.prompt_service import PromptService
+
+from .state import AssistantConfig, AssistantStateFields
+
+
+@dataclass
+class RollingSummaryUpdate:
+    based_on: Optional[str]
+    values: dict[str, Any]
+
+
+def conversation_lines(
+    messages: Sequence[AnyMessage],
+    since_id: Optional[str],
+) -> list[str]:
+    """User and AI replies after the message `since_id`, oldest first."""
+    lines = []
+    for message in messages[::-1]:
+        if message.id == since_id:
+            break
+        if isinstance(message, AIMessage) and not message.tool_calls:
+            lines.append(f"AI: {message.content}")
+        if isinstance(message, HumanMessage):
+            lines.append(f"User: {message.content}")
+    return lines[::-1]
+
+
+async def summarize_conversation(
+    conversation: str,
+    config: RunnableConfig,
+) -> AIMessage:
+    config_data: AssistantConfig = config.get(CONFIGURABLE_CONTEXT_KEY, {})
+    ctx: RequestContext = config_data[CONTEXT_KEY]
+    prompt_service: PromptService = config_data[PROMPT_SERVICE_KEY]
+    prompt = await prompt_service.get_prompt(
+        ctx=ctx,
+        name=settings.assistant_primary_summarize_messages_prompt,
+        label=settings.assistant_primary_summarize_messages_label,
+        type="chat",
+    )
+    prompt_tmpl = prompt.tmpl + ChatPromptTemplate.from_messages(
+        [
+            ("user", "This is the conversation: {messages}"),
+        ]
+    )
+    chain = prompt_tmpl | prompt.llm_model
+    return await chain.ainvoke(
+        input={
+            "messages": conversation,
+        },
+        config=config,
+    )
+
+
+async def compute_rolling_summary(
+    agent: CompiledStateGraph,
+    config: RunnableConfig,
+) -> Optional[RollingSummaryUpdate]:
+    """Fold the replies of the last turns into the rolling summary of a thread.
+
+    Returns the state update, or None while fewer than
+    `assistant_summary_min_messages` replies are left unsummarised.
+    """
+    snapshot = await agent.aget_state(config)
+    state = snapshot.values
+    messages = state.get(AssistantStateFields.MESSAGES, [])
+    rolling_summary = state.get(AssistantStateFields.ROLLING_SUMMARY)
+    since_id = state.get(AssistantStateFields.ROLLING_SUMMARY_MESSAGE_ID)
+    lines = conversation_lines(messages, since_id if rolling_summary else None)
+    if not messages or len(lines) < settings.assistant_summary_min_messages:
+        return None
+
+    if rolling_summary:
+        lines.insert(0, f"Summary of the earlier conversation: {rolling_summary}")
+    summary = await summarize_conversation("\n".join(lines), config)
+    return RollingSummaryUpdate(
+        based_on=since_id,
+        values={
+            AssistantStateFields.ROLLING_SUMMARY: summary.content,
+            AssistantStateFields.ROLLING_SUMMARY_MESSAGE_ID: messages[-1].id,
+        },
+    )
@@ -0,0 +1,91 @@
+from typing import Annotated, Optional, Sequence, TypedDict
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from langchain_community.chat_models.fake import FakeListChatModel
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, StateGraph, add_messages
+
+from app.assistant_v2.constant import (
+    CONFIGURABLE_CONTEXT_KEY,
+    CONTEXT_KEY,
+    PROMPT_SERVICE_KEY,
+)
+from app.assistant_v2.primary.rolling_summary import (
+    compute_rolling_summary,
+    conversation_lines,
+)
+from app.assistant_v2.primary.state import AssistantStateFields
+from app.core import RequestContext
+from app.prompt.prompt_service import PromptService
+
+
+class SummaryState(TypedDict):
+    messages: Annotated[Sequence[AnyMessage], add_messages]
+    rolling_summary: Optional[str]
+    rolling_summary_message_id: Optional[str]
+
+
+@pytest.fixture
+def agent():
+    workflow = StateGraph(SummaryState)
+    workflow.add_node("reply", lambda state: {"messages": [AIMessage("Sure")]})
+    workflow.set_entry_point("reply")
+    workflow.add_edge("reply", END)
+    return workflow.compile(checkpointer=MemorySaver())
+
+
+@pytest.fixture
+def config():
+    prompt_service = MagicMock(PromptService)
+    prompt_service.get_prompt = AsyncMock(
+        return_value=MagicMock(
+            tmpl=ChatPromptTemplate.from_messages([("system", "Summarize")]),
+            llm_model=FakeListChatModel(responses=["Rolling summary"]),
+        )
+    )
+    return {
+        CONFIGURABLE_CONTEXT_KEY: {
+            "thread_id": "thread-1",
+            CONTEXT_KEY: RequestContext("req_id"),
+            PROMPT_SERVICE_KEY: prompt_service,
+        }
+    }
+
+
+def test_conversation_lines_skip_tool_calls():
+    messages = [
+        HumanMessage(id="1", content="Hi"),
+        AIMessage(id="2", content="Hello"),
+        HumanMessage(id="3", content="Send money"),
+        AIMessage(
+            id="4", content="", tool_calls=[{"name": "x", "args": {}, "id": "c"}]
+        ),
+        AIMessage(id="5", content="To whom?"),
+    ]
+
+    assert conversation_lines(messages, "2") == ["User: Send money", "AI: To whom?"]
+    assert len(conversation_lines(messages, None)) == 4
+
+
+async def test_compute_rolling_summary_waits_for_enough_messages(agent, config):
+    await agent.ainvoke({"messages": [HumanMessage("Hi")]}, config)
+
+    assert await compute_rolling_summary(agent, config) is None
+
+
+async def test_compute_rolling_summary_folds_previous_summary(agent, config):
+    for query in ["Hi", "Send money"]:
+        await agent.ainvoke({"messages": [HumanMessage(query)]}, config)
+    snapshot = await agent.aget_state(config)
+    last_message_id = snapshot.values["messages"][-1].id
+
+    update = await compute_rolling_summary(agent, config)
+
+    assert update.based_on is None
+    assert update.values == {
+        AssistantStateFields.ROLLING_SUMMARY: "Rolling summary",
+        AssistantStateFields.ROLLING_SUMMARY_MESSAGE_ID: last_message_id,
+    }
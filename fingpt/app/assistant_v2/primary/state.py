@@ -24,6 +24,8 @@ class AssistantState(BaseAgentState):
     transaction_report_agent_state: dict[str, Any]
     transfer_agent_state: dict[str, Any]
     last_summary_message_id: str
+    rolling_summary: str
+    rolling_summary_message_id: str
 
 
 @dataclass
@@ -38,6 +40,8 @@ class AssistantStateFields(BaseAgentStateFields):
     TRANSACTION_REPORT_AGENT_STATE = "transaction_report_agent_state"
     TRANSFER_AGENT_STATE = "transfer_agent_state"
     LAST_SUMMARY_MESSAGE_ID = "last_summary_message_id"
+    ROLLING_SUMMARY = "rolling_summary"
+    ROLLING_SUMMARY_MESSAGE_ID = "rolling_summary_message_id"
 
 
 AssistantStateFields.validate_agent_fields(AssistantState)
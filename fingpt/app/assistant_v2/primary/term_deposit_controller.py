@@ -19,6 +19,7 @@ from app.assistant_v2.primary.state import (
 )
 from app.assistant_v2.primary.tool.to_term_deposit_flow import ToTermDepositFlow
 from app.assistant_v2.util.complete_or_escalate import CompleteOrEscalateTool
+from app.assistant_v2.util.context_window import window_messages
 from app.assistant_v2.util.handle_ai_message import verify_ai_message
 from app.core.config import settings
 from app.core.context import RequestContext
@@ -117,7 +118,9 @@ class TermDepositController:
             agent = await self.get_agent(ctx)
             result = await agent.ainvoke(  # type: ignore
                 {
-                    "messages": state[AssistantStateFields.MESSAGES],
+                    "messages": window_messages(
+                        state[AssistantStateFields.MESSAGES], type(self).__name__
+                    ),
                 },
                 RunnableConfig(configurable=dict(config)),
             )
@@ -18,6 +18,7 @@ from app.assistant_v2.primary.state import (
 )
 from app.assistant_v2.transaction.constant import TRANSACTION_AGENT_TOOLS
 from app.assistant_v2.util.complete_or_escalate import CompleteOrEscalateTool
+from app.assistant_v2.util.context_window import window_messages
 from app.core.config import settings
 from app.core.context import RequestContext
 from app.entity import ChatRespAction, ChatRespDto
@@ -120,7 +121,9 @@ class TransactionReportAgent:
 
             result = await agent.ainvoke(  # type: ignore
                 {
-                    "messages": state[AssistantStateFields.MESSAGES],
+                    "messages": window_messages(
+                        state[AssistantStateFields.MESSAGES], type(self).__name__
+                    ),
                 },
                 RunnableConfig(configurable=dict(config)),
             )
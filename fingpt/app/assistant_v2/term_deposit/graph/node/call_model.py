@@ -17,6 +17,7 @@ from app.assistant_v2.term_deposit.state import (
     TermDepositAgentState,
     TermDepositAgentStateFields,
 )
+from app.assistant_v2.util.context_window import window_messages
 from app.assistant_v2.util.handle_ai_message import verify_ai_message
 from app.assistant_v2.util.misc import build_chain, extract_config
 from app.core.config import settings
@@ -49,7 +50,9 @@ async def call_model_func(
     )
     retry_counter = 0
     while True:
-        response: Any = await chain_ainvoke(chain, {"messages": messages})
+        response: Any = await chain_ainvoke(
+            chain, {"messages": window_messages(messages, "term_deposit.call_model")}
+        )
         new_message = verify_ai_message(
             ctx, state, response, retry_counter, expected_tools=tool_names
         )
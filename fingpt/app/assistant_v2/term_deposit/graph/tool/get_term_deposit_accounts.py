@@ -3,6 +3,10 @@ from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools.structured import StructuredTool
 
 from app.assistant_v2.common.base_agent_config import extract_bb_retail_api_config
+from app.assistant_v2.common.prefetch import (
+    TERM_DEPOSIT_ACCOUNTS_PREFETCH,
+    get_prefetched,
+)
 from app.assistant_v2.term_deposit.constant import GET_TERM_DEPOSIT_ACCOUNT_TOOL_NAME
 from app.assistant_v2.term_deposit.graph.utils import _update_term_account
 from app.assistant_v2.util.misc import extract_config
@@ -30,7 +34,11 @@ async def _get_term_deposit_accounts(
     api_config = extract_bb_retail_api_config(config_data=config_data)
     logger.debug("Retrieving all term deposit accounts ...")
 
-    term_deposit_accounts = await list_term_deposit_accounts(ctx=ctx, config=api_config)
+    term_deposit_accounts = await get_prefetched(
+        config_data,
+        TERM_DEPOSIT_ACCOUNTS_PREFETCH,
+        lambda: list_term_deposit_accounts(ctx=ctx, config=api_config),
+    )
 
     logger.info("Filtering term deposit accounts ...")
 
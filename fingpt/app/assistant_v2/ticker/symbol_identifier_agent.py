@@ -11,6 +11,7 @@ from app.assistant_v2.constant import (
     PENDING_RESPONSE_KEY,
 )
 from app.assistant_v2.util.complete_or_escalate import CompleteOrEscalateTool
+from app.assistant_v2.util.context_window import window_messages
 from app.core.config import settings
 from app.core.context import RequestContext
 from app.entity.api import SupportedTicker
@@ -21,7 +22,7 @@ from app.entity.chat_response import (
 )
 from app.prompt.prompt_service import PromptService
 
-from ..util.handle_ai_message import verify_ai_message
+from ..util.handle_ai_message import bound_tool_names, verify_ai_message
 from .constant import (
     TICKER_AGENT_TOOLS,
     UNRECOGNIZED_SYMBOL_MESSAGE,
@@ -41,6 +42,7 @@ class SymbolIdentifierAgent:
         self.prompt_srv = prompt_srv
         self.llm = llm
         self.ready = False
+        self.tool_names = bound_tool_names(TICKER_AGENT_TOOLS)
 
     @staticmethod
     async def build_agent(  # type: ignore
@@ -148,13 +150,20 @@ class SymbolIdentifierAgent:
             agent = await self.get_agent(ctx)
             result = await agent.ainvoke(  # type: ignore
                 {
-                    "messages": state[TickerAgentStateFields.MESSAGES],
+                    "messages": window_messages(
+                        state[TickerAgentStateFields.MESSAGES], type(self).__name__
+                    ),
                 },
                 RunnableConfig(configurable=dict(config)),
             )
 
             new_message = verify_ai_message(
-                ctx, state, result, retry_counter, maximum_tool_calls=1
+                ctx,
+                state,
+                result,
+                retry_counter,
+                maximum_tool_calls=1,
+                expected_tools=self.tool_names,
             )
             retry_counter += 1
             if new_message:
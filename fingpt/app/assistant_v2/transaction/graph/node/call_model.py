@@ -16,6 +16,7 @@ from app.assistant_v2.transaction.state import (
     TransactionAgentState,
     TransactionAgentStateFields,
 )
+from app.assistant_v2.util.context_window import window_messages
 from app.assistant_v2.util.handle_ai_message import verify_ai_message
 from app.assistant_v2.util.misc import build_chain, extract_config
 from app.core.config import settings
@@ -82,7 +83,9 @@ async def call_model_func(
     )
     retry_counter = 0
     while True:
-        response = await _chain_ainvoke(chain, {"messages": messages})
+        response = await _chain_ainvoke(
+            chain, {"messages": window_messages(messages, "transaction.call_model")}
+        )
         new_message = verify_ai_message(ctx, state, response, retry_counter)
         if new_message:
             messages = new_message
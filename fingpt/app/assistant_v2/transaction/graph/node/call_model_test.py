@@ -29,6 +29,8 @@ async def test_call_model_func(agent_config):
     state = {TransactionAgentStateFields.MESSAGES: [mock_message]}
     prompt_service = MagicMock(PromptService)
     mock_prompt = MagicMock(ChatPrompt)
+    mock_prompt.name = "transaction_prompt"
+    mock_prompt.version = 1
     mock_prompt.tmpl = ChatPromptTemplate.from_messages(
         [("system", "test instruction with {{tool_names}}")]
     )
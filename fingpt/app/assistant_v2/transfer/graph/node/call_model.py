@@ -11,6 +11,7 @@ from app.assistant_v2.constant import (
 from app.assistant_v2.transfer.graph.tool import tool_list, tool_names
 from app.assistant_v2.transfer.graph.utils import chain_ainvoke, extract_tool_messages
 from app.assistant_v2.transfer.state import TransferAgentState, TransferAgentStateFields
+from app.assistant_v2.util.context_window import window_messages
 from app.assistant_v2.util.handle_ai_message import verify_ai_message
 from app.assistant_v2.util.misc import build_chain, extract_config
 from app.core.config import settings
@@ -43,7 +44,9 @@ async def call_model_func(
     )
     retry_counter = 0
     while True:
-        response = await chain_ainvoke(chain, {"messages": messages})
+        response = await chain_ainvoke(
+            chain, {"messages": window_messages(messages, "transfer.call_model")}
+        )
         new_message = verify_ai_message(
             ctx, state, response, retry_counter, expected_tools=tool_names
         )
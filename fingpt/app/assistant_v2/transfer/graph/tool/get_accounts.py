@@ -6,6 +6,7 @@ from langchain_core.tools.structured import StructuredTool
 from langgraph.prebuilt import InjectedState
 
 from app.assistant_v2.common.base_agent_config import extract_bb_retail_api_config
+from app.assistant_v2.common.prefetch import ACCOUNTS_PREFETCH, get_prefetched
 from app.assistant_v2.transfer.constant import GET_ACCOUNT_TOOL_NAME
 from app.assistant_v2.transfer.state import TransferAgentStateFields
 from app.assistant_v2.util.misc import extract_config
@@ -36,7 +37,11 @@ async def _get_account(
     config_data, ctx, logger = extract_config(config)
     api_config = extract_bb_retail_api_config(config_data)
     logger.info("Retrieving account...")
-    accounts = await list_accounts(ctx=ctx, config=api_config)
+    accounts = await get_prefetched(
+        config_data,
+        ACCOUNTS_PREFETCH,
+        lambda: list_accounts(ctx=ctx, config=api_config),
+    )
     for account in accounts:
         if account.available_balance < transfer_amount or account.booked_balance < 0:
             account.is_usable = False
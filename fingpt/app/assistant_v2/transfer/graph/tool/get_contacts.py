@@ -6,11 +6,16 @@ from langchain_core.tools.structured import StructuredTool
 from langgraph.prebuilt import InjectedState
 
 from app.assistant_v2.common.base_agent_config import extract_bb_retail_api_config
+from app.assistant_v2.common.prefetch import (
+    CONTACTS_PAGING,
+    CONTACTS_PREFETCH,
+    get_prefetched,
+)
 from app.assistant_v2.transfer.constant import GET_CONTACT_TOOL_NAME
 from app.assistant_v2.transfer.state import TransferAgentStateFields
 from app.assistant_v2.util.misc import extract_config
 from app.bb_retail.request import list_contacts
-from app.entity import BbQueryPaging, Contact
+from app.entity import Contact
 from app.utils.modified_langfuse_decorator import observe
 
 
@@ -50,8 +55,10 @@ async def _get_contacts(
     config_data, ctx, logger = extract_config(config)
     api_config = extract_bb_retail_api_config(config_data)
     logger.info(f"Retrieving contact list for {recipient_name}")
-    contacts = await list_contacts(
-        ctx=ctx, config=api_config, params=BbQueryPaging(fr0m=0, size=500)
+    contacts = await get_prefetched(
+        config_data,
+        CONTACTS_PREFETCH,
+        lambda: list_contacts(ctx=ctx, config=api_config, params=CONTACTS_PAGING),
     )
     filtered_contacts = _filter_contact(recipient_name, contacts)
     message = [entity.json() for entity in filtered_contacts.values()]
@@ -3,6 +3,8 @@ from unittest.mock import AsyncMock, patch
 
 import pytest
 
+from app.assistant_v2.common.prefetch import CONTACTS_PREFETCH, PrefetchCache
+from app.assistant_v2.constant import CONFIGURABLE_CONTEXT_KEY, PREFETCH_KEY
 from app.assistant_v2.transfer.graph.tool.get_contacts import _get_contacts
 from app.entity import Contact
 
@@ -40,3 +42,19 @@ async def test_get_contacts_failure(agent_config):
         # Call the function and expect an exception
         with pytest.raises(Exception, match="API error"):
             await _get_contacts("some_name", agent_config, {})
+
+
+@pytest.mark.asyncio
+async def test_get_contacts_uses_prefetched_contacts(agent_config):
+    contacts = [Contact(id="1", name="Alex"), Contact(id="2", name="Bob")]
+    prefetch = PrefetchCache()
+    prefetch.start(CONTACTS_PREFETCH, AsyncMock(return_value=contacts))
+    agent_config[CONFIGURABLE_CONTEXT_KEY][PREFETCH_KEY] = prefetch
+
+    with patch(
+        "app.assistant_v2.transfer.graph.tool.get_contacts.list_contacts",
+        side_effect=Exception("Should use the prefetched contacts"),
+    ):
+        result = await _get_contacts("bob", agent_config, {})
+
+    assert [Contact(**json.loads(c)) for c in eval(result)] == [contacts[1]]
@@ -19,6 +19,7 @@ from app.assistant_v2.transfer.state import (
 )
 from app.assistant_v2.transfer.tool.to_transfer_money_flow import ToMoneyTransferFlow
 from app.assistant_v2.util.complete_or_escalate import CompleteOrEscalateTool
+from app.assistant_v2.util.context_window import window_messages
 from app.assistant_v2.util.handle_ai_message import verify_ai_message
 from app.core.config import settings
 from app.core.context import RequestContext
@@ -118,7 +119,9 @@ class MoneyTransferAgent:
             agent = await self.get_agent(ctx)
             result = await agent.ainvoke(  # type: ignore
                 {
-                    "messages": state[TransferAgentStateFields.MESSAGES],
+                    "messages": window_messages(
+                        state[TransferAgentStateFields.MESSAGES], type(self).__name__
+                    ),
                 },
                 RunnableConfig(configurable=dict(config)),
             )
@@ -0,0 +1,103 @@
+import json
+from functools import lru_cache
+from typing import Any, Optional, Sequence
+
+import tiktoken
+from langchain_core.messages import AIMessage, ToolMessage
+from loguru import logger
+
+from app.core.config import settings
+
+# Role, separators and name of a chat message, as counted by OpenAI.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(name: str) -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"Tokenizer {name} unavailable, estimating tokens: {e}")
+        return None
+
+
+def warm_up_tokenizer() -> None:
+    """Load the tokenizer, which downloads its ranks on first use."""
+    _get_encoding(settings.context_window_encoding)
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding(settings.context_window_encoding)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, default=str)
+
+
+def count_message_tokens(message: Any) -> int:
+    # Prompt placeholders also accept plain strings and (role, content) tuples.
+    content = getattr(message, "content", message)
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(_content_text(content))
+    if isinstance(message, AIMessage):
+        for tool_call in message.tool_calls:
+            tokens += count_tokens(tool_call["name"])
+            tokens += count_tokens(json.dumps(tool_call["args"], default=str))
+    return tokens
+
+
+def _group_tool_calls(messages: Sequence[Any]) -> list[list[Any]]:
+    """Split messages into units that must be kept or dropped together.
+
+    An AI message with tool calls and the tool messages answering it form a
+    single unit, since the API rejects tool messages without their call.
+    """
+    groups: list[list[Any]] = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and groups:
+            head = groups[-1][0]
+            if isinstance(head, AIMessage) and head.tool_calls:
+                groups[-1].append(message)
+                continue
+        groups.append([message])
+    return groups
+
+
+def node_token_budget(node: str) -> int:
+    return settings.context_window_node_budgets.get(
+        node, settings.context_window_max_tokens
+    )
+
+
+def window_messages(
+    messages: Sequence[Any],
+    node: str,
+) -> list[Any]:
+    """Keep the latest messages of a conversation that fit the node's budget.
+
+    The most recent unit is always kept, and a budget of 0 keeps everything.
+    """
+    budget = node_token_budget(node)
+    if budget <= 0:
+        return list(messages)
+
+    kept: list[list[Any]] = []
+    used = 0
+    for group in reversed(_group_tool_calls(messages)):
+        tokens = sum(count_message_tokens(message) for message in group)
+        if kept and used + tokens > budget:
+            break
+        kept.append(group)
+        used += tokens
+
+    windowed = [message for group in reversed(kept) for message in group]
+    if len(windowed) < len(messages):
+        logger.debug(
+            f"{node}: sending {len(windowed)} of {len(messages)} messages "
+            f"({used} tokens, budget {budget})"
+        )
+    return windowed
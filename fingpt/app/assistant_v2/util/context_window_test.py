@@ -0,0 +1,67 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from app.assistant_v2.util.context_window import (
+    count_message_tokens,
+    count_tokens,
+    window_messages,
+)
+
+
+def _conversation():
+    return [
+        HumanMessage(content="word " * 50),
+        AIMessage(content="word " * 50),
+        HumanMessage(content="Send money to Sara"),
+        AIMessage(
+            content="",
+            tool_calls=[{"name": "get_contacts", "args": {"name": "Sara"}, "id": "1"}],
+        ),
+        ToolMessage(content="word " * 20, tool_call_id="1"),
+        AIMessage(content="Which account?"),
+    ]
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert count_tokens("hello world") > 0
+    assert count_message_tokens(HumanMessage(content="hello")) > count_tokens("hello")
+
+
+def test_window_keeps_everything_within_budget(mocker):
+    mocker.patch("app.core.config.settings.context_window_max_tokens", 10_000)
+    messages = _conversation()
+
+    assert window_messages(messages, "test_node") == messages
+
+
+def test_window_drops_oldest_messages(mocker):
+    messages = _conversation()
+    budget = sum(count_message_tokens(m) for m in messages[2:])
+    mocker.patch("app.core.config.settings.context_window_max_tokens", budget)
+
+    assert window_messages(messages, "test_node") == messages[2:]
+
+
+def test_window_keeps_tool_call_with_its_tool_messages(mocker):
+    messages = _conversation()
+    budget = sum(count_message_tokens(m) for m in messages[4:])
+    mocker.patch("app.core.config.settings.context_window_max_tokens", budget)
+
+    assert window_messages(messages, "test_node") == messages[5:]
+
+
+def test_window_always_keeps_latest_message(mocker):
+    mocker.patch("app.core.config.settings.context_window_max_tokens", 1)
+    messages = [HumanMessage(content="hi"), SystemMessage(content="Retry")]
+
+    assert window_messages(messages, "test_node") == messages[1:]
+
+
+def test_window_uses_node_budget(mocker):
+    mocker.patch("app.core.config.settings.context_window_max_tokens", 1)
+    mocker.patch(
+        "app.core.config.settings.context_window_node_budgets", {"test_node": 0}
+    )
+    messages = _conversation()
+
+    assert window_messages(messages, "test_node") == messages
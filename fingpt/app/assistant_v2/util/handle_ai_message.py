@@ -1,11 +1,21 @@
+import json
 import re
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import uuid4
 
-from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolCall
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langgraph.graph import add_messages
 
 from app.assistant_v2.common.base_agent_state import BaseAgentStateFields
 from app.core import RequestContext
+from app.core.metrics import LLM_OUTPUT_REPAIRS, LLM_OUTPUT_RETRIES
+
+# @SONAR_STOP@
+FUNCTION_CALL_PATTERN = r"\[.*?functions\..*\]|\[*?Call.*\]"
+# @SONAR_START@
+FUNCTION_NAME_PATTERN = re.compile(r"functions\.(\w+)")
 
 
 def _has_content(message: BaseMessage) -> bool:
@@ -20,61 +30,222 @@ def _verify_content(message: BaseMessage) -> bool:
     if not _has_content(message):
         return True
 
-    # @SONAR_STOP@
-    pattern = r"\[.*?functions\..*\]|\[*?Call.*\]"
-    # @SONAR_START@
-    match = re.search(pattern, message.content)
+    match = re.search(FUNCTION_CALL_PATTERN, message.content)
     if match:
         return False
 
     return True
 
 
-def verify_ai_message(
-    ctx: RequestContext,
-    state: Dict[str, Any],
-    ai_result,
-    retry_counter,
-    maximum_retries=3,
-    minimum_tool_calls=0,
+def bound_tool_names(tools: Sequence[Any]) -> list[str]:
+    """Names under which `bind_tools` exposes tools, classes and functions."""
+    return [convert_to_openai_tool(tool)["function"]["name"] for tool in tools]
+
+
+def _normalize_tool_name(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.rsplit(".", 1)[-1].lower())
+
+
+def _typo_distance(a: str, b: str) -> int:
+    """Edit distance counting a swap of adjacent characters as one edit."""
+    previous2: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _match_tool_name(name: str, expected_tools: Sequence[str]) -> Optional[str]:
+    """Map a misspelled tool name to the single expected tool it refers to.
+
+    Case, separators and a `functions.` prefix are ignored, and names of at
+    least 6 characters may be off by one typo.
+    """
+    if name in expected_tools:
+        return name
+    normalized = _normalize_tool_name(name)
+    matches = [
+        tool for tool in expected_tools if _normalize_tool_name(tool) == normalized
+    ]
+    if not matches and len(normalized) >= 6:
+        matches = [
+            tool
+            for tool in expected_tools
+            if _typo_distance(normalized, _normalize_tool_name(tool)) == 1
+        ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _new_tool_call(name: str, args: dict[str, Any]) -> ToolCall:
+    return ToolCall(name=name, args=args, id=f"call_{uuid4().hex}")
+
+
+def _decode_json_at(content: str, index: int) -> tuple[Any, int]:
+    return json.JSONDecoder().raw_decode(content, index)
+
+
+def _embedded_json(content: str) -> list[tuple[int, int, Any]]:
+    found = []
+    index = content.find("{")
+    while index != -1:
+        try:
+            value, end = _decode_json_at(content, index)
+        except ValueError:
+            index = content.find("{", index + 1)
+            continue
+        found.append((index, end, value))
+        index = content.find("{", end)
+    return found
+
+
+def _as_tool_call(value: Any, expected_tools: Sequence[str]) -> Optional[ToolCall]:
+    """Read `{"name": ..., "arguments": ...}`, also wrapped in `"function"`."""
+    if not isinstance(value, dict):
+        return None
+    function = value.get("function", value)
+    if not isinstance(function, dict) or not isinstance(function.get("name"), str):
+        return None
+    name = _match_tool_name(function["name"], expected_tools)
+    args = function.get("arguments", function.get("args", {}))
+    if isinstance(args, str):
+        try:
+            args = json.loads(args)
+        except ValueError:
+            return None
+    if name is None or not isinstance(args, dict):
+        return None
+    return _new_tool_call(name, args)
+
+
+def _has_json_tool_call(message: BaseMessage, expected_tools) -> bool:
+    """Whether the content has a JSON call to an expected tool, written
+    instead of a real tool call."""
+    if getattr(message, "tool_calls", None) or not isinstance(message.content, str):
+        return False
+    if not expected_tools:
+        return False
+    return any(
+        _as_tool_call(value, expected_tools) is not None
+        for _, _, value in _embedded_json(message.content)
+    )
+
+
+def _leaked_tool_calls(
+    content: str,
+    expected_tools: Sequence[str],
+) -> tuple[str, list[ToolCall]]:
+    """Turn `[... functions.X]` text, optionally followed by JSON arguments,
+    into tool calls and return the content without it."""
+    tool_calls = []
+    parts = []
+    position = 0
+    for match in re.finditer(FUNCTION_CALL_PATTERN, content):
+        parts.append(content[position : match.start()])
+        position = match.end()
+        for name in FUNCTION_NAME_PATTERN.findall(match.group()):
+            tool = _match_tool_name(name, expected_tools)
+            if tool is None:
+                continue
+            args: Any = {}
+            rest = content[position:]
+            if rest.lstrip().startswith("{"):
+                start = position + len(rest) - len(rest.lstrip())
+                try:
+                    args, position = _decode_json_at(content, start)
+                except ValueError:
+                    args = {}
+            if isinstance(args, dict):
+                tool_calls.append(_new_tool_call(tool, args))
+    parts.append(content[position:])
+    return "".join(parts).strip(), tool_calls
+
+
+@dataclass
+class RepairedMessage:
+    content: str
+    tool_calls: list[ToolCall]
+    repairs: list[str]
+
+
+def repair_ai_message(
+    ai_result: BaseMessage,
     maximum_tool_calls=float("inf"),
     expected_tools=None,
-) -> Optional[List[BaseMessage]]:
+) -> Optional[RepairedMessage]:
     """
-    Handle missing tool calls in the AI result.
+    Fix the common mistakes of an AI result without calling the LLM again.
 
-    Args:
-        ctx: RequestContext
-        state: Dict[str, Any]: The state of the agent
-        ai_result: The AI result
-        retry_counter: The number of retries
-        maximum_retries: The maximum number of retries
-        minimum_tool_calls: The minimum number of tool calls expected in the AI result
-        maximum_tool_calls: The maximum number of tool calls expected in the AI result
-        expected_tools: The list of expected tool calls
+    Tool calls written into the content, as JSON or as `[functions.X]` text,
+    become real tool calls when they name an expected tool, near-miss tool
+    names are mapped to the expected ones and extra tool calls are dropped.
 
     Returns:
-        True: If the missing tool call is handled successfully
-        False: If the missing tool call is not handled successfully or retry counter is exceeded
+        The repaired content and tool calls, or None if nothing can be repaired
     """
+    content = ai_result.content
+    tool_calls = list(getattr(ai_result, "tool_calls", None) or [])
+    repairs = []
 
-    logger = ctx.logger()
-    if retry_counter > maximum_retries:
-        logger.error("Exceeded maximum retries for missing tool calls")
+    if isinstance(content, str) and content and expected_tools and not tool_calls:
+        for start, end, value in reversed(_embedded_json(content)):
+            tool_call = _as_tool_call(value, expected_tools)
+            if tool_call is not None:
+                tool_calls.insert(0, tool_call)
+                content = content[:start] + content[end:]
+        if tool_calls:
+            content = content.strip()
+            repairs.append("json_tool_call")
+
+    if isinstance(content, str) and re.search(FUNCTION_CALL_PATTERN, content):
+        stripped, leaked = _leaked_tool_calls(content, expected_tools or [])
+        names = FUNCTION_NAME_PATTERN.findall(content)
+        if names and not tool_calls and not leaked:
+            # The LLM meant to call a tool that we cannot identify.
+            return None
+        content = stripped
+        tool_calls = tool_calls or leaked
+        repairs.append("function_call_text")
+
+    if expected_tools:
+        for i, tool_call in enumerate(tool_calls):
+            tool = _match_tool_name(tool_call["name"], expected_tools)
+            if tool is not None and tool != tool_call["name"]:
+                tool_calls[i] = ToolCall(
+                    name=tool, args=tool_call["args"], id=tool_call["id"]
+                )
+                repairs.append("tool_name")
+
+    if len(tool_calls) > maximum_tool_calls:
+        tool_calls = tool_calls[: int(maximum_tool_calls)]
+        repairs.append("truncated_tool_calls")
+
+    if not repairs:
         return None
+    return RepairedMessage(content=content, tool_calls=tool_calls, repairs=repairs)
 
+
+def _find_problem(
+    logger,
+    ai_result,
+    minimum_tool_calls,
+    maximum_tool_calls,
+    expected_tools,
+) -> Optional[tuple[str, str]]:
+    """Return the reason and the retry instruction of an invalid AI result."""
     if not _verify_content(ai_result):
-        logger.debug(
-            f"Invalid content found in the AI result: {ai_result}. Retrying..."
-        )
-        messages = add_messages(
-            state[BaseAgentStateFields.MESSAGES],
-            [
-                SystemMessage("Content must not contain any function calls."),
-            ],
-        )
-        logger.info("Retrying with instruction message")
-        return messages
+        logger.debug(f"Invalid content found in the AI result: {ai_result}.")
+        return "function_call_text", "Content must not contain any function calls."
+    if _has_json_tool_call(ai_result, expected_tools):
+        logger.debug(f"Tool call written in the content of the AI result: {ai_result}.")
+        return "json_tool_call", "Content must not contain any function calls."
 
     tool_calls_name = (
         [tool_call.get("name") for tool_call in ai_result.tool_calls]
@@ -87,57 +258,107 @@ def verify_ai_message(
         else []
     )
     if invalid_tool_calls:
-        logger.debug(f"Tool calls {invalid_tool_calls} are not valid. Retrying...")
-        messages = add_messages(
-            state[BaseAgentStateFields.MESSAGES],
-            [
-                SystemMessage(
-                    f"Your provided tools are: {expected_tools}. DO NOT MAKE UP NEW TOOLS!"
-                ),
-            ],
+        logger.debug(f"Tool calls {invalid_tool_calls} are not valid.")
+        return (
+            "tool_name",
+            f"Your provided tools are: {expected_tools}. DO NOT MAKE UP NEW TOOLS!",
         )
-        logger.info("Retrying with the updated messages to get valid output...")
-        return messages
 
     num_tool_calls = len(tool_calls_name)
     if num_tool_calls == 0 and not _has_content(ai_result):
         logger.debug(
-            f"Tool call or content is expected but not found in the AI result: {ai_result}. Retrying..."
-        )
-        messages = add_messages(
-            state[BaseAgentStateFields.MESSAGES],
-            [
-                SystemMessage("Response must contain a tool calls or content."),
-            ],
+            f"Tool call or content is expected but not found in the AI result: {ai_result}."
         )
-        logger.info("Retrying with the updated messages to get valid output...")
-        return messages
-
+        return "empty", "Response must contain a tool calls or content."
     elif num_tool_calls < minimum_tool_calls:
         logger.debug(
-            f"{minimum_tool_calls} Tool calls is expected but not found in the AI result: {ai_result}. Retrying..."
-        )
-        messages = add_messages(
-            state[BaseAgentStateFields.MESSAGES],
-            [
-                SystemMessage("Only response with tool call."),
-            ],
+            f"{minimum_tool_calls} Tool calls is expected but not found in the AI result: {ai_result}."
         )
-        logger.info("Retrying with the updated messages to get valid output...")
-        return messages
+        return "missing_tool_calls", "Only response with tool call."
     elif num_tool_calls > maximum_tool_calls:
         logger.debug(
-            f"Only one tool call is expected but found {num_tool_calls} in the AI result: "
-            f"{ai_result}. Retrying..."
+            f"Only {maximum_tool_calls} tool calls are expected but found {num_tool_calls} "
+            f"in the AI result: {ai_result}."
         )
-        messages = add_messages(
-            state[BaseAgentStateFields.MESSAGES],
-            [
-                SystemMessage(
-                    f"Only response with at most {maximum_tool_calls} tool calls."
-                ),
-            ],
+        return (
+            "too_many_tool_calls",
+            f"Only response with at most {maximum_tool_calls} tool calls.",
         )
-        logger.info("Retrying with the updated messages to get valid output...")
-        return messages
     return None
+
+
+def verify_ai_message(
+    ctx: RequestContext,
+    state: Dict[str, Any],
+    ai_result,
+    retry_counter,
+    maximum_retries=3,
+    minimum_tool_calls=0,
+    maximum_tool_calls=float("inf"),
+    expected_tools=None,
+) -> Optional[List[BaseMessage]]:
+    """
+    Handle missing tool calls in the AI result.
+
+    An invalid AI result is repaired in place when `repair_ai_message` can fix
+    it, otherwise the messages to retry the LLM with are returned.
+
+    Args:
+        ctx: RequestContext
+        state: Dict[str, Any]: The state of the agent
+        ai_result: The AI result
+        retry_counter: The number of retries
+        maximum_retries: The maximum number of retries
+        minimum_tool_calls: The minimum number of tool calls expected in the AI result
+        maximum_tool_calls: The maximum number of tool calls expected in the AI result
+        expected_tools: The list of expected tool calls
+
+    Returns:
+        None: If the AI result is valid, has been repaired or retry counter is exceeded
+        The messages to retry with otherwise
+    """
+
+    logger = ctx.logger()
+    problem = _find_problem(
+        logger, ai_result, minimum_tool_calls, maximum_tool_calls, expected_tools
+    )
+    if problem is None:
+        return None
+
+    if isinstance(ai_result, AIMessage):
+        repaired = repair_ai_message(ai_result, maximum_tool_calls, expected_tools)
+        if repaired is not None:
+            candidate = AIMessage(
+                content=repaired.content, tool_calls=repaired.tool_calls
+            )
+            if (
+                _find_problem(
+                    logger,
+                    candidate,
+                    minimum_tool_calls,
+                    maximum_tool_calls,
+                    expected_tools,
+                )
+                is None
+            ):
+                ai_result.content = repaired.content
+                ai_result.tool_calls = repaired.tool_calls
+                for kind in repaired.repairs:
+                    LLM_OUTPUT_REPAIRS.labels(kind=kind).inc()
+                logger.info(f"Repaired the AI result locally: {repaired.repairs}")
+                return None
+
+    if retry_counter > maximum_retries:
+        logger.error("Exceeded maximum retries for missing tool calls")
+        return None
+
+    reason, instruction = problem
+    LLM_OUTPUT_RETRIES.labels(reason=reason).inc()
+    messages = add_messages(
+        state[BaseAgentStateFields.MESSAGES],
+        [
+            SystemMessage(instruction),
+        ],
+    )
+    logger.info("Retrying with the updated messages to get valid output...")
+    return messages
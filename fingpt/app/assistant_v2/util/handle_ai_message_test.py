@@ -6,7 +6,10 @@ from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, Tool
 from app.assistant_v2.common.base_agent_state import BaseAgentStateFields
 from app.assistant_v2.util.handle_ai_message import (
     _has_content,
+    _match_tool_name,
     _verify_content,
+    bound_tool_names,
+    repair_ai_message,
     verify_ai_message,
 )
 
@@ -49,7 +52,7 @@ def test_verify_ai_message_less_than_minimum_tool_calls(mock_context, mock_state
     assert result[-1].content == "Only response with tool call."
 
 
-def test_verify_ai_message_more_than_maximum_tool_calls(mock_context, mock_state):
+def test_verify_ai_message_truncates_extra_tool_calls(mock_context, mock_state):
     ai_result = AIMessage(
         content="Valid content",
         tool_calls=[
@@ -62,10 +65,8 @@ def test_verify_ai_message_more_than_maximum_tool_calls(mock_context, mock_state
     result = verify_ai_message(
         mock_context, mock_state, ai_result, retry_counter, maximum_tool_calls=1
     )
-    assert result is not None
-    assert len(result) == 2
-    assert isinstance(result[-1], SystemMessage)
-    assert result[-1].content == "Only response with at most 1 tool calls."
+    assert result is None
+    assert [tool_call["name"] for tool_call in ai_result.tool_calls] == ["tool1"]
 
 
 def test_verify_ai_message_valid_tool_calls_and_content(mock_context, mock_state):
@@ -131,3 +132,128 @@ def test_verify_invalid_content():
     assert _verify_content(message) is False
     assert _verify_content(message_2) is True
     assert _verify_content(mesasge_3) is True
+
+
+def test_verify_ai_message_maps_near_miss_tool_names(mock_context, mock_state):
+    ai_result = AIMessage(
+        content="",
+        tool_calls=[ToolCall(name="get_contcats", id="123", args={"name": "Bob"})],
+    )
+
+    result = verify_ai_message(
+        mock_context,
+        mock_state,
+        ai_result,
+        0,
+        expected_tools=["get_contacts", "get_accounts"],
+    )
+
+    assert result is None
+    assert ai_result.tool_calls[0]["name"] == "get_contacts"
+    assert ai_result.tool_calls[0]["args"] == {"name": "Bob"}
+
+
+def test_verify_ai_message_parses_json_tool_call(mock_context, mock_state):
+    ai_result = AIMessage(
+        content=r'Let me check. {"name": "get_contacts", "arguments": "{\"name\": \"Bob\"}"}'
+    )
+
+    result = verify_ai_message(
+        mock_context,
+        mock_state,
+        ai_result,
+        0,
+        minimum_tool_calls=1,
+        expected_tools=["get_contacts"],
+    )
+
+    assert result is None
+    assert ai_result.content == "Let me check."
+    assert ai_result.tool_calls[0]["name"] == "get_contacts"
+    assert ai_result.tool_calls[0]["args"] == {"name": "Bob"}
+
+
+def test_verify_ai_message_parses_json_tool_call_when_none_is_required(
+    mock_context, mock_state
+):
+    ai_result = AIMessage(
+        content='{"name": "get_contacts", "arguments": {"name": "Bob"}}'
+    )
+
+    result = verify_ai_message(
+        mock_context,
+        mock_state,
+        ai_result,
+        0,
+        minimum_tool_calls=0,
+        expected_tools=["get_contacts"],
+    )
+
+    assert result is None
+    assert ai_result.content == ""
+    assert ai_result.tool_calls[0]["name"] == "get_contacts"
+    assert ai_result.tool_calls[0]["args"] == {"name": "Bob"}
+
+
+def test_verify_ai_message_keeps_json_that_is_not_a_tool_call(mock_context, mock_state):
+    ai_result = AIMessage(content='Your limits: {"daily": 500, "monthly": 2000}')
+
+    result = verify_ai_message(
+        mock_context, mock_state, ai_result, 0, expected_tools=["get_contacts"]
+    )
+
+    assert result is None
+    assert ai_result.content == 'Your limits: {"daily": 500, "monthly": 2000}'
+    assert ai_result.tool_calls == []
+
+
+def test_verify_ai_message_converts_function_call_text(mock_context, mock_state):
+    ai_result = AIMessage(
+        content='Sure.\n\n [Assistant to=functions.NoticeDepositAmountTool] {"amount": 5}'
+    )
+
+    result = verify_ai_message(
+        mock_context,
+        mock_state,
+        ai_result,
+        0,
+        expected_tools=["NoticeDepositAmountTool"],
+    )
+
+    assert result is None
+    assert ai_result.content == "Sure."
+    assert ai_result.tool_calls[0]["name"] == "NoticeDepositAmountTool"
+    assert ai_result.tool_calls[0]["args"] == {"amount": 5}
+
+
+def test_verify_ai_message_retries_unknown_function_call_text(mock_context, mock_state):
+    ai_result = AIMessage(content="Sure. [Assistant to=functions.UnknownTool]")
+
+    result = verify_ai_message(
+        mock_context, mock_state, ai_result, 0, expected_tools=["get_contacts"]
+    )
+
+    assert result is not None
+    assert result[-1].content == "Content must not contain any function calls."
+
+
+def test_repair_ai_message_leaves_valid_message_alone():
+    ai_result = AIMessage(
+        content="Hello", tool_calls=[ToolCall(name="tool1", id="1", args={})]
+    )
+
+    assert repair_ai_message(ai_result, 1, ["tool1"]) is None
+
+
+def test_match_tool_name():
+    tools = ["ToTransferAgent", "ToCardAgent"]
+    assert _match_tool_name("functions.ToTransferAgent", tools) == "ToTransferAgent"
+    assert _match_tool_name("to_transfer_agent", tools) == "ToTransferAgent"
+    assert _match_tool_name("ToTransferAgnet", tools) == "ToTransferAgent"
+    assert _match_tool_name("ToLoanAgent", tools) is None
+
+
+def test_bound_tool_names():
+    from app.assistant_v2.primary.constant import PRIMARY_ASSISTANT_TOOLS
+
+    assert "ToTransferAgent" in bound_tool_names(PRIMARY_ASSISTANT_TOOLS)
@@ -1,10 +1,13 @@
-from typing import List
+from typing import Any, Callable, List, Optional
 
 from langchain_core.prompts import MessagesPlaceholder
+from langchain_core.runnables import Runnable
 from langchain_core.runnables.config import RunnableConfig
 
 from app.assistant_v2.constant import CONFIGURABLE_CONTEXT_KEY, CONTEXT_KEY
 from app.core import RequestContext
+from app.core.metrics import record_cache
+from app.entity import ChatPrompt
 from app.prompt.prompt_service import PromptService
 
 
@@ -15,6 +18,63 @@ def extract_config(config: RunnableConfig):
     return config_data, ctx, logger
 
 
+class PreparedChainCache:
+    """Chains ready to invoke, prepared once per prompt version.
+
+    A chain is keyed by the prompt name and label and the identity of the
+    bound tools. The model config is part of the Langfuse prompt version, and
+    only the chain of the latest version is kept, so publishing a new version
+    replaces it on the next call.
+    """
+
+    def __init__(self) -> None:
+        self._chains: dict[tuple, tuple[Optional[int], Runnable]] = {}
+
+    @staticmethod
+    def _key(prompt: ChatPrompt, label: str, tool_list: List) -> tuple:
+        return (
+            prompt.name,
+            label,
+            tuple(id(tool) for tool in tool_list),
+        )
+
+    def get_or_prepare(
+        self,
+        prompt: ChatPrompt,
+        label: str,
+        tool_list: List,
+        prepare: Callable[[], Runnable],
+    ) -> Runnable:
+        if prompt.version is None:
+            return prepare()
+        key = self._key(prompt, label, tool_list)
+        cached = self._chains.get(key)
+        hit = cached is not None and cached[0] == prompt.version
+        record_cache("prepared_chain", hit)
+        if hit:
+            return cached[1]  # type: ignore
+        chain = prepare()
+        self._chains[key] = (prompt.version, chain)
+        return chain
+
+    def clear(self) -> None:
+        self._chains.clear()
+
+    def __len__(self) -> int:
+        return len(self._chains)
+
+
+prepared_chains = PreparedChainCache()
+
+
+def _prepare_chain(prompt: ChatPrompt, tool_list: List) -> Any:
+    prompt_tmpl = prompt.tmpl + MessagesPlaceholder(variable_name="messages")
+    prompt_with_tools = prompt_tmpl.partial(
+        tool_names=", ".join([tool.name for tool in tool_list])
+    )
+    return prompt_with_tools | prompt.llm_model.bind_tools(tool_list)
+
+
 @staticmethod
 async def build_chain(
     ctx: RequestContext,
@@ -29,9 +89,9 @@ async def build_chain(
         label=prompt_label,
         type="chat",
     )
-    prompt_tmpl = prompt.tmpl + MessagesPlaceholder(variable_name="messages")
-    prompt_with_tools = prompt_tmpl.partial(
-        tool_names=", ".join([tool.name for tool in tool_list])
+    return prepared_chains.get_or_prepare(
+        prompt,
+        prompt_label,
+        tool_list,
+        lambda: _prepare_chain(prompt, tool_list),
     )
-    agent = prompt_with_tools | prompt.llm_model.bind_tools(tool_list)
-    return agent
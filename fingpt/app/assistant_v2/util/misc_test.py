@@ -5,7 +5,7 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import AzureChatOpenAI
 
 from app.assistant_v2.constant import CONFIGURABLE_CONTEXT_KEY, CONTEXT_KEY
-from app.assistant_v2.util.misc import build_chain, extract_config
+from app.assistant_v2.util.misc import build_chain, extract_config, prepared_chains
 from app.core import RequestContext
 from app.prompt.prompt_service import PromptService
 
@@ -57,3 +57,64 @@ async def test_build_chain():
 
     mock_prompt.llm_model.bind_tools.assert_called_once_with(tool_list)
     assert result is not None
+
+
+@pytest.fixture(autouse=True)
+def clear_prepared_chains():
+    prepared_chains.clear()
+    yield
+    prepared_chains.clear()
+
+
+def _prompt(version):
+    prompt = MagicMock()
+    prompt.name = "test_prompt"
+    prompt.version = version
+    prompt.tmpl = ChatPromptTemplate.from_messages([("human", "Test template")])
+    prompt.llm_model = MagicMock(spec=AzureChatOpenAI)
+    return prompt
+
+
+@pytest.mark.asyncio
+async def test_build_chain_reuses_chain_of_same_prompt_version():
+    mock_prompt_srv = MagicMock(spec=PromptService)
+    prompt = _prompt(version=1)
+    mock_prompt_srv.get_prompt.return_value = prompt
+    tool = MagicMock()
+    tool.name = "TestTool"
+
+    first = await build_chain(MagicMock(), mock_prompt_srv, "p", "l", [tool])
+    second = await build_chain(MagicMock(), mock_prompt_srv, "p", "l", [tool])
+
+    assert first is second
+    assert mock_prompt_srv.get_prompt.call_count == 2
+    prompt.llm_model.bind_tools.assert_called_once_with([tool])
+
+
+@pytest.mark.asyncio
+async def test_build_chain_rebuilds_chain_of_new_prompt_version():
+    mock_prompt_srv = MagicMock(spec=PromptService)
+    tool = MagicMock()
+    tool.name = "TestTool"
+
+    mock_prompt_srv.get_prompt.return_value = _prompt(version=1)
+    first = await build_chain(MagicMock(), mock_prompt_srv, "p", "l", [tool])
+    mock_prompt_srv.get_prompt.return_value = _prompt(version=2)
+    second = await build_chain(MagicMock(), mock_prompt_srv, "p", "l", [tool])
+
+    assert first is not second
+    assert len(prepared_chains) == 1
+
+
+@pytest.mark.asyncio
+async def test_build_chain_does_not_cache_unversioned_prompts():
+    mock_prompt_srv = MagicMock(spec=PromptService)
+    mock_prompt_srv.get_prompt.return_value = _prompt(version=None)
+    tool = MagicMock()
+    tool.name = "TestTool"
+
+    first = await build_chain(MagicMock(), mock_prompt_srv, "p", "l", [tool])
+    second = await build_chain(MagicMock(), mock_prompt_srv, "p", "l", [tool])
+
+    assert first is not second
+    assert len(prepared_chains) == 0
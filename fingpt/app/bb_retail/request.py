@@ -1,5 +1,7 @@
 import json
+import time
 from typing import Any, Optional, Union
+from urllib.parse import urlparse
 
 import aiofiles
 from aiohttp import ClientResponse, ClientSession
@@ -7,6 +9,7 @@ from aiohttp import ClientResponse, ClientSession
 from app.bb_retail.api_parser_factory import ApiParserFactory
 from app.bb_retail.url_provider_factory import UrlProviderFactory
 from app.core.context import RequestContext
+from app.core.metrics import EBP_REQUEST_DURATION
 from app.entity import BbHeader, BbQueryPaging, BbQueryParams, UnauthorizedError
 from app.entity.bb_api import BbApiConfig, BBRuntime
 from app.entity.card import Card  # type: ignore
@@ -176,14 +179,22 @@ class BbApiRequest:
         logger = ctx.logger()
         logger.debug(f"Making request to {url}...")
         logger.debug(f"Params: {params.model_dump() if params else None}")
-        async with ClientSession() as session:
-            async with session.get(
-                url=url,
-                headers=header.model_dump(),
-                params=params.model_dump() if params else None,
-            ) as resp:
-                await self._handle_response_errors(resp, url)
-                return await resp.json()
+        start = time.perf_counter()
+        status = "error"
+        try:
+            async with ClientSession() as session:
+                async with session.get(
+                    url=url,
+                    headers=header.model_dump(),
+                    params=params.model_dump() if params else None,
+                ) as resp:
+                    status = str(resp.status)
+                    await self._handle_response_errors(resp, url)
+                    return await resp.json()
+        finally:
+            EBP_REQUEST_DURATION.labels(
+                endpoint=urlparse(url).path or "/", status=status
+            ).observe(time.perf_counter() - start)
 
     @staticmethod
     async def _handle_response_errors(resp: ClientResponse, url: str) -> None:
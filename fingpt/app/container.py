@@ -7,9 +7,10 @@ from app.auth.auth_module import AuthModule
 from app.command.command_module import CommandModule
 from app.core.config import settings
 from app.intent.intent_module import IntentModule
+from app.llm.llm_module import LlmModule
 from app.profile.profile_module import ProfileModule
 from app.ticker.ticker_module import TickerModule
-from app.utils import SemanticCache
+from app.utils import CachedEmbeddings, SemanticCache, SqliteLlmCache
 
 
 class ServerContainer(containers.DeclarativeContainer):
@@ -31,21 +32,37 @@ class ServerContainer(containers.DeclarativeContainer):
     command_module = providers.Container(CommandModule)
     profile_module = providers.Container(ProfileModule)
     intent_module = providers.Container(IntentModule)
+    llm_module = providers.Container(LlmModule)
 
     emb_srv: providers.Provider[AzureOpenAIEmbeddings] = providers.Singleton(
         AzureOpenAIEmbeddings, azure_deployment=settings.azure_text_embedding_deployment
     )
+    embeddings: providers.Provider[CachedEmbeddings] = providers.Singleton(
+        CachedEmbeddings,
+        embeddings=emb_srv,
+        cache_size=settings.embedding_cache_size,
+        max_batch_size=settings.embedding_max_batch_size,
+        max_wait=settings.embedding_max_wait,
+    )
     chroma: providers.Provider[Chroma] = providers.Singleton(
         Chroma,
         collection_name=settings.chroma_collection_name,
-        embedding_function=emb_srv,
+        embedding_function=embeddings,
         persist_directory=settings.chroma_persist_dir,
         collection_metadata={"hnsw:space": settings.chroma_search_distance},
         create_collection_if_not_exists=True,
     )
+    llm_cache: providers.Provider[SqliteLlmCache] = providers.Singleton(
+        SqliteLlmCache,
+        path=settings.llm_cache_path,
+        ttl=settings.llm_cache_ttl,
+        max_bytes=settings.llm_cache_max_bytes,
+    )
     semantic_cache: providers.Provider[SemanticCache] = providers.Singleton(
         SemanticCache,
         vector_store_srv=chroma,
-        emb_srv=emb_srv,
+        emb_srv=embeddings,
         score_threshold=0.9,
+        exact_size=settings.semantic_cache_exact_size,
+        conversation_size=settings.semantic_cache_conversation_size,
     )
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Optional
 
 from dotenv import load_dotenv
 from loguru import logger
@@ -36,6 +36,11 @@ class Settings(BaseSettings):
     llm_temperature: float = 0.0
 
     azure_text_embedding_deployment: str = ""
+    embedding_cache_size: int = 4096
+    # Concurrent queries are embedded together, waiting up to this many
+    # seconds for each other.
+    embedding_max_batch_size: int = 64
+    embedding_max_wait: float = 0.005
 
     chroma_collection_name: str = ""
     chroma_persist_dir: str = ""
@@ -105,6 +110,34 @@ class Settings(BaseSettings):
     ebp_test_account_password: str = ""
 
     assistant_state_path: str = ""
+    assistant_state_pool_size: int = 4
+    assistant_state_max_batch_size: int = 64
+    assistant_state_busy_timeout_ms: int = 5000
+    assistant_state_cache_size_kb: int = 16384
+    assistant_state_mmap_size: int = 268435456
+    assistant_state_write_timeout: float = 30.0
+    assistant_state_max_checkpoints_per_thread: int = 20
+    assistant_state_thread_ttl: float = 604800.0
+    assistant_state_compaction_interval: float = 3600.0
+    assistant_state_vacuum_min_free_ratio: float = 0.2
+    assistant_thread_max_waiters: int = 1
+    assistant_thread_wait_timeout: float = 30.0
+    assistant_thread_supersede: bool = False
+    assistant_graph_refresh_interval: float = 60.0
+    assistant_graph_warmup_timeout: float = 30.0
+    assistant_intent_router_enabled: bool = True
+    assistant_intent_router_threshold: float = 0.8
+    assistant_intent_router_margin: float = 0.15
+    assistant_intent_router_shadow_rate: float = 0.05
+    assistant_prefetch_enabled: bool = True
+    assistant_prefetch_min_confidence: float = 0.5
+    assistant_rolling_summary_enabled: bool = True
+    assistant_summary_min_messages: int = 4
+    assistant_summary_max_tail: int = 6
+    assistant_choice_fast_path_enabled: bool = True
+    context_window_encoding: str = "o200k_base"
+    context_window_max_tokens: int = 8000
+    context_window_node_budgets: dict[str, int] = {}
 
     assistant_primary_prompt: str = ""
     assistant_primary_label: str = ""
@@ -119,6 +152,58 @@ class Settings(BaseSettings):
     sentry_profiles_sample_rate: float = 0.0
 
     enable_semantic_cache: bool = False
+    # Entries of the in-process exact tier of the semantic cache, and parsed
+    # prompts it keeps.
+    semantic_cache_exact_size: int = 1024
+    semantic_cache_conversation_size: int = 1024
+    # Exact-match LLM cache when the semantic cache is off: "sqlite" or "memory".
+    llm_cache_backend: str = "sqlite"
+    llm_cache_path: str = "llm_cache.db"
+    llm_cache_ttl: float = 86400.0
+    llm_cache_max_bytes: int = 268435456
+
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 60.0
+    llm_single_flight_enabled: bool = True
+    llm_scheduler_enabled: bool = True
+    llm_tokens_per_minute: int = 0
+    llm_requests_per_minute: int = 0
+    llm_completion_token_estimate: int = 500
+    llm_max_retries: int = 2
+    llm_max_backoff: float = 60.0
+    llm_stream_usage: bool = False
+    llm_usage_max_threads: int = 10000
+    llm_usage_in_response: bool = False
+    # Deployment to (prompt, completion) price per 1K tokens.
+    llm_token_costs: dict[str, tuple[float, float]] = {}
+    llm_hedge_enabled: bool = False
+    # Equivalent deployments, calls to one are hedged on the next one.
+    llm_hedge_deployments: list[str] = []
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_delay: float = 0.5
+    llm_hedge_max_delay: float = 10.0
+    llm_hedge_min_samples: int = 20
+    llm_hedge_window: int = 200
+    # Model tiers, e.g. {"fast": {"azure_deployment": "gpt-4o-mini",
+    # "max_tokens": 512, "timeout": 15}}, and the tier of graph nodes and
+    # prompt names. Shadow rules send a sample of the calls of a node or
+    # prompt to a candidate tier too, to compare the answers.
+    llm_routing_tiers: dict[str, dict[str, Any]] = {}
+    llm_routing_nodes: dict[str, str] = {}
+    llm_routing_prompts: dict[str, str] = {}
+    llm_routing_shadow: dict[str, str] = {}
+    llm_routing_shadow_rate: float = 0.0
+
+    evaluation_queue_size: int = 100
+    evaluation_workers: int = 2
+    evaluation_sample_rate: float = 1.0
+    evaluation_drain_timeout: float = 10.0
+
+    prompt_cache_ttl: float = 60.0
+    prompt_fetch_timeout: int = 10
+    prompt_bundle_path: str = ""
+    prompt_bundle_offline: bool = False
 
     analyze_intent_prompt: str = ""
     analyze_intent_label: str = ""
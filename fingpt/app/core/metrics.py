@@ -0,0 +1,292 @@
+import time
+from typing import Any, Optional
+from uuid import UUID
+
+from fastapi import Request
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+# LLM turns and graph nodes run for seconds, the default buckets stop at 10s.
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "fingpt_http_request_duration_seconds",
+    "Latency of HTTP requests by route template.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+GRAPH_NODE_DURATION = Histogram(
+    "fingpt_graph_node_duration_seconds",
+    "Latency of LangGraph nodes, subgraph nodes are prefixed by their parent.",
+    ["node", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_DURATION = Histogram(
+    "fingpt_llm_call_duration_seconds",
+    "Latency of chat model calls by Langfuse prompt name.",
+    ["prompt", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+EBP_REQUEST_DURATION = Histogram(
+    "fingpt_ebp_request_duration_seconds",
+    "Latency of Backbase (EBP) API calls by endpoint path.",
+    ["endpoint", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "fingpt_cache_requests",
+    "Cache lookups by result, the hit ratio is hit / (hit + miss).",
+    ["cache", "result"],
+)
+LLM_CACHE_BYTES = Gauge(
+    "fingpt_llm_cache_bytes",
+    "Size of the entries of the persistent LLM cache.",
+)
+LLM_CACHE_EVICTIONS = Counter(
+    "fingpt_llm_cache_evictions",
+    "Entries removed from the persistent LLM cache, by reason.",
+    ["reason"],
+)
+PROMPT_FETCH_DURATION = Histogram(
+    "fingpt_prompt_fetch_duration_seconds",
+    "Latency of Langfuse prompt fetches, run off the event loop.",
+    ["status"],
+    buckets=LATENCY_BUCKETS,
+)
+PROMPT_STALE_SERVES = Counter(
+    "fingpt_prompt_stale_serves",
+    "Prompts served from the cache past their TTL while being refreshed.",
+)
+LLM_COALESCED_CALLS = Counter(
+    "fingpt_llm_coalesced_calls",
+    "LLM calls answered by an identical call already in flight, by prompt.",
+    ["prompt"],
+)
+LLM_SCHEDULER_QUEUE_DEPTH = Gauge(
+    "fingpt_llm_scheduler_queue_depth",
+    "LLM calls waiting for rate-limit budget, by priority.",
+    ["priority"],
+)
+LLM_SCHEDULER_WAIT = Histogram(
+    "fingpt_llm_scheduler_wait_seconds",
+    "Time LLM calls waited for rate-limit budget, by priority.",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_RATE_LIMITED = Counter(
+    "fingpt_llm_rate_limited",
+    "LLM calls rejected by Azure with a 429, by deployment.",
+    ["deployment"],
+)
+EVALUATION_QUEUE_DEPTH = Gauge(
+    "fingpt_evaluation_queue_depth",
+    "Background jobs waiting for a worker, by pipeline.",
+    ["pipeline"],
+)
+EVALUATION_JOBS = Counter(
+    "fingpt_evaluation_jobs",
+    "Background jobs run by the workers, by pipeline and status.",
+    ["pipeline", "status"],
+)
+EVALUATION_JOBS_DROPPED = Counter(
+    "fingpt_evaluation_jobs_dropped",
+    "Background jobs not run, by pipeline and reason.",
+    ["pipeline", "reason"],
+)
+LLM_TOKENS = Counter(
+    "fingpt_llm_tokens",
+    "Tokens used by LLM calls, by prompt, graph node and kind.",
+    ["prompt", "node", "kind"],
+)
+LLM_COST = Counter(
+    "fingpt_llm_cost",
+    "Cost of LLM calls from the configured token prices, by prompt and node.",
+    ["prompt", "node"],
+)
+LLM_HEDGED_CALLS = Counter(
+    "fingpt_llm_hedged_calls",
+    "LLM calls of hedged prompts by outcome: not hedged, or won by the primary "
+    "or the backup deployment.",
+    ["prompt", "outcome"],
+)
+LLM_HEDGE_SAVED = Histogram(
+    "fingpt_llm_hedge_saved_seconds",
+    "Estimated latency saved by backup LLM calls that won, by prompt.",
+    ["prompt"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_SHADOW_CALLS = Counter(
+    "fingpt_llm_shadow_calls",
+    "LLM calls also sent to a candidate model tier, by whether it answered "
+    "the same.",
+    ["prompt", "tier", "outcome"],
+)
+
+EMBEDDING_CALL_DURATION = Histogram(
+    "fingpt_embedding_call_duration_seconds",
+    "Latency of embedding service calls.",
+    ["status"],
+    buckets=LATENCY_BUCKETS,
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "fingpt_embedding_batch_size",
+    "Texts sent per embedding service call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+LLM_OUTPUT_REPAIRS = Counter(
+    "fingpt_llm_output_repairs",
+    "Malformed LLM outputs fixed locally, by kind of repair.",
+    ["kind"],
+)
+LLM_OUTPUT_RETRIES = Counter(
+    "fingpt_llm_output_retries",
+    "LLM calls repeated because the output could not be repaired, by reason.",
+    ["reason"],
+)
+
+PROMPT_NAME_METADATA_KEY = "prompt_name"
+UNKNOWN_LABEL = "unknown"
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render_metrics() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(
+        self,
+        request: Request,
+        call_next: Any,
+    ):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # The route template keeps path parameters out of the labels.
+            route = request.scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method=request.method,
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            ).observe(time.perf_counter() - start)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Times LangGraph nodes and chat model calls of a graph run.
+
+    Nodes are recognised by their `langgraph_node` metadata, a node running in
+    a subgraph is labelled with the node that invoked the subgraph, e.g.
+    `money_transfer_workflow_node/call_model`. Chat models are labelled with
+    the prompt name set in their metadata by `ChatPrompt.llm_model`.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._parents: dict[UUID, Optional[UUID]] = {}
+        self._nodes: dict[UUID, tuple[str, float]] = {}
+        self._llm_calls: dict[UUID, tuple[str, float]] = {}
+
+    def _parent_node(self, run_id: Optional[UUID]) -> Optional[str]:
+        while run_id is not None:
+            if run_id in self._nodes:
+                return self._nodes[run_id][0]
+            run_id = self._parents.get(run_id)
+        return None
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._parents[run_id] = parent_run_id
+        node = (metadata or {}).get("langgraph_node")
+        if node is None or kwargs.get("name") != node:
+            return
+        parent = self._parent_node(parent_run_id)
+        label = f"{parent}/{node}" if parent else node
+        self._nodes[run_id] = (label, time.perf_counter())
+
+    def _end_chain(self, run_id: UUID, status: str) -> None:
+        self._parents.pop(run_id, None)
+        node = self._nodes.pop(run_id, None)
+        if node is not None:
+            label, start = node
+            GRAPH_NODE_DURATION.labels(node=label, status=status).observe(
+                time.perf_counter() - start
+            )
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_chain(run_id, "ok")
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        # LangGraph interrupts and control flow also end up here.
+        self._end_chain(run_id, type(error).__name__)
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        prompt = (metadata or {}).get(PROMPT_NAME_METADATA_KEY, UNKNOWN_LABEL)
+        self._llm_calls[run_id] = (prompt, time.perf_counter())
+
+    def _end_llm(self, run_id: UUID, status: str) -> None:
+        call = self._llm_calls.pop(run_id, None)
+        if call is not None:
+            prompt, start = call
+            LLM_CALL_DURATION.labels(prompt=prompt, status=status).observe(
+                time.perf_counter() - start
+            )
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_llm(run_id, "ok")
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end_llm(run_id, type(error).__name__)
@@ -0,0 +1,101 @@
+from typing import TypedDict
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langgraph.graph import END, StateGraph
+from prometheus_client import REGISTRY
+
+from app.core.metrics import (
+    PROMPT_NAME_METADATA_KEY,
+    MetricsCallbackHandler,
+    MetricsMiddleware,
+    record_cache,
+    render_metrics,
+)
+
+
+class CounterState(TypedDict):
+    count: int
+
+
+def _count(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _graph():
+    inner = StateGraph(CounterState)
+    inner.add_node("call_model", lambda state: {"count": state["count"] + 1})
+    inner.set_entry_point("call_model")
+    inner.add_edge("call_model", END)
+
+    outer = StateGraph(CounterState)
+    outer.add_node("workflow_node", inner.compile())
+    outer.set_entry_point("workflow_node")
+    outer.add_edge("workflow_node", END)
+    return outer.compile()
+
+
+async def test_callback_times_nodes_with_subgraph_prefix():
+    name = "fingpt_graph_node_duration_seconds_count"
+    before = _count(name, node="workflow_node/call_model", status="ok")
+    outer_before = _count(name, node="workflow_node", status="ok")
+
+    result = await _graph().ainvoke(
+        {"count": 0}, {"callbacks": [MetricsCallbackHandler()]}
+    )
+
+    assert result["count"] == 1
+    assert _count(name, node="workflow_node/call_model", status="ok") == before + 1
+    assert _count(name, node="workflow_node", status="ok") == outer_before + 1
+
+
+async def test_callback_times_chat_models_by_prompt():
+    name = "fingpt_llm_call_duration_seconds_count"
+    before = _count(name, prompt="greeting", status="ok")
+    model = FakeListChatModel(
+        responses=["hi"], metadata={PROMPT_NAME_METADATA_KEY: "greeting"}
+    )
+
+    await model.ainvoke("hello", {"callbacks": [MetricsCallbackHandler()]})
+
+    assert _count(name, prompt="greeting", status="ok") == before + 1
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: str):
+        return {"id": item_id}
+
+    app.add_api_route("/metrics", render_metrics)
+    name = "fingpt_http_request_duration_seconds_count"
+    before = _count(name, method="GET", route="/items/{item_id}", status="200")
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    response = client.get("/metrics")
+
+    assert (
+        _count(name, method="GET", route="/items/{item_id}", status="200") == before + 2
+    )
+    assert "fingpt_http_request_duration_seconds" in response.text
+
+
+def test_record_cache_counts_hits_and_misses():
+    hits = _count("fingpt_cache_requests_total", cache="test", result="hit")
+    misses = _count("fingpt_cache_requests_total", cache="test", result="miss")
+
+    record_cache("test", True)
+    record_cache("test", False)
+    record_cache("test", False)
+
+    assert _count("fingpt_cache_requests_total", cache="test", result="hit") == (
+        hits + 1
+    )
+    assert _count("fingpt_cache_requests_total", cache="test", result="miss") == (
+        misses + 2
+    )
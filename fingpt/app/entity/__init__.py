@@ -42,8 +42,11 @@ from .chat_response import (
     ChatRespMetadataForTransaction,
     ChatRespMetadataType,
     ChatRespTermDepositLabel,
+    ChatRespUsage,
+    ChatRespUsageEntry,
     TransactionChartData,
 )
+from .chat_stream import ChatStreamEvent, ChatStreamEventType
 from .error import (
     EbpInternalError,
     InvalidCredentialsError,
@@ -115,8 +118,12 @@ __all__ = [
     "ChatRespMetadataForTransaction",
     "ChatRespMetadataForTermDeposit",
     "ChatRespTermDepositLabel",
+    "ChatRespUsage",
+    "ChatRespUsageEntry",
     "TransactionChartData",
     "ChatRespDto",
+    "ChatStreamEvent",
+    "ChatStreamEventType",
     "MissingResponseError",
     "MissingStateDataError",
     "MissingExpectedInputError",
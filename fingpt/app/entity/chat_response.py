@@ -197,6 +197,21 @@ class ChatRespMetadataForOffer(ChatRespMetadataBaseType):
     offer: OfferResp
 
 
+class ChatRespUsageEntry(BaseModel):
+    calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+    latency: float
+
+
+class ChatRespUsage(BaseModel):
+    total: ChatRespUsageEntry
+    by_node: Dict[str, ChatRespUsageEntry]
+    by_prompt: Dict[str, ChatRespUsageEntry]
+    thread: Optional[ChatRespUsageEntry] = None
+
+
 class ChatRespDto(BaseModel):
     thread_id: Optional[str] = None
     response: str
@@ -212,3 +227,5 @@ class ChatRespDto(BaseModel):
         ChatRespMetadataForOffer,
         None,
     ]
+    # LLM usage of the request, only with `llm_usage_in_response`.
+    usage: Optional[ChatRespUsage] = None
@@ -0,0 +1,20 @@
+import json
+from enum import Enum
+from typing import Any, Dict
+
+from pydantic import BaseModel
+
+
+class ChatStreamEventType(str, Enum):
+    TOKEN = "token"  # use for assistant tokens, may belong to a retried attempt
+    PROGRESS = "progress"  # use for graph node progress
+    RESPONSE = "response"  # use for the final ChatRespDto, always the last event
+    ERROR = "error"
+
+
+class ChatStreamEvent(BaseModel):
+    event: ChatStreamEventType
+    data: Dict[str, Any]
+
+    def to_sse(self) -> str:
+        return f"event: {self.event.value}\ndata: {json.dumps(self.data)}\n\n"
@@ -41,3 +41,15 @@ class GuardrailInputError(Exception):
 
         # Now for your custom code...
         self.trace = trace
+
+
+class CheckpointWriterError(Exception):
+    pass
+
+
+class ThreadBusyError(Exception):
+    pass
+
+
+class TurnSupersededError(Exception):
+    pass
@@ -4,6 +4,7 @@ from langchain_core.prompts import ChatPromptTemplate
 from langfuse.model import ChatMessageDict
 
 from app.core.config import settings
+from app.llm.llm_registry import llm_registry
 from app.llm.llm_wrapper import AzureChatOpenAIWrapper
 
 
@@ -14,8 +15,10 @@ class ChatPrompt:
         chat_messages: list[ChatMessageDict],
         tmpl: ChatPromptTemplate,
         config: Optional[dict[str, Any]] = None,
+        version: Optional[int] = None,
     ):
         self.name = name
+        self.version = version
         self.chat_messages = chat_messages
         self.tmpl = tmpl
         self.configs = config or {}
@@ -29,4 +32,4 @@ class ChatPrompt:
             config["temperature"] = settings.llm_temperature
         if "api_version" not in config:
             config["api_version"] = settings.openai_api_version
-        return AzureChatOpenAIWrapper(**config)
+        return llm_registry.get(config, prompt_name=self.name)
@@ -6,7 +6,7 @@ from app.entity.prompt import ChatPrompt
 
 
 def test_llm_model_default_config(mocker):
-    mock_ai_wrapper = mocker.patch("app.entity.prompt.AzureChatOpenAIWrapper")
+    mock_registry = mocker.patch("app.entity.prompt.llm_registry")
     mocker.patch.object(settings, "azure_openai_deployment", "test_deployment")
     mocker.patch.object(settings, "llm_temperature", 0.7)
     mocker.patch.object(settings, "openai_api_version", "v1")
@@ -18,19 +18,23 @@ def test_llm_model_default_config(mocker):
         chat_messages=chat_messages,
         tmpl=tmpl,
     )
-    mock_instance = mock_ai_wrapper.return_value
     llm_model = chat_prompt.llm_model
 
-    mock_ai_wrapper.assert_called_once_with(
-        azure_deployment="test_deployment", temperature=0.7, api_version="v1"
+    mock_registry.get.assert_called_once_with(
+        {
+            "azure_deployment": "test_deployment",
+            "temperature": 0.7,
+            "api_version": "v1",
+        },
+        prompt_name="test_prompt",
     )
-    assert llm_model == mock_instance
+    assert llm_model == mock_registry.get.return_value
 
 
 def test_llm_model_remote_config(mocker):
     chat_messages = [ChatMessageDict(role="user", content="Hello")]
     tmpl = ChatPromptTemplate.from_messages([("system", "fake instruction")])
-    mock_ai_wrapper = mocker.patch("app.entity.prompt.AzureChatOpenAIWrapper")
+    mock_registry = mocker.patch("app.entity.prompt.llm_registry")
     mocker.patch.object(settings, "azure_openai_deployment", "test_deployment")
     mocker.patch.object(settings, "llm_temperature", 0.7)
     mocker.patch.object(settings, "openai_api_version", "v1")
@@ -47,7 +51,12 @@ def test_llm_model_remote_config(mocker):
     )
     llm_model = chat_prompt.llm_model
 
-    mock_ai_wrapper.assert_called_once_with(
-        azure_deployment="remote_deployment", temperature=0.5, api_version="v2"
+    mock_registry.get.assert_called_once_with(
+        {
+            "azure_deployment": "remote_deployment",
+            "temperature": 0.5,
+            "api_version": "v2",
+        },
+        prompt_name="test_2",
     )
-    assert llm_model == mock_ai_wrapper.return_value
+    assert llm_model == mock_registry.get.return_value
@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import random
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+
+from app.core.metrics import (
+    EVALUATION_JOBS,
+    EVALUATION_JOBS_DROPPED,
+    EVALUATION_QUEUE_DEPTH,
+)
+
+EvaluationJob = Callable[[], Awaitable[None]]
+
+
+class EvaluationPipeline:
+    """Runs evaluation jobs in the background on a fixed number of workers.
+
+    Jobs wait in a bounded queue. A job is dropped, and counted, when it is
+    not sampled, when the queue is full or once the pipeline is stopping, so
+    evaluations never pile up behind the responses they evaluate. Jobs run in
+    the context they were submitted from, to keep their Langfuse trace.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 100,
+        workers: int = 2,
+        sample_rate: float = 1.0,
+        name: str = "evaluation",
+    ):
+        self._queue_depth = EVALUATION_QUEUE_DEPTH.labels(pipeline=name)
+        self._name = name
+        self._max_queue_size = max_queue_size
+        self._workers = workers
+        self._sample_rate = sample_rate
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = False
+
+    def _drop(self, reason: str) -> bool:
+        EVALUATION_JOBS_DROPPED.labels(pipeline=self._name, reason=reason).inc()
+        return False
+
+    def submit(self, job: EvaluationJob) -> bool:
+        """Queue a job, return whether it was accepted."""
+        if self._stopping:
+            return self._drop("stopping")
+        if random.random() >= self._sample_rate:
+            return self._drop("sampled_out")
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_queue_size)
+            self._tasks = [
+                asyncio.create_task(self._work(self._queue))
+                for _ in range(self._workers)
+            ]
+        try:
+            self._queue.put_nowait((job, contextvars.copy_context()))
+        except asyncio.QueueFull:
+            return self._drop("queue_full")
+        self._queue_depth.inc()
+        return True
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            job, context = await queue.get()
+            self._queue_depth.dec()
+            status = "ok"
+            try:
+                await asyncio.create_task(job(), context=context)
+            except Exception as e:
+                status = "error"
+                logger.error(f"Evaluation job failed: {e}")
+            finally:
+                EVALUATION_JOBS.labels(pipeline=self._name, status=status).inc()
+                queue.task_done()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop accepting jobs and wait up to `timeout` for the queued ones."""
+        self._stopping = True
+        queue, tasks = self._queue, self._tasks
+        if queue is None:
+            return
+        try:
+            await asyncio.wait_for(queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {queue.qsize()} evaluation jobs on shutdown")
+            for _ in range(queue.qsize()):
+                queue.get_nowait()
+                queue.task_done()
+                self._queue_depth.dec()
+                self._drop("shutdown")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue, self._tasks = None, []
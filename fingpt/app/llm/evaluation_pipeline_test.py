@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+
+from prometheus_client import REGISTRY
+
+from app.llm.evaluation_pipeline import EvaluationPipeline
+
+request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id")
+
+
+def _dropped(reason: str) -> float:
+    return (
+        REGISTRY.get_sample_value(
+            "fingpt_evaluation_jobs_dropped_total",
+            {"pipeline": "evaluation", "reason": reason},
+        )
+        or 0.0
+    )
+
+
+async def test_jobs_run_in_the_context_they_were_submitted_from():
+    pipeline = EvaluationPipeline(workers=1)
+    seen = []
+
+    async def job():
+        seen.append(request_id.get())
+
+    for rid in ("a", "b"):
+        request_id.set(rid)
+        assert pipeline.submit(job)
+    await pipeline.stop()
+
+    assert seen == ["a", "b"]
+
+
+async def test_full_queue_drops_jobs():
+    pipeline = EvaluationPipeline(max_queue_size=1, workers=1)
+    release = asyncio.Event()
+    dropped = _dropped("queue_full")
+
+    async def job():
+        await release.wait()
+
+    pipeline.submit(job)
+    await asyncio.sleep(0)  # the worker takes the first job
+    assert pipeline.submit(job)
+    assert not pipeline.submit(job)
+    release.set()
+    await pipeline.stop()
+
+    assert _dropped("queue_full") == dropped + 1
+
+
+async def test_sampling_drops_jobs():
+    pipeline = EvaluationPipeline(sample_rate=0.0)
+    dropped = _dropped("sampled_out")
+
+    async def job():
+        raise AssertionError("must not run")
+
+    assert not pipeline.submit(job)
+    assert _dropped("sampled_out") == dropped + 1
+
+
+async def test_failed_job_does_not_stop_the_worker():
+    pipeline = EvaluationPipeline(workers=1)
+    done = []
+
+    async def failing():
+        raise ValueError("metric failed")
+
+    async def job():
+        done.append(True)
+
+    pipeline.submit(failing)
+    pipeline.submit(job)
+    await pipeline.stop()
+
+    assert done == [True]
+
+
+async def test_stop_drains_then_drops_after_timeout():
+    pipeline = EvaluationPipeline(workers=1)
+    dropped = _dropped("shutdown")
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    pipeline.submit(slow)
+    pipeline.submit(slow)
+    await asyncio.sleep(0)
+    await pipeline.stop(timeout=0.01)
+
+    assert _dropped("shutdown") == dropped + 1
+    assert not pipeline.submit(slow)
@@ -0,0 +1,138 @@
+import asyncio
+import statistics
+from collections import deque
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import LLM_HEDGE_SAVED, LLM_HEDGED_CALLS
+
+T = TypeVar("T")
+
+# Prompt config key to opt a prompt out of hedging, for calls that are not
+# idempotent.
+HEDGE_CONFIG_KEY = "hedge"
+
+NOT_HEDGED = "not_hedged"
+PRIMARY = "primary"
+BACKUP = "backup"
+
+
+def hedge_backup(deployment: Optional[str]) -> Optional[str]:
+    """The next of the equivalent `llm_hedge_deployments`, None if not listed."""
+    deployments = settings.llm_hedge_deployments
+    if deployment not in deployments or len(deployments) < 2:
+        return None
+    return deployments[(deployments.index(deployment) + 1) % len(deployments)]
+
+
+class HedgePolicy:
+    """Hedge delays from a rolling window of latencies per deployment.
+
+    A backup is sent once the primary is slower than the given percentile of
+    the recent calls, clamped between the minimum and maximum delay, and at the
+    maximum delay until enough calls were seen. A primary that lost is counted
+    with the latency it had when it was cancelled, so the slow tail the hedges
+    cut off still counts towards the percentile.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay: float = 0.5,
+        max_delay: float = 10.0,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        self._percentile = percentile
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._min_samples = min_samples
+        self._window = window
+        self._latencies: dict[str, deque[float]] = {}
+
+    def delay(self, key: str) -> float:
+        latencies = self._latencies.get(key)
+        if latencies is None or len(latencies) < self._min_samples:
+            return self._max_delay
+        ordered = sorted(latencies)
+        index = min(len(ordered) - 1, int(self._percentile * len(ordered)))
+        return min(self._max_delay, max(self._min_delay, ordered[index]))
+
+    def saved(self, key: str, latency: float) -> float:
+        """Estimated latency a winning backup saved: the median of the recent
+        calls that were slower, less the latency of this call."""
+        slower = [t for t in self._latencies.get(key, ()) if t > latency]
+        return statistics.median(slower) - latency if slower else 0.0
+
+    def record(self, key: str, prompt: str, outcome: str, latency: float) -> None:
+        if outcome == BACKUP:
+            LLM_HEDGE_SAVED.labels(prompt=prompt).observe(self.saved(key, latency))
+        LLM_HEDGED_CALLS.labels(prompt=prompt, outcome=outcome).inc()
+        latencies = self._latencies.get(key)
+        if latencies is None:
+            latencies = self._latencies[key] = deque(maxlen=self._window)
+        latencies.append(latency)
+
+
+hedge_policy = HedgePolicy(
+    percentile=settings.llm_hedge_percentile,
+    min_delay=settings.llm_hedge_min_delay,
+    max_delay=settings.llm_hedge_max_delay,
+    min_samples=settings.llm_hedge_min_samples,
+    window=settings.llm_hedge_window,
+)
+
+
+def _retrieve(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+async def race(
+    primary: Callable[[], Awaitable[T]],
+    backup: Callable[[], Awaitable[T]],
+    delay: float,
+    discard: Optional[Callable[[T], Any]] = None,
+) -> tuple[T, str]:
+    """Run `primary`, and `backup` too if the primary takes longer than `delay`.
+
+    Return the first result and whether it was not hedged or came from the
+    primary or the backup. The other call is cancelled, or handed to `discard`
+    if it had finished as well. A call that fails waits for the other one.
+    """
+    first = asyncio.ensure_future(primary())
+    first.add_done_callback(_retrieve)
+    calls = {first: NOT_HEDGED}
+    try:
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result(), NOT_HEDGED
+
+        second = asyncio.ensure_future(backup())
+        second.add_done_callback(_retrieve)
+        calls = {first: PRIMARY, second: BACKUP}
+        pending = set(calls)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            succeeded = [task for task in done if task.exception() is None]
+            if succeeded:
+                winner = first if first in succeeded else second
+                if discard is not None:
+                    for task in succeeded:
+                        if task is not winner:
+                            discard(task.result())
+                return winner.result(), calls[winner]
+        # Both failed, the error of the primary is the one to report.
+        return first.result(), PRIMARY
+    finally:
+        for task in calls:
+            task.cancel()
+
+
+async def open_stream(
+    stream: AsyncGenerator[T, None],
+) -> tuple[AsyncGenerator[T, None], Optional[T]]:
+    """Wait for the first item of a stream, None if the stream is empty."""
+    return stream, await anext(stream, None)
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from app.llm.hedging import (
+    BACKUP,
+    NOT_HEDGED,
+    PRIMARY,
+    HedgePolicy,
+    hedge_backup,
+    open_stream,
+    race,
+)
+
+
+def _call(result, delay=0.0, error=None):
+    async def call():
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return call
+
+
+def test_hedge_backup_is_the_next_listed_deployment(mocker):
+    mocker.patch.object(settings, "llm_hedge_deployments", ["gpt-eu", "gpt-us"])
+
+    assert hedge_backup("gpt-eu") == "gpt-us"
+    assert hedge_backup("gpt-us") == "gpt-eu"
+    assert hedge_backup("gpt-other") is None
+
+
+def test_delay_is_max_delay_until_enough_samples():
+    policy = HedgePolicy(percentile=0.9, min_delay=0.1, max_delay=5.0, min_samples=3)
+    policy.record("gpt", "summary", NOT_HEDGED, 1.0)
+
+    assert policy.delay("gpt") == 5.0
+
+
+def test_delay_follows_latency_percentile_within_bounds():
+    policy = HedgePolicy(percentile=0.9, min_delay=0.5, max_delay=5.0, min_samples=3)
+    for latency in [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 2.0]:
+        policy.record("gpt", "summary", NOT_HEDGED, latency)
+
+    assert policy.delay("gpt") == 2.0
+    assert policy.delay("other") == 5.0
+
+    fast = HedgePolicy(percentile=0.5, min_delay=0.5, min_samples=1)
+    fast.record("gpt", "summary", NOT_HEDGED, 0.01)
+    assert fast.delay("gpt") == 0.5
+
+
+def test_record_estimates_latency_saved_by_backups():
+    policy = HedgePolicy()
+    for latency in [1.0, 4.0, 6.0]:
+        policy.record("gpt", "hedge_test", NOT_HEDGED, latency)
+    saved = REGISTRY.get_sample_value(
+        "fingpt_llm_hedge_saved_seconds_sum", {"prompt": "hedge_test"}
+    )
+
+    policy.record("gpt", "hedge_test", BACKUP, 2.0)
+
+    assert policy.saved("gpt", 2.0) == pytest.approx(3.0)
+    assert REGISTRY.get_sample_value(
+        "fingpt_llm_hedge_saved_seconds_sum", {"prompt": "hedge_test"}
+    ) == pytest.approx((saved or 0) + 3.0)
+    assert (
+        REGISTRY.get_sample_value(
+            "fingpt_llm_hedged_calls_total",
+            {"prompt": "hedge_test", "outcome": BACKUP},
+        )
+        >= 1
+    )
+
+
+async def test_race_does_not_hedge_fast_primary():
+    backup_calls = []
+
+    async def backup():
+        backup_calls.append(1)
+        return "backup"
+
+    assert await race(_call("primary"), backup, delay=0.1) == ("primary", NOT_HEDGED)
+    assert backup_calls == []
+
+
+async def test_race_returns_faster_backup_and_cancels_primary():
+    primary = asyncio.Event()
+
+    async def slow_primary():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            primary.set()
+            raise
+
+    result = await race(slow_primary, _call("backup", 0.01), delay=0.01)
+    await asyncio.sleep(0)
+
+    assert result == ("backup", BACKUP)
+    assert primary.is_set()
+
+
+async def test_race_waits_for_primary_when_backup_fails():
+    result = await race(
+        _call("primary", 0.05), _call(None, error=ValueError("boom")), delay=0.01
+    )
+
+    assert result == ("primary", PRIMARY)
+
+
+async def test_race_raises_primary_error_when_both_fail():
+    with pytest.raises(ValueError, match="primary"):
+        await race(
+            _call(None, 0.02, ValueError("primary")),
+            _call(None, 0.0, ValueError("backup")),
+            delay=0.01,
+        )
+
+
+async def test_race_discards_result_of_loser_that_finished_too():
+    discarded = []
+
+    async def both_done():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    result = await race(both_done, both_done, delay=0.0, discard=discarded.append)
+
+    assert result == ("result", PRIMARY)
+    assert discarded == ["result"]
+
+
+async def test_open_stream_returns_first_item():
+    async def stream():
+        yield "a"
+        yield "b"
+
+    opened, first = await open_stream(stream())
+
+    assert first == "a"
+    assert [item async for item in opened] == ["b"]
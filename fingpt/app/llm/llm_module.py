@@ -1,11 +1,22 @@
 from dependency_injector import containers, providers
 
+from app.core.config import settings
+from app.llm.evaluation_pipeline import EvaluationPipeline
 from app.llm.llm_service import LlmService
 from app.llm.llm_wrapper import AzureChatOpenAIWrapper
 
 
 class LlmModule(containers.DeclarativeContainer):
-    llm_srv: providers.Provider[LlmService] = providers.Singleton(LlmService)
+    evaluation_pipeline: providers.Provider[EvaluationPipeline] = providers.Singleton(
+        EvaluationPipeline,
+        max_queue_size=settings.evaluation_queue_size,
+        workers=settings.evaluation_workers,
+        sample_rate=settings.evaluation_sample_rate,
+    )
+    llm_srv: providers.Provider[LlmService] = providers.Singleton(
+        LlmService,
+        evaluation_pipeline=evaluation_pipeline,
+    )
 
 
 class LlmWrapperModule(containers.DeclarativeContainer):
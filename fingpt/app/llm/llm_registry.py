@@ -0,0 +1,140 @@
+import json
+import threading
+from functools import partial
+from typing import Any, Optional
+
+import httpx
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+from app.core.config import settings
+from app.core.metrics import PROMPT_NAME_METADATA_KEY
+from app.llm.hedging import HEDGE_CONFIG_KEY, hedge_backup
+from app.llm.llm_wrapper import AzureChatOpenAIWrapper
+from app.llm.model_routing import ModelTier
+
+
+class LlmClientRegistry:
+    """Chat models shared by all prompts with the same effective config.
+
+    Models of one config share their OpenAI clients, and every client uses
+    the same keep-alive HTTP pool, so requests to Azure reuse connections
+    instead of opening a new TLS session per prompt. Each prompt still gets
+    its own model instance, labelled with its name for the metrics.
+
+    With hedging enabled, models of the `llm_hedge_deployments` get the model
+    of the next deployment as backup, unless the prompt config sets `hedge`
+    to false. Models also resolve the model of their routing tier here, with
+    the same config but the deployment, max tokens and timeout of the tier.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+    ):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._lock = threading.Lock()
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self._models: dict[tuple[str, Optional[str]], AzureChatOpenAIWrapper] = {}
+
+    @staticmethod
+    def _key(config: dict[str, Any]) -> str:
+        return json.dumps(config, sort_keys=True, default=str)
+
+    def _create(
+        self,
+        config: dict[str, Any],
+        prompt_name: Optional[str],
+    ) -> AzureChatOpenAIWrapper:
+        if self._http_client is None or self._http_async_client is None:
+            self._http_client = DefaultHttpxClient(limits=self._limits)
+            self._http_async_client = DefaultAsyncHttpxClient(limits=self._limits)
+        kwargs: dict[str, Any] = {
+            "http_client": self._http_client,
+            "http_async_client": self._http_async_client,
+        }
+        if settings.llm_scheduler_enabled:
+            # Retries go through the scheduler, which coordinates 429 backoff.
+            kwargs["max_retries"] = 0
+        config = {k: v for k, v in config.items() if k != HEDGE_CONFIG_KEY}
+        if prompt_name is not None:
+            base = self._get(config, None)
+            kwargs.update(
+                metadata={PROMPT_NAME_METADATA_KEY: prompt_name},
+                client=base.client,
+                async_client=base.async_client,
+                root_client=base.root_client,
+                root_async_client=base.root_async_client,
+            )
+        return AzureChatOpenAIWrapper(**config, **kwargs)
+
+    def _get(
+        self,
+        config: dict[str, Any],
+        prompt_name: Optional[str],
+    ) -> AzureChatOpenAIWrapper:
+        key = (self._key(config), prompt_name)
+        model = self._models.get(key)
+        if model is None:
+            model = self._create(config, prompt_name)
+            self._models[key] = model
+            # Set once the model is registered, as the backup of the backup
+            # may be the model itself.
+            model.hedge_model = self._hedge_model(config, prompt_name)
+            model.tier_model = partial(self._tier_model, config, prompt_name)
+        return model
+
+    def _tier_model(
+        self,
+        config: dict[str, Any],
+        prompt_name: Optional[str],
+        tier: ModelTier,
+    ) -> AzureChatOpenAIWrapper:
+        return self.get({**config, **tier.model_config()}, prompt_name)
+
+    def _hedge_model(
+        self,
+        config: dict[str, Any],
+        prompt_name: Optional[str],
+    ) -> Optional[AzureChatOpenAIWrapper]:
+        if not settings.llm_hedge_enabled or not config.get(HEDGE_CONFIG_KEY, True):
+            return None
+        backup = hedge_backup(config.get("azure_deployment"))
+        if backup is None:
+            return None
+        return self._get({**config, "azure_deployment": backup}, prompt_name)
+
+    def get(
+        self,
+        config: dict[str, Any],
+        prompt_name: Optional[str] = None,
+    ) -> AzureChatOpenAIWrapper:
+        with self._lock:
+            return self._get(config, prompt_name)
+
+    def __len__(self) -> int:
+        """Number of distinct model configs."""
+        return sum(1 for _, prompt_name in self._models if prompt_name is None)
+
+    async def aclose(self) -> None:
+        with self._lock:
+            http_client, self._http_client = self._http_client, None
+            http_async_client, self._http_async_client = self._http_async_client, None
+            self._models.clear()
+        if http_client is not None:
+            http_client.close()
+        if http_async_client is not None:
+            await http_async_client.aclose()
+
+
+llm_registry = LlmClientRegistry(
+    max_connections=settings.llm_max_connections,
+    max_keepalive_connections=settings.llm_max_keepalive_connections,
+    keepalive_expiry=settings.llm_keepalive_expiry,
+)
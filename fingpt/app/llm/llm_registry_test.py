@@ -0,0 +1,83 @@
+import pytest
+
+from app.core.config import settings
+from app.core.metrics import PROMPT_NAME_METADATA_KEY
+from app.llm.llm_registry import LlmClientRegistry
+from app.llm.model_routing import ModelTier
+
+CONFIG = {
+    "azure_deployment": "test_deployment",
+    "temperature": 0.0,
+    "api_version": "2024-06-01",
+    "azure_endpoint": "https://example.openai.azure.com",
+    "api_key": "fake_key",  # pragma: allowlist secret
+}
+
+
+@pytest.fixture
+async def registry():
+    registry = LlmClientRegistry()
+    yield registry
+    await registry.aclose()
+
+
+async def test_models_with_same_config_share_clients(registry):
+    first = registry.get(CONFIG, prompt_name="first")
+    second = registry.get(dict(reversed(CONFIG.items())), prompt_name="second")
+
+    assert len(registry) == 1
+    assert first is not second
+    assert first is registry.get(CONFIG, prompt_name="first")
+    assert first.async_client is second.async_client
+    assert first.metadata == {PROMPT_NAME_METADATA_KEY: "first"}
+    assert second.metadata == {PROMPT_NAME_METADATA_KEY: "second"}
+
+
+async def test_models_with_different_config_share_connection_pool(registry):
+    first = registry.get(CONFIG)
+    second = registry.get({**CONFIG, "temperature": 0.7})
+
+    assert len(registry) == 2
+    assert first is not second
+    assert first.http_async_client is second.http_async_client
+
+
+async def test_aclose_closes_clients(registry):
+    model = registry.get(CONFIG)
+
+    await registry.aclose()
+
+    assert model.http_async_client.is_closed
+    assert len(registry) == 0
+    assert registry.get(CONFIG) is not model
+
+
+async def test_hedged_deployments_get_backup_model(mocker, registry):
+    mocker.patch.object(settings, "llm_hedge_enabled", True)
+    mocker.patch.object(
+        settings, "llm_hedge_deployments", ["test_deployment", "backup_deployment"]
+    )
+
+    model = registry.get(CONFIG, prompt_name="summary")
+
+    assert model.hedge_model.deployment_name == "backup_deployment"
+    assert model.hedge_model.metadata == {PROMPT_NAME_METADATA_KEY: "summary"}
+    assert model.hedge_model.hedge_model is model
+    assert registry.get({**CONFIG, "hedge": False}).hedge_model is None
+    assert registry.get({**CONFIG, "azure_deployment": "other"}).hedge_model is None
+
+
+async def test_models_are_not_hedged_by_default(registry):
+    assert registry.get(CONFIG).hedge_model is None
+
+
+async def test_tier_model_applies_tier_config(registry):
+    model = registry.get(CONFIG, prompt_name="summary")
+
+    fast = model.tier_model(ModelTier("fast", "gpt-4o-mini", 256, 10))
+
+    assert fast.deployment_name == "gpt-4o-mini"
+    assert fast.max_tokens == 256
+    assert fast.request_timeout == 10
+    assert fast.metadata == {PROMPT_NAME_METADATA_KEY: "summary"}
+    assert fast.tier_model(ModelTier("fast", "gpt-4o-mini", 256, 10)) is fast
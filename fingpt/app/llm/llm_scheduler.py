@@ -0,0 +1,255 @@
+import asyncio
+import heapq
+import itertools
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Iterator, Optional
+
+import openai
+
+from app.core.config import settings
+from app.core.metrics import (
+    LLM_RATE_LIMITED,
+    LLM_SCHEDULER_QUEUE_DEPTH,
+    LLM_SCHEDULER_WAIT,
+)
+
+# Roughly 4 characters per token for English text and JSON.
+CHARS_PER_TOKEN = 4
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class LlmPriority(IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+_priority: ContextVar[LlmPriority] = ContextVar(
+    "llm_priority", default=LlmPriority.INTERACTIVE
+)
+
+
+@contextmanager
+def llm_priority(priority: LlmPriority) -> Iterator[None]:
+    """Run the LLM calls made in this block, and its tasks, with a priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> LlmPriority:
+    return _priority.get()
+
+
+def estimate_tokens(payload: dict[str, Any], completion_tokens: int) -> int:
+    """Tokens Azure counts against the TPM quota: prompt plus max completion."""
+    prompt = json.dumps(
+        {k: payload.get(k) for k in ("messages", "tools", "functions")},
+        default=str,
+    )
+    completion = payload.get("max_tokens") or completion_tokens
+    return len(prompt) // CHARS_PER_TOKEN + completion
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) / scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available, requests above the capacity
+        only wait for a full bucket."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= amount
+
+    def give_back(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    wakeup: asyncio.Event = field(compare=False, default_factory=asyncio.Event)
+
+
+class _Deployment:
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int):
+        now = time.monotonic()
+        self.tokens = TokenBucket(tokens_per_minute, now) if tokens_per_minute else None
+        self.requests = (
+            TokenBucket(requests_per_minute, now) if requests_per_minute else None
+        )
+        self.paused_until = 0.0
+        self.backoff = 0.0
+        self.waiters: list[_Waiter] = []
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        wait = self.paused_until - now
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        return max(0.0, wait)
+
+    def take(self, tokens: int, now: float) -> None:
+        if self.tokens is not None:
+            self.tokens.take(tokens, now)
+        if self.requests is not None:
+            self.requests.take(1, now)
+
+    def wake_head(self) -> None:
+        if self.waiters:
+            self.waiters[0].wakeup.set()
+
+
+class LlmScheduler:
+    """Admits LLM calls within the TPM and RPM quota of their deployment.
+
+    Calls wait in a queue per deployment, interactive calls ahead of batch
+    ones, and the head of the queue waits until both token buckets have room.
+    A 429 pauses the whole deployment for its `retry-after`, or for a backoff
+    that doubles on every 429 in a row, so queued calls slow down instead of
+    failing. A quota of 0 is not enforced, only 429s are then handled.
+    """
+
+    def __init__(
+        self,
+        tokens_per_minute: int = 0,
+        requests_per_minute: int = 0,
+        max_backoff: float = 60.0,
+    ):
+        self._tokens_per_minute = tokens_per_minute
+        self._requests_per_minute = requests_per_minute
+        self._max_backoff = max_backoff
+        self._deployments: dict[str, _Deployment] = {}
+        self._seq = itertools.count()
+
+    def _deployment(self, name: str) -> _Deployment:
+        deployment = self._deployments.get(name)
+        if deployment is None:
+            deployment = _Deployment(self._tokens_per_minute, self._requests_per_minute)
+            self._deployments[name] = deployment
+        return deployment
+
+    async def acquire(
+        self,
+        deployment_name: str,
+        tokens: int,
+        priority: Optional[LlmPriority] = None,
+    ) -> None:
+        priority = current_priority() if priority is None else priority
+        deployment = self._deployment(deployment_name)
+        start = time.monotonic()
+        if not deployment.waiters and deployment.wait_time(tokens, start) <= 0:
+            deployment.take(tokens, start)
+            LLM_SCHEDULER_WAIT.labels(priority=priority.name.lower()).observe(0)
+            return
+
+        waiter = _Waiter(priority, next(self._seq), tokens)
+        heapq.heappush(deployment.waiters, waiter)
+        depth = LLM_SCHEDULER_QUEUE_DEPTH.labels(priority=priority.name.lower())
+        depth.inc()
+        try:
+            while True:
+                now = time.monotonic()
+                timeout = None
+                if deployment.waiters[0] is waiter:
+                    timeout = deployment.wait_time(tokens, now)
+                    if timeout <= 0:
+                        heapq.heappop(deployment.waiters)
+                        deployment.take(tokens, now)
+                        break
+                waiter.wakeup.clear()
+                try:
+                    await asyncio.wait_for(waiter.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            depth.dec()
+            if waiter in deployment.waiters:
+                deployment.waiters.remove(waiter)
+                heapq.heapify(deployment.waiters)
+            deployment.wake_head()
+        LLM_SCHEDULER_WAIT.labels(priority=priority.name.lower()).observe(
+            time.monotonic() - start
+        )
+
+    def settle(self, deployment_name: str, estimated: int, used: int) -> None:
+        """Correct the token bucket once the actual usage is known."""
+        deployment = self._deployment(deployment_name)
+        deployment.backoff = 0.0
+        if deployment.tokens is not None:
+            deployment.tokens.give_back(estimated - used)
+
+    def retry_delay(
+        self,
+        deployment_name: str,
+        error: Exception,
+        attempt: int,
+    ) -> Optional[float]:
+        """Seconds to wait before retrying a failed call, None to give up."""
+        if (
+            not isinstance(error, RETRYABLE_ERRORS)
+            or attempt >= settings.llm_max_retries
+        ):
+            return None
+        deployment = self._deployment(deployment_name)
+        if not isinstance(error, openai.RateLimitError):
+            return min(self._max_backoff, 0.5 * 2**attempt)
+
+        LLM_RATE_LIMITED.labels(deployment=deployment_name).inc()
+        deployment.backoff = min(self._max_backoff, max(1.0, deployment.backoff * 2))
+        delay = retry_after(error)
+        delay = deployment.backoff if delay is None else min(delay, self._max_backoff)
+        now = time.monotonic()
+        deployment.paused_until = max(deployment.paused_until, now + delay)
+        if deployment.tokens is not None:
+            # The quota is used up, whatever the estimates said.
+            deployment.tokens.tokens = min(deployment.tokens.tokens, 0.0)
+        # The retry is queued again, so it waits for the pause.
+        return 0.0
+
+    def queue_depth(self, deployment_name: str) -> int:
+        return len(self._deployment(deployment_name).waiters)
+
+
+llm_scheduler = LlmScheduler(
+    tokens_per_minute=settings.llm_tokens_per_minute,
+    requests_per_minute=settings.llm_requests_per_minute,
+    max_backoff=settings.llm_max_backoff,
+)
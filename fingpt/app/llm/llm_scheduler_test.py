@@ -0,0 +1,135 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import httpx
+import openai
+import pytest
+from prometheus_client import REGISTRY
+
+from app.llm.llm_scheduler import (
+    LlmPriority,
+    LlmScheduler,
+    TokenBucket,
+    current_priority,
+    estimate_tokens,
+    llm_priority,
+    retry_after,
+)
+
+
+def _rate_limit_error(headers=None):
+    response = httpx.Response(
+        429, headers=headers or {}, request=httpx.Request("POST", "https://x")
+    )
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(per_minute=60, now=0.0)
+    bucket.take(60, now=0.0)
+
+    assert bucket.wait_time(30, now=0.0) == pytest.approx(30.0)
+    assert bucket.wait_time(30, now=30.0) == 0.0
+    # Requests above the capacity wait for a full bucket only.
+    assert bucket.wait_time(600, now=30.0) == pytest.approx(30.0)
+
+
+def test_estimate_tokens_counts_prompt_and_completion():
+    payload = {"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 50}
+
+    assert 100 < estimate_tokens(payload, completion_tokens=500) < 200
+    assert estimate_tokens({"messages": []}, completion_tokens=500) >= 500
+
+
+def test_retry_after_reads_milliseconds_first():
+    assert retry_after(_rate_limit_error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(_rate_limit_error({"retry-after": "3"})) == 3.0
+    assert retry_after(_rate_limit_error()) is None
+
+
+def test_llm_priority_is_scoped():
+    assert current_priority() == LlmPriority.INTERACTIVE
+    with llm_priority(LlmPriority.BATCH):
+        assert current_priority() == LlmPriority.BATCH
+    assert current_priority() == LlmPriority.INTERACTIVE
+
+
+async def test_acquire_without_quota_does_not_wait():
+    scheduler = LlmScheduler()
+
+    await asyncio.wait_for(scheduler.acquire("gpt", tokens=10**6), timeout=0.1)
+
+
+async def test_interactive_calls_are_admitted_before_batch_calls():
+    # 6000 RPM, one request every 10ms once the burst is used.
+    scheduler = LlmScheduler(requests_per_minute=6000)
+    scheduler._deployment("gpt").requests.tokens = 0  # type: ignore
+    admitted = []
+
+    async def call(name, priority):
+        await scheduler.acquire("gpt", tokens=1, priority=priority)
+        admitted.append(name)
+
+    batch = [
+        asyncio.create_task(call(f"batch{i}", LlmPriority.BATCH)) for i in range(2)
+    ]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(call("chat", LlmPriority.INTERACTIVE))
+    await asyncio.sleep(0)
+    depth = REGISTRY.get_sample_value(
+        "fingpt_llm_scheduler_queue_depth", {"priority": "batch"}
+    )
+    await asyncio.gather(*batch, interactive)
+
+    assert admitted == ["chat", "batch0", "batch1"]
+    assert depth >= 2
+    assert scheduler.queue_depth("gpt") == 0
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = LlmScheduler(requests_per_minute=60)
+    scheduler._deployment("gpt").requests.tokens = 0  # type: ignore
+    waiter = asyncio.create_task(scheduler.acquire("gpt", tokens=1))
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth("gpt") == 1
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert scheduler.queue_depth("gpt") == 0
+
+
+async def test_rate_limit_pauses_the_deployment(mocker):
+    mocker.patch("app.llm.llm_scheduler.settings", MagicMock(llm_max_retries=2))
+    scheduler = LlmScheduler(tokens_per_minute=6000)
+
+    delay = scheduler.retry_delay("gpt", _rate_limit_error({"retry-after": "2"}), 0)
+
+    assert delay == 0.0
+    deployment = scheduler._deployment("gpt")
+    assert deployment.tokens.tokens <= 0  # type: ignore
+    assert deployment.wait_time(1, now=deployment.paused_until - 2) == pytest.approx(
+        2.0
+    )
+
+
+async def test_backoff_doubles_without_retry_after(mocker):
+    mocker.patch("app.llm.llm_scheduler.settings", MagicMock(llm_max_retries=5))
+    scheduler = LlmScheduler(max_backoff=3.0)
+
+    for attempt in range(3):
+        scheduler.retry_delay("gpt", _rate_limit_error(), attempt)
+
+    assert scheduler._deployment("gpt").backoff == 3.0
+    scheduler.settle("gpt", estimated=10, used=10)
+    assert scheduler._deployment("gpt").backoff == 0.0
+
+
+async def test_retry_delay_gives_up(mocker):
+    mocker.patch("app.llm.llm_scheduler.settings", MagicMock(llm_max_retries=1))
+    scheduler = LlmScheduler()
+
+    assert scheduler.retry_delay("gpt", ValueError("bad request"), 0) is None
+    assert scheduler.retry_delay("gpt", _rate_limit_error(), 1) is None
+    assert scheduler.retry_delay("gpt", _rate_limit_error(), 0) == 0.0
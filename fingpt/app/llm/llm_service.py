@@ -1,14 +1,14 @@
-import asyncio
 from typing import Any
 
 from deepeval.metrics import BaseMetric  # type: ignore
 from deepeval.test_case import LLMTestCase  # type: ignore
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import AzureChatOpenAI
 
 from app.core.config import settings
 from app.core.context import RequestContext
 from app.entity import ChatPrompt
+from app.llm.evaluation_pipeline import EvaluationPipeline
+from app.llm.llm_registry import llm_registry
 from app.utils.modified_langfuse_decorator import langfuse_context  # type: ignore
 from app.utils.modified_langfuse_decorator import observe
 
@@ -20,12 +20,14 @@ class LlmService:
 
     def __init__(
         self,
+        evaluation_pipeline: EvaluationPipeline,
     ):
         """
         Initializes the LlmService with an Azure OpenAI model.
         """
-        self._model = AzureChatOpenAI(
-            azure_deployment=settings.azure_openai_deployment,
+        self._evaluation_pipeline = evaluation_pipeline
+        self._model = llm_registry.get(
+            {"azure_deployment": settings.azure_openai_deployment}
         )
 
     @observe()
@@ -65,20 +67,35 @@ class LlmService:
             config={"callbacks": callbacks},  # type: ignore
         )
 
-        asyncio.create_task(
-            self._evaluate(
-                ctx,
-                prompt=prompt,
-                input=await prompt.tmpl.aformat(**kwargs),
-                output=output,
-                retrieval_context=list(kwargs.values()),
-                metrics=metrics,
+        if metrics:
+            self._evaluation_pipeline.submit(
+                lambda: self._evaluate_output(
+                    ctx, prompt=prompt, inputs=kwargs, output=output, metrics=metrics
+                )
             )
-        )
 
         logger.info(f"Returning output for {prompt.name}...")
         return output
 
+    async def _evaluate_output(
+        self,
+        ctx: RequestContext,
+        *,
+        prompt: ChatPrompt,
+        inputs: dict[str, Any],
+        output: str,
+        metrics: list[BaseMetric],
+    ):
+        # Formatted by the evaluation worker, not on the response path.
+        await self._evaluate(
+            ctx=ctx,
+            prompt=prompt,
+            input=await prompt.tmpl.aformat(**inputs),
+            output=output,
+            retrieval_context=list(inputs.values()),
+            metrics=metrics,
+        )
+
     @observe()
     async def _evaluate(
         self,
@@ -1,16 +1,64 @@
-from typing import Any, Callable, Dict, List, Literal, Optional, Sequence, Type, Union
+import asyncio
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Type,
+    Union,
+)
 
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
 from langchain_core.language_models import LanguageModelInput
-from langchain_core.messages import BaseMessage
-from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import Field
+from langchain_core.runnables import Runnable, RunnableConfig, ensure_config
 from langchain_core.tools import BaseTool
 from langchain_openai import AzureChatOpenAI
 
 from app.core.config import settings
+from app.core.metrics import (
+    LLM_COALESCED_CALLS,
+    PROMPT_NAME_METADATA_KEY,
+    UNKNOWN_LABEL,
+)
+from app.llm.hedging import hedge_policy, open_stream, race
+from app.llm.llm_scheduler import (
+    CHARS_PER_TOKEN,
+    LlmPriority,
+    estimate_tokens,
+    llm_priority,
+    llm_scheduler,
+)
+from app.llm.model_routing import (
+    ModelTier,
+    model_tier_override,
+    record_shadow,
+    routing_policy,
+    same_answer,
+    shadow_pipeline,
+)
+from app.llm.single_flight import SingleFlight, request_key
+from app.llm.usage import NODE_METADATA_KEY, THREAD_METADATA_KEY, record_usage
 from app.utils.modified_langfuse_decorator import langfuse_context
 
+# Shared by all models, identical requests have the same key whatever the model.
+_in_flight: SingleFlight[ChatResult] = SingleFlight()
+
 
 class AzureChatOpenAIWrapper(AzureChatOpenAI):
+    # Model of an equivalent deployment to hedge slow calls on, set by the
+    # registry for prompts that allow hedging.
+    hedge_model: Optional[Any] = Field(default=None, exclude=True)
+    # Resolves the model of a routing tier, set by the registry.
+    tier_model: Optional[Callable[[ModelTier], Any]] = Field(default=None, exclude=True)
+
     def _set_langfuse_callback(self):
         try:
             if self.callbacks:
@@ -54,6 +102,370 @@ class AzureChatOpenAIWrapper(AzureChatOpenAI):
             self._set_langfuse_callback()
         return super().invoke(input, config, stop=stop, **kwargs)
 
+    def _deployment(self) -> str:
+        return self.deployment_name or self.model_name
+
+    def _prompt_name(self) -> str:
+        return (self.metadata or {}).get(PROMPT_NAME_METADATA_KEY, UNKNOWN_LABEL)
+
+    def _run_metadata(
+        self,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+    ) -> dict[str, Any]:
+        # The graph node and the thread come with the metadata of the run.
+        # Streams get no run manager, the config of the calling chain has it.
+        return {
+            **(self.metadata or {}),
+            **(ensure_config().get("metadata") or {}),
+            **(run_manager.metadata if run_manager else {}),
+        }
+
+    def _routing_tier(
+        self,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+    ) -> Optional[ModelTier]:
+        if self.tier_model is None:
+            return None
+        metadata = self._run_metadata(run_manager)
+        return routing_policy.tier(
+            metadata.get(PROMPT_NAME_METADATA_KEY), metadata.get(NODE_METADATA_KEY)
+        )
+
+    def _routed(
+        self,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+    ) -> "AzureChatOpenAIWrapper":
+        """The model of the routing tier of the call, this one if it has none."""
+        tier = self._routing_tier(run_manager)
+        if tier is None or self.tier_model is None:
+            return self
+        return self.tier_model(tier)
+
+    def _get_llm_string(self, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
+        # The LLM cache is looked up before the call is routed, its key has to
+        # tell the answers of the tiers apart.
+        llm_string = super()._get_llm_string(stop=stop, **kwargs)
+        tier = self._routing_tier(None)
+        if tier is None:
+            return llm_string
+        return f"{llm_string}---{sorted(tier.model_config().items())}"
+
+    def _shadow(
+        self,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        **kwargs: Any,
+    ) -> Optional[Callable[[BaseMessage], None]]:
+        """For the calls sampled by a shadow rule, a callback that compares
+        their answer with the one of the candidate tier, in the background."""
+        if self.tier_model is None:
+            return None
+        metadata = self._run_metadata(run_manager)
+        prompt = metadata.get(PROMPT_NAME_METADATA_KEY)
+        tier = routing_policy.shadow_tier(prompt, metadata.get(NODE_METADATA_KEY))
+        if tier is None:
+            return None
+        model = self.tier_model(tier)
+        kwargs.pop("stream_options", None)
+
+        async def compare(answer: BaseMessage) -> None:
+            with model_tier_override(tier.name), llm_priority(LlmPriority.BATCH):
+                try:
+                    result = await model._agenerate(messages, stop=stop, **kwargs)
+                except Exception:
+                    record_shadow(prompt, tier.name, "error")
+                    raise
+            same = same_answer(answer, result.generations[0].message)
+            record_shadow(prompt, tier.name, "same" if same else "different")
+
+        return lambda answer: shadow_pipeline.submit(lambda: compare(answer))
+
+    def _record_usage(
+        self,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency: float,
+    ) -> None:
+        metadata = self._run_metadata(run_manager)
+        thread_id = metadata.get(THREAD_METADATA_KEY)
+        record_usage(
+            deployment=self._deployment(),
+            prompt=metadata.get(PROMPT_NAME_METADATA_KEY),
+            node=metadata.get(NODE_METADATA_KEY),
+            thread_id=str(thread_id) if thread_id else None,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency=latency,
+        )
+
+    def _estimate_tokens(self, messages: List[BaseMessage], **kwargs: Any) -> int:
+        payload = self._get_request_payload(messages, **kwargs)
+        return estimate_tokens(payload, settings.llm_completion_token_estimate)
+
+    async def _scheduled_agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if not settings.llm_scheduler_enabled:
+            return await super()._agenerate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+
+        deployment = self._deployment()
+        estimated = self._estimate_tokens(messages, stop=stop, **kwargs)
+        attempt = 0
+        while True:
+            await llm_scheduler.acquire(deployment, estimated)
+            try:
+                result = await super()._agenerate(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                )
+            except Exception as e:
+                delay = llm_scheduler.retry_delay(deployment, e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            usage = (result.llm_output or {}).get("token_usage") or {}
+            llm_scheduler.settle(
+                deployment, estimated, usage.get("total_tokens", estimated)
+            )
+            return result
+
+    async def _hedged_agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        hedge_model = self.hedge_model
+        if hedge_model is None:
+            return await self._scheduled_agenerate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+
+        key = f"{self._deployment()}:generate"
+        start = time.perf_counter()
+        result, outcome = await race(
+            lambda: self._scheduled_agenerate(messages, stop=stop, **kwargs),
+            lambda: hedge_model._scheduled_agenerate(messages, stop=stop, **kwargs),
+            hedge_policy.delay(key),
+        )
+        hedge_policy.record(
+            key, self._prompt_name(), outcome, time.perf_counter() - start
+        )
+        return result
+
+    async def _coalesced_agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> tuple[ChatResult, bool]:
+        if not settings.llm_single_flight_enabled:
+            result = await self._hedged_agenerate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+            return result, False
+
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        key = request_key(
+            {
+                "azure_endpoint": self.azure_endpoint,
+                "api_version": self.openai_api_version,
+                "azure_deployment": self.deployment_name,
+                "payload": payload,
+            }
+        )
+        # Streamed tokens would only reach the callbacks of the first caller.
+        result, shared = await _in_flight.do(
+            key,
+            lambda: self._hedged_agenerate(messages, stop=stop, **kwargs),
+        )
+        if not shared:
+            return result, False
+        LLM_COALESCED_CALLS.labels(prompt=self._prompt_name()).inc()
+        # Callers may edit the message they get, e.g. to repair tool calls.
+        return result.copy(deep=True), True
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        model = self._routed(run_manager)
+        if model is not self:
+            return await model._agenerate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+        # A streaming model generates through _astream, which is scheduled.
+        if self.streaming:
+            return await super()._agenerate(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+
+        shadow = self._shadow(run_manager, messages, stop, **kwargs)
+        start = time.perf_counter()
+        result, shared = await self._coalesced_agenerate(
+            messages, stop=stop, run_manager=run_manager, **kwargs
+        )
+        # A shared result was paid for by the call it was shared from.
+        if not shared:
+            usage = (result.llm_output or {}).get("token_usage") or {}
+            self._record_usage(
+                run_manager,
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0),
+                time.perf_counter() - start,
+            )
+            if shadow is not None:
+                shadow(result.generations[0].message)
+        return result
+
+    async def _scheduled_astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if not settings.llm_scheduler_enabled:
+            async for chunk in super()._astream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            ):
+                yield chunk
+            return
+
+        deployment = self._deployment()
+        estimated = self._estimate_tokens(messages, stop=stop, **kwargs)
+        attempt = 0
+        while True:
+            await llm_scheduler.acquire(deployment, estimated)
+            streamed = False
+            used = estimated
+            try:
+                async for chunk in super()._astream(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                ):
+                    streamed = True
+                    # Reported on the last chunk when `llm_stream_usage` is on.
+                    usage = getattr(chunk.message, "usage_metadata", None)
+                    if usage:
+                        used = usage["input_tokens"] + usage["output_tokens"]
+                    yield chunk
+                llm_scheduler.settle(deployment, estimated, used)
+                return
+            except Exception as e:
+                # Chunks already sent to the caller cannot be taken back.
+                delay = (
+                    None
+                    if streamed
+                    else llm_scheduler.retry_delay(deployment, e, attempt)
+                )
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _hedged_astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        hedge_model = self.hedge_model
+        if hedge_model is None:
+            async for chunk in self._scheduled_astream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            ):
+                yield chunk
+            return
+
+        # The stream that sends its first chunk first wins, the other one is
+        # closed before any of its chunks reach the caller.
+        key = f"{self._deployment()}:stream"
+        start = time.perf_counter()
+        (stream, first), outcome = await race(
+            lambda: open_stream(self._scheduled_astream(messages, stop=stop, **kwargs)),
+            lambda: open_stream(
+                hedge_model._scheduled_astream(messages, stop=stop, **kwargs)
+            ),
+            hedge_policy.delay(key),
+            discard=lambda opened: asyncio.ensure_future(opened[0].aclose()),
+        )
+        hedge_policy.record(
+            key, self._prompt_name(), outcome, time.perf_counter() - start
+        )
+        try:
+            # Only a streaming _agenerate passes a run manager for the tokens.
+            chunk = first
+            while chunk is not None:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+                chunk = await anext(stream, None)
+        finally:
+            await stream.aclose()
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        model = self._routed(run_manager)
+        if model is not self:
+            async for chunk in model._astream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            ):
+                yield chunk
+            return
+
+        if settings.llm_stream_usage:
+            # Needs an Azure API version with stream options.
+            kwargs.setdefault("stream_options", {"include_usage": True})
+        shadow = self._shadow(run_manager, messages, stop, **kwargs)
+        start = time.perf_counter()
+        usage = None
+        completion_chars = 0
+        answer: Optional[BaseMessageChunk] = None
+        async for chunk in self._hedged_astream(
+            messages, stop=stop, run_manager=run_manager, **kwargs
+        ):
+            usage = getattr(chunk.message, "usage_metadata", None) or usage
+            completion_chars += len(chunk.text)
+            if shadow is not None:
+                answer = chunk.message if answer is None else answer + chunk.message
+            yield chunk
+
+        if usage is not None:
+            prompt_tokens, completion_tokens = (
+                usage["input_tokens"],
+                usage["output_tokens"],
+            )
+        else:
+            # Without llm_stream_usage, Azure does not report the usage.
+            payload = self._get_request_payload(messages, stop=stop, **kwargs)
+            prompt_tokens = estimate_tokens(payload, 0)
+            completion_tokens = completion_chars // CHARS_PER_TOKEN
+        self._record_usage(
+            run_manager, prompt_tokens, completion_tokens, time.perf_counter() - start
+        )
+        if shadow is not None and answer is not None:
+            shadow(answer)
+
     def bind_tools(
         self,
         tools: Sequence[Union[Dict[str, Any], Type, Callable, BaseTool]],
@@ -1,15 +1,24 @@
 # test_llm_wrapper.py
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
+import openai
 import pytest
 from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.language_models import LanguageModelInput
-from langchain_core.messages import BaseMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_openai import AzureChatOpenAI
+from prometheus_client import REGISTRY
 
 from app.core.config import settings
+from app.core.metrics import PROMPT_NAME_METADATA_KEY
+from app.llm.evaluation_pipeline import EvaluationPipeline
 from app.llm.llm_wrapper import AzureChatOpenAIWrapper
+from app.llm.model_routing import ModelRoutingPolicy
+from app.utils.llm_cache import SqliteLlmCache
 
 
 @pytest.fixture
@@ -110,3 +119,340 @@ def test_invoke_sets_callback(mock_langfuse_context, azure_chat_openai_wrapper):
     assert len(azure_chat_openai_wrapper.callbacks) == 1
     assert azure_chat_openai_wrapper.callbacks[0] == mock_langfuse_context.return_value
     assert response == mock_response
+
+
+def _model(azure_deployment="test_deployment", **kwargs):
+    return AzureChatOpenAIWrapper(
+        azure_deployment=azure_deployment,
+        azure_endpoint="https://example.openai.azure.com",
+        api_key="key",
+        api_version="2024-06-01",
+        **kwargs,
+    )
+
+
+def _delayed_result(content):
+    async def agenerate(*args, **kwargs):
+        await asyncio.sleep(0.01)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content))])
+
+    return agenerate
+
+
+@pytest.mark.asyncio
+async def test_agenerate_coalesces_identical_concurrent_calls():
+    model = _model(metadata={PROMPT_NAME_METADATA_KEY: "summary"})
+    coalesced = REGISTRY.get_sample_value(
+        "fingpt_llm_coalesced_calls_total", {"prompt": "summary"}
+    )
+    messages = [HumanMessage("Analyze AAPL")]
+
+    with patch.object(
+        AzureChatOpenAI, "_agenerate", side_effect=_delayed_result("report")
+    ) as mock_agenerate:
+        results = await asyncio.gather(*[model._agenerate(messages) for _ in range(3)])
+
+    assert mock_agenerate.call_count == 1
+    assert [r.generations[0].message.content for r in results] == ["report"] * 3
+    messages_out = [r.generations[0].message for r in results]
+    assert len({id(message) for message in messages_out}) == 3
+    assert (
+        REGISTRY.get_sample_value(
+            "fingpt_llm_coalesced_calls_total", {"prompt": "summary"}
+        )
+        == (coalesced or 0) + 2
+    )
+
+
+@pytest.mark.asyncio
+async def test_agenerate_does_not_coalesce_different_prompts():
+    model = _model()
+
+    with patch.object(
+        AzureChatOpenAI, "_agenerate", side_effect=_delayed_result("report")
+    ) as mock_agenerate:
+        await asyncio.gather(
+            model._agenerate([HumanMessage("Analyze AAPL")]),
+            model._agenerate([HumanMessage("Analyze MSFT")]),
+            _model(temperature=0.5)._agenerate([HumanMessage("Analyze AAPL")]),
+        )
+
+    assert mock_agenerate.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_agenerate_does_not_coalesce_when_disabled(mocker):
+    mocker.patch.object(settings, "llm_single_flight_enabled", False)
+    model = _model()
+    messages = [HumanMessage("Analyze AAPL")]
+
+    with patch.object(
+        AzureChatOpenAI, "_agenerate", side_effect=_delayed_result("report")
+    ) as mock_agenerate:
+        await asyncio.gather(model._agenerate(messages), model._agenerate(messages))
+
+    assert mock_agenerate.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_agenerate_retries_rate_limited_calls_through_scheduler(mocker):
+    mocker.patch.object(settings, "llm_single_flight_enabled", False)
+    mock_scheduler = mocker.patch("app.llm.llm_wrapper.llm_scheduler")
+    mock_scheduler.acquire = AsyncMock()
+    mock_scheduler.retry_delay.return_value = 0.0
+    result = ChatResult(
+        generations=[ChatGeneration(message=AIMessage("report"))],
+        llm_output={"token_usage": {"total_tokens": 42}},
+    )
+    rate_limited = openai.RateLimitError(
+        "rate limited",
+        response=httpx.Response(429, request=httpx.Request("POST", "https://x")),
+        body=None,
+    )
+
+    with patch.object(
+        AzureChatOpenAI, "_agenerate", side_effect=[rate_limited, result]
+    ) as mock_agenerate:
+        response = await _model()._agenerate([HumanMessage("Analyze AAPL")])
+
+    assert response is result
+    assert mock_agenerate.call_count == 2
+    assert mock_scheduler.acquire.await_count == 2
+    mock_scheduler.settle.assert_called_once()
+    assert mock_scheduler.settle.call_args.args[2] == 42
+
+
+@pytest.mark.asyncio
+async def test_astream_settles_scheduler_with_reported_usage(mocker):
+    mocker.patch("app.llm.llm_wrapper.record_usage")
+    mock_scheduler = mocker.patch("app.llm.llm_wrapper.llm_scheduler")
+    mock_scheduler.acquire = AsyncMock()
+
+    async def astream(*args, **kwargs):
+        yield ChatGenerationChunk(message=AIMessageChunk(content="report"))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata={
+                    "input_tokens": 120,
+                    "output_tokens": 30,
+                    "total_tokens": 150,
+                },
+            )
+        )
+
+    with patch.object(AzureChatOpenAI, "_astream", side_effect=astream):
+        chunks = [c async for c in _model()._astream([HumanMessage("Analyze AAPL")])]
+
+    assert "".join(c.text for c in chunks) == "report"
+    mock_scheduler.settle.assert_called_once()
+    assert mock_scheduler.settle.call_args.args[2] == 150
+
+
+@pytest.mark.asyncio
+async def test_agenerate_records_usage_with_node_and_thread(mocker):
+    mock_record = mocker.patch("app.llm.llm_wrapper.record_usage")
+    model = _model(metadata={PROMPT_NAME_METADATA_KEY: "summary"})
+    result = ChatResult(
+        generations=[ChatGeneration(message=AIMessage("report"))],
+        llm_output={"token_usage": {"prompt_tokens": 120, "completion_tokens": 30}},
+    )
+
+    with patch.object(
+        AzureChatOpenAI, "_agenerate", new=AsyncMock(return_value=result)
+    ):
+        await model.ainvoke(
+            [HumanMessage("Analyze AAPL")],
+            config={
+                "metadata": {"langgraph_node": "ticker"},
+                "configurable": {"thread_id": "t-1"},
+            },
+        )
+
+    usage = mock_record.call_args.kwargs
+    assert usage["deployment"] == "test_deployment"
+    assert (usage["prompt"], usage["node"], usage["thread_id"]) == (
+        "summary",
+        "ticker",
+        "t-1",
+    )
+    assert (usage["prompt_tokens"], usage["completion_tokens"]) == (120, 30)
+
+
+@pytest.mark.asyncio
+async def test_astream_estimates_usage_when_not_reported(mocker):
+    mock_record = mocker.patch("app.llm.llm_wrapper.record_usage")
+    model = _model()
+
+    async def astream(*args, **kwargs):
+        for text in ["abcd", "efgh"]:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    chain = RunnableLambda(lambda _: [HumanMessage("x" * 400)]) | model
+    with patch.object(AzureChatOpenAI, "_astream", side_effect=astream):
+        chunks = [
+            c
+            async for c in chain.astream(
+                {},
+                config={
+                    "metadata": {"langgraph_node": "ticker"},
+                    "configurable": {"thread_id": "t-1"},
+                },
+            )
+        ]
+
+    assert len(chunks) == 2
+    usage = mock_record.call_args.kwargs
+    assert (usage["node"], usage["thread_id"]) == ("ticker", "t-1")
+    assert usage["prompt_tokens"] >= 100
+    assert usage["completion_tokens"] == 2
+
+
+@pytest.mark.asyncio
+async def test_astream_hedges_slow_first_chunk_on_backup(mocker):
+    mocker.patch("app.llm.llm_wrapper.record_usage")
+    mocker.patch("app.llm.llm_wrapper.hedge_policy.delay", return_value=0.01)
+    model = _model(metadata={PROMPT_NAME_METADATA_KEY: "summary"})
+    model.hedge_model = _model(azure_deployment="backup_deployment")
+
+    async def astream(self, *args, **kwargs):
+        if self.deployment_name == "test_deployment":
+            await asyncio.sleep(1)
+        for text in ["from ", self.deployment_name]:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    with patch.object(AzureChatOpenAI, "_astream", new=astream):
+        chunks = [c async for c in model._astream([HumanMessage("Analyze AAPL")])]
+
+    assert "".join(c.text for c in chunks) == "from backup_deployment"
+    assert (
+        REGISTRY.get_sample_value(
+            "fingpt_llm_hedged_calls_total", {"prompt": "summary", "outcome": "backup"}
+        )
+        >= 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_agenerate_keeps_primary_result_when_it_is_fast(mocker):
+    mocker.patch.object(settings, "llm_single_flight_enabled", False)
+    model = _model()
+    backup = _model(azure_deployment="backup_deployment")
+    model.hedge_model = backup
+
+    with patch.object(
+        AzureChatOpenAI, "_agenerate", side_effect=_delayed_result("report")
+    ) as mock_agenerate:
+        result = await model._agenerate([HumanMessage("Analyze AAPL")])
+
+    assert result.generations[0].message.content == "report"
+    assert mock_agenerate.call_count == 1
+
+
+@pytest.fixture
+def routing(mocker):
+    policy = ModelRoutingPolicy(
+        tiers={"fast": {"azure_deployment": "fast_deployment"}},
+        nodes={"summarize": "fast"},
+        prompts={},
+        shadow={"ticker": "fast"},
+        shadow_rate=1.0,
+    )
+    mocker.patch("app.llm.llm_wrapper.routing_policy", policy)
+    mocker.patch("app.llm.model_routing.routing_policy", policy)
+    mocker.patch.object(settings, "llm_single_flight_enabled", False)
+    mocker.patch("app.llm.llm_wrapper.record_usage")
+    # Other tests may have set a global LLM cache.
+    model = _model(metadata={PROMPT_NAME_METADATA_KEY: "summary"}, cache=False)
+    fast = _model(
+        azure_deployment="fast_deployment",
+        metadata={PROMPT_NAME_METADATA_KEY: "summary"},
+        cache=False,
+    )
+    model.tier_model = lambda tier: fast
+    fast.tier_model = lambda tier: fast
+    return model
+
+
+def _answer_from_deployment(self, *args, **kwargs):
+    async def agenerate():
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(self.deployment_name))]
+        )
+
+    return agenerate()
+
+
+@pytest.mark.asyncio
+async def test_agenerate_routes_node_to_its_tier(routing):
+    with patch.object(AzureChatOpenAI, "_agenerate", new=_answer_from_deployment):
+        summarized = await routing.ainvoke(
+            "Summarize", config={"metadata": {"langgraph_node": "summarize"}}
+        )
+        assisted = await routing.ainvoke(
+            "Hello", config={"metadata": {"langgraph_node": "primary"}}
+        )
+
+    assert summarized.content == "fast_deployment"
+    assert assisted.content == "test_deployment"
+
+
+@pytest.mark.asyncio
+async def test_llm_cache_misses_after_prompt_switches_tier(mocker, tmp_path):
+    mocker.patch.object(settings, "llm_single_flight_enabled", False)
+    mocker.patch("app.llm.llm_wrapper.record_usage")
+    tiers = {
+        "fast": {"azure_deployment": "fast_deployment"},
+        "mini": {"azure_deployment": "mini_deployment", "max_tokens": 256},
+    }
+    cache = SqliteLlmCache(str(tmp_path / "llm_cache.db"))
+    models = {
+        deployment: _model(
+            azure_deployment=deployment,
+            metadata={PROMPT_NAME_METADATA_KEY: "summary"},
+            cache=cache,
+        )
+        for deployment in ["test_deployment", "fast_deployment", "mini_deployment"]
+    }
+    model = models["test_deployment"]
+    model.tier_model = lambda tier: models[tier.azure_deployment]
+
+    calls = []
+
+    def agenerate(self, *args, **kwargs):
+        calls.append(self.deployment_name)
+        return _answer_from_deployment(self, *args, **kwargs)
+
+    answers = []
+    with patch.object(AzureChatOpenAI, "_agenerate", new=agenerate):
+        for tier in ["fast", "mini", "fast"]:
+            mocker.patch(
+                "app.llm.llm_wrapper.routing_policy",
+                ModelRoutingPolicy(tiers=tiers, nodes={}, prompts={"summary": tier}),
+            )
+            answers.append((await model.ainvoke("Summarize")).content)
+    cache.close()
+
+    assert answers == ["fast_deployment", "mini_deployment", "fast_deployment"]
+    # The answer of the fast tier is cached under its own key.
+    assert calls == ["fast_deployment", "mini_deployment"]
+
+
+@pytest.mark.asyncio
+async def test_agenerate_compares_answer_with_shadow_tier(mocker, routing):
+    pipeline = EvaluationPipeline(name="test_shadow")
+    mocker.patch("app.llm.llm_wrapper.shadow_pipeline", pipeline)
+    labels = {"prompt": "summary", "tier": "fast", "outcome": "different"}
+    different = REGISTRY.get_sample_value("fingpt_llm_shadow_calls_total", labels)
+
+    with patch.object(AzureChatOpenAI, "_agenerate", new=_answer_from_deployment):
+        answer = await routing.ainvoke(
+            "Analyze AAPL", config={"metadata": {"langgraph_node": "ticker"}}
+        )
+        await pipeline.stop()
+
+    assert answer.content == "test_deployment"
+    assert (
+        REGISTRY.get_sample_value("fingpt_llm_shadow_calls_total", labels)
+        == (different or 0) + 1
+    )
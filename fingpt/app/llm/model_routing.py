@@ -0,0 +1,149 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from langchain_core.messages import BaseMessage
+
+from app.core.config import settings
+from app.core.metrics import LLM_SHADOW_CALLS, UNKNOWN_LABEL
+from app.llm.evaluation_pipeline import EvaluationPipeline
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    name: str
+    azure_deployment: str
+    max_tokens: Optional[int] = None
+    # Seconds before a call to the tier times out.
+    timeout: Optional[float] = None
+
+    def model_config(self) -> dict[str, Any]:
+        config: dict[str, Any] = {"azure_deployment": self.azure_deployment}
+        if self.max_tokens is not None:
+            config["max_tokens"] = self.max_tokens
+        if self.timeout is not None:
+            config["timeout"] = self.timeout
+        return config
+
+
+class ModelRoutingPolicy:
+    """Maps prompt names and graph nodes to model tiers.
+
+    A rule for the prompt of a call wins over a rule for its node; calls
+    without a rule keep the model of their prompt config. A shadow rule sends
+    a sample of the calls to a candidate tier as well, in the background, to
+    compare its answers before the rule is switched to it.
+    """
+
+    def __init__(
+        self,
+        tiers: dict[str, dict[str, Any]],
+        nodes: dict[str, str],
+        prompts: dict[str, str],
+        shadow: Optional[dict[str, str]] = None,
+        shadow_rate: float = 0.0,
+    ):
+        try:
+            self._tiers = {
+                name: ModelTier(name=name, **spec) for name, spec in tiers.items()
+            }
+        except TypeError as e:
+            raise ValueError(f"Invalid model tier: {e}") from e
+        self._nodes = nodes
+        self._prompts = prompts
+        self._shadow = shadow or {}
+        self._shadow_rate = shadow_rate
+        rules = {**nodes, **prompts, **self._shadow}
+        unknown = {tier for tier in rules.values() if tier not in self._tiers}
+        if unknown:
+            raise ValueError(f"Unknown model tiers in routing rules: {unknown}")
+
+    def _rule(
+        self,
+        by_prompt: dict[str, str],
+        by_node: dict[str, str],
+        prompt: Optional[str],
+        node: Optional[str],
+    ) -> Optional[ModelTier]:
+        name = by_prompt.get(prompt or "") or by_node.get(node or "")
+        return self._tiers[name] if name else None
+
+    def tier(self, prompt: Optional[str], node: Optional[str]) -> Optional[ModelTier]:
+        override = _tier_override.get()
+        if override is not None:
+            return self._tiers[override]
+        return self._rule(self._prompts, self._nodes, prompt, node)
+
+    def shadow_tier(
+        self,
+        prompt: Optional[str],
+        node: Optional[str],
+    ) -> Optional[ModelTier]:
+        """Candidate tier to also send the call to, for a sample of the calls.
+        Calls sent to a tier on purpose, shadow calls among them, are not."""
+        if _tier_override.get() is not None:
+            return None
+        tier = self._rule(self._shadow, self._shadow, prompt, node)
+        if tier is None or random.random() >= self._shadow_rate:
+            return None
+        return tier
+
+    def __contains__(self, tier: str) -> bool:
+        return tier in self._tiers
+
+
+_tier_override: ContextVar[Optional[str]] = ContextVar(
+    "model_tier_override", default=None
+)
+
+
+@contextmanager
+def model_tier_override(tier: Optional[str]) -> Iterator[None]:
+    """Send the LLM calls made in this block to `tier`, e.g. to run the
+    promptfoo suites against a candidate model."""
+    if tier is not None and tier not in routing_policy:
+        raise ValueError(f"Unknown model tier {tier}")
+    token = _tier_override.set(tier)
+    try:
+        yield
+    finally:
+        _tier_override.reset(token)
+
+
+def _tool_names(message: BaseMessage) -> list[str]:
+    return sorted(call["name"] for call in getattr(message, "tool_calls", []))
+
+
+def _text(message: BaseMessage) -> str:
+    return str(message.content).strip().casefold()
+
+
+def same_answer(expected: BaseMessage, actual: BaseMessage) -> bool:
+    """Whether two answers call the same tools, or say the same thing when
+    neither calls a tool."""
+    if _tool_names(expected) or _tool_names(actual):
+        return _tool_names(expected) == _tool_names(actual)
+    return _text(expected) == _text(actual)
+
+
+def record_shadow(prompt: Optional[str], tier: str, outcome: str) -> None:
+    LLM_SHADOW_CALLS.labels(
+        prompt=prompt or UNKNOWN_LABEL, tier=tier, outcome=outcome
+    ).inc()
+
+
+routing_policy = ModelRoutingPolicy(
+    tiers=settings.llm_routing_tiers,
+    nodes=settings.llm_routing_nodes,
+    prompts=settings.llm_routing_prompts,
+    shadow=settings.llm_routing_shadow,
+    shadow_rate=settings.llm_routing_shadow_rate,
+)
+# Sampled already, the pipeline only bounds the shadow calls in flight.
+shadow_pipeline = EvaluationPipeline(
+    max_queue_size=settings.evaluation_queue_size,
+    workers=settings.evaluation_workers,
+    name="model_shadow",
+)
@@ -0,0 +1,87 @@
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.llm import model_routing
+from app.llm.model_routing import (
+    ModelRoutingPolicy,
+    ModelTier,
+    model_tier_override,
+    same_answer,
+)
+
+TIERS = {
+    "fast": {"azure_deployment": "gpt-4o-mini", "max_tokens": 256, "timeout": 10},
+    "large": {"azure_deployment": "gpt-4o"},
+}
+
+
+@pytest.fixture
+def policy(mocker):
+    policy = ModelRoutingPolicy(
+        tiers=TIERS,
+        nodes={"summarize": "fast", "ticker": "large"},
+        prompts={"symbol-identifier": "fast"},
+        shadow={"ticker": "fast"},
+        shadow_rate=1.0,
+    )
+    mocker.patch.object(model_routing, "routing_policy", policy)
+    return policy
+
+
+def test_model_config_skips_unset_limits():
+    assert ModelTier("large", "gpt-4o").model_config() == {"azure_deployment": "gpt-4o"}
+    assert ModelTier("fast", "gpt-4o-mini", 256, 10).model_config() == {
+        "azure_deployment": "gpt-4o-mini",
+        "max_tokens": 256,
+        "timeout": 10,
+    }
+
+
+def test_prompt_rule_wins_over_node_rule(policy):
+    assert policy.tier("symbol-identifier", "ticker").name == "fast"
+    assert policy.tier("report", "ticker").name == "large"
+    assert policy.tier("report", "primary") is None
+    assert policy.tier(None, None) is None
+
+
+def test_rules_must_use_known_tiers():
+    with pytest.raises(ValueError, match="Unknown model tiers"):
+        ModelRoutingPolicy(tiers=TIERS, nodes={"summarize": "tiny"}, prompts={})
+    with pytest.raises(ValueError, match="Invalid model tier"):
+        ModelRoutingPolicy(tiers={"fast": {"deployment": "x"}}, nodes={}, prompts={})
+
+
+def test_override_sends_every_call_to_tier(policy):
+    with model_tier_override("fast"):
+        assert policy.tier("report", "ticker").name == "fast"
+        assert policy.tier(None, None).name == "fast"
+    assert policy.tier("report", "ticker").name == "large"
+
+    with pytest.raises(ValueError, match="Unknown model tier"):
+        with model_tier_override("tiny"):
+            pass
+
+
+def test_shadow_tier_is_sampled_and_not_overridden(policy):
+    assert policy.shadow_tier("report", "ticker").name == "fast"
+    assert policy.shadow_tier("report", "primary") is None
+    with model_tier_override("large"):
+        assert policy.shadow_tier("report", "ticker") is None
+
+    unsampled = ModelRoutingPolicy(
+        tiers=TIERS, nodes={}, prompts={}, shadow={"ticker": "fast"}, shadow_rate=0.0
+    )
+    assert unsampled.shadow_tier("report", "ticker") is None
+
+
+def test_same_answer_compares_tools_then_text():
+    def tool_call(name):
+        return AIMessage(
+            "", tool_calls=[{"name": name, "args": {}, "id": "1", "type": "tool_call"}]
+        )
+
+    assert same_answer(tool_call("transfer"), tool_call("transfer"))
+    assert not same_answer(tool_call("transfer"), tool_call("card"))
+    assert not same_answer(tool_call("transfer"), AIMessage("transfer"))
+    assert same_answer(AIMessage(" AAPL "), AIMessage("aapl"))
+    assert not same_answer(AIMessage("AAPL"), AIMessage("MSFT"))
@@ -0,0 +1,47 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+def request_key(payload: dict[str, Any]) -> str:
+    """Hash of a request, equal for requests with the same JSON content."""
+    data = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class SingleFlight(Generic[T]):
+    """Runs one call per key at a time, concurrent callers share its result.
+
+    The call runs in its own task, so a caller that is cancelled does not
+    cancel the call the other callers are waiting for.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Task[T]] = {}
+
+    async def do(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[T]],
+    ) -> tuple[T, bool]:
+        """Return the result of the call and whether it was shared."""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._call_done(key, done))
+        return await asyncio.shield(task), shared
+
+    def _call_done(self, key: str, task: asyncio.Task[T]) -> None:
+        self._calls.pop(key, None)
+        # The error is raised to the callers, unless all of them were cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        """Number of calls in flight."""
+        return len(self._calls)
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.llm.single_flight import SingleFlight, request_key
+
+
+def test_request_key_ignores_key_order():
+    assert request_key({"a": 1, "b": [1, 2]}) == request_key({"b": [1, 2], "a": 1})
+    assert request_key({"a": 1}) != request_key({"a": 2})
+
+
+async def test_concurrent_calls_share_one_result():
+    single_flight: SingleFlight[int] = SingleFlight()
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    results = await asyncio.gather(*[single_flight.do("k", call) for _ in range(3)])
+
+    assert calls == 1
+    assert [result for result, _ in results] == [42, 42, 42]
+    assert [shared for _, shared in results] == [False, True, True]
+    assert len(single_flight) == 0
+
+
+async def test_sequential_calls_are_not_shared():
+    single_flight: SingleFlight[int] = SingleFlight()
+
+    async def call():
+        return 1
+
+    await single_flight.do("k", call)
+    _, shared = await single_flight.do("k", call)
+
+    assert shared is False
+
+
+async def test_error_is_raised_to_every_caller():
+    single_flight: SingleFlight[int] = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        raise TimeoutError("azure is slow")
+
+    results = await asyncio.gather(
+        single_flight.do("k", call),
+        single_flight.do("k", call),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, TimeoutError) for result in results)
+
+
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    single_flight: SingleFlight[int] = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.02)
+        return 7
+
+    first = asyncio.create_task(single_flight.do("k", call))
+    second = asyncio.create_task(single_flight.do("k", call))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert await second == (7, True)
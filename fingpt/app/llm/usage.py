@@ -0,0 +1,118 @@
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from app.core.config import settings
+from app.core.metrics import LLM_COST, LLM_TOKENS, UNKNOWN_LABEL
+
+NODE_METADATA_KEY = "langgraph_node"
+THREAD_METADATA_KEY = "thread_id"
+
+
+@dataclass
+class LlmUsage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    latency: float = 0.0
+
+    def add(self, other: "LlmUsage") -> None:
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost += other.cost
+        self.latency += other.latency
+
+
+class RequestUsage:
+    """LLM usage of one request, in total and by graph node and prompt."""
+
+    def __init__(self) -> None:
+        self.total = LlmUsage()
+        self.by_node: defaultdict[str, LlmUsage] = defaultdict(LlmUsage)
+        self.by_prompt: defaultdict[str, LlmUsage] = defaultdict(LlmUsage)
+
+    def add(self, prompt: str, node: str, usage: LlmUsage) -> None:
+        self.total.add(usage)
+        self.by_node[node].add(usage)
+        self.by_prompt[prompt].add(usage)
+
+
+class ThreadUsage:
+    """Running LLM usage of the most recent threads."""
+
+    def __init__(self, max_threads: int = 10000):
+        self._max_threads = max_threads
+        self._threads: OrderedDict[str, LlmUsage] = OrderedDict()
+
+    def add(self, thread_id: str, usage: LlmUsage) -> None:
+        total = self._threads.pop(thread_id, None) or LlmUsage()
+        total.add(usage)
+        self._threads[thread_id] = total
+        while len(self._threads) > self._max_threads:
+            self._threads.popitem(last=False)
+
+    def get(self, thread_id: str) -> Optional[LlmUsage]:
+        return self._threads.get(thread_id)
+
+
+thread_usage = ThreadUsage(settings.llm_usage_max_threads)
+
+_request_usage: ContextVar[Optional[RequestUsage]] = ContextVar(
+    "request_usage", default=None
+)
+
+
+@contextmanager
+def usage_scope() -> Iterator[RequestUsage]:
+    """Collect the usage of the LLM calls made in this block and its tasks."""
+    usage = RequestUsage()
+    token = _request_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _request_usage.reset(token)
+
+
+def token_cost(deployment: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Cost from the per 1K tokens prices of `llm_token_costs`, 0 if unknown."""
+    prompt_price, completion_price = settings.llm_token_costs.get(
+        deployment, (0.0, 0.0)
+    )
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+def record_usage(
+    *,
+    deployment: str,
+    prompt: Optional[str],
+    node: Optional[str],
+    thread_id: Optional[str],
+    prompt_tokens: int,
+    completion_tokens: int,
+    latency: float,
+) -> LlmUsage:
+    prompt = prompt or UNKNOWN_LABEL
+    node = node or UNKNOWN_LABEL
+    usage = LlmUsage(
+        calls=1,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cost=token_cost(deployment, prompt_tokens, completion_tokens),
+        latency=latency,
+    )
+    # Threads are not a label, there are too many of them.
+    LLM_TOKENS.labels(prompt=prompt, node=node, kind="prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(prompt=prompt, node=node, kind="completion").inc(
+        completion_tokens
+    )
+    LLM_COST.labels(prompt=prompt, node=node).inc(usage.cost)
+    if thread_id:
+        thread_usage.add(thread_id, usage)
+    request_usage = _request_usage.get()
+    if request_usage is not None:
+        request_usage.add(prompt, node, usage)
+    return usage
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from app.llm.usage import LlmUsage, ThreadUsage, record_usage, token_cost, usage_scope
+
+
+def _tokens(prompt, node, kind):
+    return (
+        REGISTRY.get_sample_value(
+            "fingpt_llm_tokens_total", {"prompt": prompt, "node": node, "kind": kind}
+        )
+        or 0.0
+    )
+
+
+def _record(prompt="summary", node="agent", thread_id=None, tokens=(100, 20)):
+    return record_usage(
+        deployment="gpt-4o",
+        prompt=prompt,
+        node=node,
+        thread_id=thread_id,
+        prompt_tokens=tokens[0],
+        completion_tokens=tokens[1],
+        latency=0.5,
+    )
+
+
+def test_token_cost_uses_prices_per_1k_tokens(mocker):
+    mocker.patch.object(settings, "llm_token_costs", {"gpt-4o": (0.005, 0.015)})
+
+    assert token_cost("gpt-4o", 1000, 2000) == pytest.approx(0.035)
+    assert token_cost("other", 1000, 2000) == 0.0
+
+
+def test_record_usage_counts_tokens_by_prompt_and_node():
+    before = _tokens("summary", "agent", "prompt"), _tokens(
+        "summary", "agent", "completion"
+    )
+
+    _record()
+
+    assert _tokens("summary", "agent", "prompt") == before[0] + 100
+    assert _tokens("summary", "agent", "completion") == before[1] + 20
+
+
+def test_record_usage_without_prompt_or_node_is_unknown():
+    before = _tokens("unknown", "unknown", "prompt")
+
+    _record(prompt=None, node=None)
+
+    assert _tokens("unknown", "unknown", "prompt") == before + 100
+
+
+def test_usage_scope_collects_calls_of_its_tasks():
+    async def run():
+        with usage_scope() as usage:
+            await asyncio.gather(
+                asyncio.create_task(_async_record("summary", "agent")),
+                asyncio.create_task(_async_record("router", "router")),
+            )
+        _record()
+        return usage
+
+    async def _async_record(prompt, node):
+        _record(prompt=prompt, node=node)
+
+    usage = asyncio.run(run())
+
+    assert usage.total.calls == 2
+    assert usage.total.prompt_tokens == 200
+    assert usage.by_node["agent"].calls == 1
+    assert usage.by_prompt["router"].completion_tokens == 20
+
+
+def test_thread_usage_accumulates_and_evicts_oldest():
+    threads = ThreadUsage(max_threads=2)
+
+    threads.add("a", LlmUsage(calls=1, prompt_tokens=10))
+    threads.add("b", LlmUsage(calls=1, prompt_tokens=10))
+    threads.add("a", LlmUsage(calls=1, prompt_tokens=5))
+    threads.add("c", LlmUsage(calls=1))
+
+    assert threads.get("a") == LlmUsage(calls=2, prompt_tokens=15)
+    assert threads.get("b") is None
+    assert threads.get("c") is not None
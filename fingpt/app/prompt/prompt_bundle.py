@@ -0,0 +1,113 @@
+import json
+import sys
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from langfuse.api.resources.prompts import Prompt_Chat
+from langfuse.model import ChatPromptClient
+from langfuse.utils.langfuse_singleton import LangfuseSingleton
+from loguru import logger
+
+from app.core.config import Settings, settings
+
+# Bump when the layout of the bundle file changes.
+BUNDLE_FORMAT_VERSION = 1
+DEFAULT_BUNDLE_PATH = "prompt_bundle.json"
+PROMPT_SUFFIXES = ("_prompt", "_prompt_env")
+
+
+def _label_field(prompt_field: str) -> Optional[str]:
+    """Settings name the label of `x_prompt` either `x_label` or `x_prompt_label`,
+    and the label of `x_prompt_env` `x_label_env`."""
+    if prompt_field.endswith("_prompt_env"):
+        candidates = [prompt_field.removesuffix("_prompt_env") + "_label_env"]
+    else:
+        candidates = [
+            prompt_field.removesuffix("_prompt") + "_label",
+            prompt_field + "_label",
+        ]
+    return next((c for c in candidates if c in Settings.model_fields), None)
+
+
+def referenced_prompts(config: Settings = settings) -> list[tuple[str, str]]:
+    """(name, label) of every prompt configured in the settings."""
+    prompts = []
+    for field in Settings.model_fields:
+        label_field = _label_field(field) if field.endswith(PROMPT_SUFFIXES) else None
+        if label_field is None:
+            continue
+        name, label = getattr(config, field), getattr(config, label_field)
+        if name and (name, label) not in prompts:
+            prompts.append((name, label))
+    return prompts
+
+
+def _dump_prompt(label: str, client: ChatPromptClient) -> dict[str, Any]:
+    return {
+        "name": client.name,
+        "label": label,
+        "version": client.version,
+        "config": client.config,
+        "labels": client.labels,
+        "tags": client.tags,
+        "prompt": client.prompt,
+    }
+
+
+def _load_prompt(data: dict[str, Any]) -> ChatPromptClient:
+    return ChatPromptClient(
+        Prompt_Chat(
+            name=data["name"],
+            version=data["version"],
+            config=data["config"],
+            labels=data["labels"],
+            tags=data["tags"],
+            prompt=data["prompt"],
+            type="chat",
+        )
+    )
+
+
+def export_bundle(path: str, prompts: list[tuple[str, str]]) -> dict[str, Any]:
+    """Fetch the prompts from Langfuse and write them to a bundle file."""
+    lf = LangfuseSingleton().get()
+    bundle = {
+        "format": BUNDLE_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "langfuse_host": settings.langfuse_host,
+        "prompts": [
+            _dump_prompt(
+                label,
+                lf.get_prompt(name=name, type="chat", label=label, cache_ttl_seconds=0),
+            )
+            for name, label in prompts
+        ],
+    }
+    with open(path, "w") as f:
+        json.dump(bundle, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    return bundle
+
+
+def load_bundle(path: str) -> dict[tuple[str, str], ChatPromptClient]:
+    """Read a bundle file, keyed by prompt name and label."""
+    with open(path) as f:
+        bundle = json.load(f)
+    if bundle.get("format") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported prompt bundle format {bundle.get('format')} in {path}"
+        )
+    return {
+        (data["name"], data["label"]): _load_prompt(data) for data in bundle["prompts"]
+    }
+
+
+if __name__ == "__main__":
+    # python -m app.prompt.prompt_bundle [path]
+    bundle_path = (
+        sys.argv[1] if len(sys.argv) > 1 else settings.prompt_bundle_path
+    ) or DEFAULT_BUNDLE_PATH
+    exported = export_bundle(bundle_path, referenced_prompts())
+    for prompt in exported["prompts"]:
+        logger.info(f"{prompt['name']}:{prompt['label']} v{prompt['version']}")
+    print(f"Exported {len(exported['prompts'])} prompts to {bundle_path}")
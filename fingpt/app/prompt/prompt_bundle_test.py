@@ -0,0 +1,79 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from langfuse.api.resources.prompts import Prompt_Chat
+from langfuse.model import ChatPromptClient
+
+from app.core.config import Settings
+from app.prompt.prompt_bundle import (
+    BUNDLE_FORMAT_VERSION,
+    export_bundle,
+    load_bundle,
+    referenced_prompts,
+)
+
+
+def _client(name, version):
+    return ChatPromptClient(
+        Prompt_Chat(
+            name=name,
+            version=version,
+            config={"temperature": 0.5},
+            labels=["production"],
+            tags=[],
+            prompt=[{"role": "system", "content": "Hello {{name}}"}],
+            type="chat",
+        )
+    )
+
+
+def test_referenced_prompts_pairs_every_label_naming():
+    config = Settings(
+        assistant_primary_prompt="primary",
+        assistant_primary_label="production",
+        transfer_v2_extract_info_prompt="transfer",
+        transfer_v2_extract_info_prompt_label="staging",
+        transfer_extract_info_prompt_env="transfer_v1",
+        transfer_extract_info_label_env="production",
+        card_controller_prompt="primary",
+        card_controller_label="production",
+    )
+
+    prompts = referenced_prompts(config)
+
+    assert sorted(prompts) == [
+        ("primary", "production"),
+        ("transfer", "staging"),
+        ("transfer_v1", "production"),
+    ]
+
+
+def test_export_and_load_bundle_round_trip(mocker, tmp_path):
+    mock_langfuse = MagicMock()
+    mock_langfuse.get_prompt.side_effect = lambda name, **_: _client(name, 7)
+    mocker.patch(
+        "app.prompt.prompt_bundle.LangfuseSingleton.get", return_value=mock_langfuse
+    )
+    path = str(tmp_path / "bundle.json")
+
+    export_bundle(path, [("a", "production"), ("b", "staging")])
+    clients = load_bundle(path)
+
+    assert set(clients) == {("a", "production"), ("b", "staging")}
+    client = clients[("b", "staging")]
+    assert client.name == "b"
+    assert client.version == 7
+    assert client.config == {"temperature": 0.5}
+    assert client.compile(name="x") == [{"role": "system", "content": "Hello x"}]
+    mock_langfuse.get_prompt.assert_any_call(
+        name="a", type="chat", label="production", cache_ttl_seconds=0
+    )
+
+
+def test_load_bundle_rejects_unknown_format(tmp_path):
+    path = tmp_path / "bundle.json"
+    path.write_text(json.dumps({"format": BUNDLE_FORMAT_VERSION + 1, "prompts": []}))
+
+    with pytest.raises(ValueError):
+        load_bundle(str(path))
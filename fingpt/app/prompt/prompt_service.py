@@ -1,19 +1,79 @@
-from typing import List, Literal
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, List, Literal, Optional
 
 from langchain_core.prompts import ChatPromptTemplate
 from langfuse.model import ChatMessageDict
 from langfuse.utils.langfuse_singleton import LangfuseSingleton
+from loguru import logger
 
+from app.core.config import settings
 from app.core.context import RequestContext
+from app.core.metrics import PROMPT_FETCH_DURATION, PROMPT_STALE_SERVES, record_cache
 from app.entity import ChatPrompt
+from app.prompt.prompt_bundle import load_bundle
 from app.utils.modified_langfuse_decorator import langfuse_context, observe
 
+PromptKey = tuple[str, str, str]
+
+
+@dataclass
+class _CachedPrompt:
+    client: Any
+    prompt: ChatPrompt
+    fetched_at: float
+
 
 class PromptService:
+    """Langfuse prompts, cached in process with stale-while-revalidate.
+
+    A prompt is fetched from Langfuse on a worker thread, so a slow Langfuse
+    never blocks the event loop. Once cached, a prompt is served immediately:
+    past `cache_ttl` seconds it is refreshed in the background and the stale
+    copy is served until the refresh succeeds. Concurrent fetches of the same
+    prompt share a single request.
+
+    The cache can be seeded from a prompt bundle (see `prompt_bundle`), so
+    the service starts without waiting on Langfuse.
+    """
+
     def __init__(
         self,
+        cache_ttl: float = settings.prompt_cache_ttl,
+        fetch_timeout: int = settings.prompt_fetch_timeout,
+        bundle_path: str = settings.prompt_bundle_path,
+        bundle_offline: bool = settings.prompt_bundle_offline,
     ):
         self._lf = LangfuseSingleton().get()
+        self._cache_ttl = cache_ttl
+        self._fetch_timeout = fetch_timeout
+        self._cache: dict[PromptKey, _CachedPrompt] = {}
+        self._fetches: dict[PromptKey, asyncio.Task] = {}
+        if bundle_path:
+            try:
+                self.load_bundle(bundle_path, offline=bundle_offline)
+            except Exception as e:
+                logger.error(f"Failed to load prompt bundle {bundle_path}: {e}")
+
+    def load_bundle(self, path: str, offline: bool = False) -> int:
+        """Seed the cache with the prompts of a bundle file.
+
+        Bundled prompts are served right away and refreshed from Langfuse in
+        the background on first use, unless `offline`, in which case they are
+        never refreshed.
+        """
+        clients = load_bundle(path)
+        fetched_at = math.inf if offline else -math.inf
+        for (name, label), client in clients.items():
+            self._cache[(name, label, "chat")] = _CachedPrompt(
+                client=client,
+                prompt=self._to_chat_prompt(name, client),
+                fetched_at=fetched_at,
+            )
+        logger.info(f"Loaded {len(clients)} prompts from bundle {path}")
+        return len(clients)
 
     @staticmethod
     def _convert_raw_to_langchain_template(raw_prompt: str):
@@ -31,10 +91,94 @@ class PromptService:
         type: Literal["chat"],
     ) -> ChatPrompt:
         logger = ctx.logger()
-        tmpl = self._lf.get_prompt(name=name, type=type, label=label)
-        langfuse_context.update_current_observation(prompt=tmpl)
+        key = (name, label, type)
+        cached = self._cache.get(key)
+        record_cache("prompt", cached is not None)
+        if cached is None:
+            cached = await asyncio.shield(self._fetch(ctx, key))
+        elif time.monotonic() - cached.fetched_at >= self._cache_ttl:
+            PROMPT_STALE_SERVES.inc()
+            self._fetch(ctx, key)
+        langfuse_context.update_current_observation(prompt=cached.client)
         logger.info(f"Returning prompt {name}...")
-        raw_prompt: List[ChatMessageDict] = tmpl.compile()
+        return cached.prompt
+
+    def invalidate(
+        self,
+        name: Optional[str] = None,
+        label: Optional[str] = None,
+    ) -> None:
+        """Drop cached prompts, all of them when no name is given.
+
+        The next request of a dropped prompt waits for Langfuse again.
+        """
+        for key in list(self._cache):
+            if (name is None or key[0] == name) and (label is None or key[1] == label):
+                del self._cache[key]
+
+    def _fetch(self, ctx: RequestContext, key: PromptKey) -> asyncio.Task:
+        task = self._fetches.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(ctx, key))
+            self._fetches[key] = task
+            task.add_done_callback(lambda done: self._fetch_done(key, done))
+        return task
+
+    def _fetch_done(self, key: PromptKey, task: asyncio.Task) -> None:
+        self._fetches.pop(key, None)
+        # Background refreshes have no caller, their failure is logged instead.
+        if not task.cancelled():
+            task.exception()
+
+    async def _refresh(self, ctx: RequestContext, key: PromptKey) -> _CachedPrompt:
+        name, label, prompt_type = key
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            # The SDK cache is disabled, this service refreshes on its own.
+            client = await asyncio.to_thread(
+                self._lf.get_prompt,
+                name=name,
+                type=prompt_type,
+                label=label,
+                cache_ttl_seconds=0,
+                fetch_timeout_seconds=self._fetch_timeout,
+            )
+        except Exception as e:
+            status = type(e).__name__
+            if key in self._cache:
+                # Retry after another TTL rather than on every request.
+                self._cache[key].fetched_at = time.monotonic()
+                ctx.logger().error(
+                    f"Failed to refresh prompt {name}, serving stale: {e}"
+                )
+            raise
+        finally:
+            PROMPT_FETCH_DURATION.labels(status=status).observe(
+                time.perf_counter() - start
+            )
+
+        previous = self._cache.get(key)
+        same_version = (
+            previous is not None
+            and client.version is not None
+            and previous.prompt.version == client.version
+        )
+        record_cache("prompt_template", same_version)
+        # The template is only converted again when a new version is published.
+        prompt = (
+            previous.prompt  # type: ignore
+            if same_version
+            else self._to_chat_prompt(name, client)
+        )
+        cached = _CachedPrompt(
+            client=client, prompt=prompt, fetched_at=time.monotonic()
+        )
+        self._cache[key] = cached
+        return cached
+
+    def _to_chat_prompt(self, name: str, client: Any) -> ChatPrompt:
+        raw_prompt: List[ChatMessageDict] = client.compile()
         langchain_tmpl = ChatPromptTemplate.from_messages(
             [
                 (
@@ -47,7 +191,8 @@ class PromptService:
 
         return ChatPrompt(
             name=name,
-            chat_messages=tmpl.compile(),
+            chat_messages=raw_prompt,
             tmpl=langchain_tmpl,
-            config=tmpl.config,
+            config=client.config,
+            version=client.version,
         )
@@ -1,8 +1,12 @@
+import asyncio
+import json
 from unittest.mock import MagicMock
 
+import pytest
 from langchain_core.prompts import ChatPromptTemplate
 
 from app.entity import ChatPrompt
+from app.prompt.prompt_bundle import BUNDLE_FORMAT_VERSION
 from app.prompt.prompt_service import PromptService
 
 
@@ -10,6 +14,7 @@ async def test_get_prompt(mocker):
     mock_langfuse = MagicMock()
     mock_prompt = MagicMock()
     mock_prompt.config = {}
+    mock_prompt.version = 3
     content = (
         "content {{variable}} "
         "json: {"
@@ -48,5 +53,207 @@ async def test_get_prompt(mocker):
     )
     assert prompt.name == expected_prompt.name
     assert prompt.chat_messages == expected_prompt.chat_messages
+    assert prompt.version == 3
     assert prompt.tmpl == expected_prompt.tmpl
     assert prompt.configs == expected_prompt.configs
+
+
+def _langfuse_prompt(version):
+    prompt = MagicMock()
+    prompt.config = {}
+    prompt.version = version
+    prompt.compile.return_value = [{"role": "system", "content": "content"}]
+    return prompt
+
+
+def _prompt_service(mocker, mock_langfuse, **kwargs):
+    mocker.patch(
+        "app.prompt.prompt_service.LangfuseSingleton.get", return_value=mock_langfuse
+    )
+    return PromptService(**kwargs)
+
+
+async def _wait_for_refreshes(prompt_service):
+    await asyncio.gather(*prompt_service._fetches.values(), return_exceptions=True)
+
+
+async def test_get_prompt_serves_fresh_prompt_from_cache(mocker):
+    mock_langfuse = MagicMock()
+    mock_langfuse.get_prompt.return_value = _langfuse_prompt(1)
+    prompt_service = _prompt_service(mocker, mock_langfuse, cache_ttl=60)
+    ctx = MagicMock(logger=MagicMock())
+
+    first = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    second = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+
+    assert first is second
+    mock_langfuse.get_prompt.assert_called_once_with(
+        name="name",
+        type="chat",
+        label="label",
+        cache_ttl_seconds=0,
+        fetch_timeout_seconds=prompt_service._fetch_timeout,
+    )
+
+
+async def test_get_prompt_coalesces_concurrent_misses(mocker):
+    mock_langfuse = MagicMock()
+    mock_langfuse.get_prompt.return_value = _langfuse_prompt(1)
+    prompt_service = _prompt_service(mocker, mock_langfuse)
+    ctx = MagicMock(logger=MagicMock())
+
+    prompts = await asyncio.gather(
+        *[prompt_service.get_prompt(ctx, "name", "label", "chat") for _ in range(5)]
+    )
+
+    assert all(prompt is prompts[0] for prompt in prompts)
+    mock_langfuse.get_prompt.assert_called_once()
+
+
+async def test_get_prompt_serves_stale_prompt_while_refreshing(mocker):
+    mock_langfuse = MagicMock()
+    mock_langfuse.get_prompt.return_value = _langfuse_prompt(1)
+    prompt_service = _prompt_service(mocker, mock_langfuse, cache_ttl=0)
+    ctx = MagicMock(logger=MagicMock())
+
+    first = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    mock_langfuse.get_prompt.return_value = _langfuse_prompt(2)
+    stale = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    await _wait_for_refreshes(prompt_service)
+    fresh = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    await _wait_for_refreshes(prompt_service)
+
+    assert stale is first
+    assert fresh.version == 2
+
+
+async def test_get_prompt_reuses_template_of_same_version(mocker):
+    mock_langfuse = MagicMock()
+    mock_prompt = _langfuse_prompt(1)
+    mock_langfuse.get_prompt.return_value = mock_prompt
+    prompt_service = _prompt_service(mocker, mock_langfuse, cache_ttl=0)
+    ctx = MagicMock(logger=MagicMock())
+
+    first = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    await _wait_for_refreshes(prompt_service)
+    second = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    await _wait_for_refreshes(prompt_service)
+
+    assert first is second
+    assert mock_langfuse.get_prompt.call_count >= 2
+    mock_prompt.compile.assert_called_once()
+
+
+async def test_get_prompt_keeps_stale_prompt_when_refresh_fails(mocker):
+    mock_langfuse = MagicMock()
+    mock_langfuse.get_prompt.return_value = _langfuse_prompt(1)
+    prompt_service = _prompt_service(mocker, mock_langfuse, cache_ttl=0)
+    ctx = MagicMock(logger=MagicMock())
+
+    first = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    mock_langfuse.get_prompt.side_effect = TimeoutError("langfuse is down")
+    await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    await _wait_for_refreshes(prompt_service)
+    second = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    await _wait_for_refreshes(prompt_service)
+
+    assert second is first
+    ctx.logger().error.assert_called()
+
+
+async def test_get_prompt_raises_when_first_fetch_fails(mocker):
+    mock_langfuse = MagicMock()
+    mock_langfuse.get_prompt.side_effect = TimeoutError("langfuse is down")
+    prompt_service = _prompt_service(mocker, mock_langfuse)
+
+    with pytest.raises(TimeoutError):
+        await prompt_service.get_prompt(
+            MagicMock(logger=MagicMock()), "name", "label", "chat"
+        )
+    assert prompt_service._fetches == {}
+
+
+async def test_invalidate_drops_matching_prompts(mocker):
+    mock_langfuse = MagicMock()
+    mock_langfuse.get_prompt.return_value = _langfuse_prompt(1)
+    prompt_service = _prompt_service(mocker, mock_langfuse)
+    ctx = MagicMock(logger=MagicMock())
+    await prompt_service.get_prompt(ctx, "a", "label", "chat")
+    await prompt_service.get_prompt(ctx, "b", "label", "chat")
+
+    prompt_service.invalidate("a")
+    await prompt_service.get_prompt(ctx, "a", "label", "chat")
+    await prompt_service.get_prompt(ctx, "b", "label", "chat")
+    assert mock_langfuse.get_prompt.call_count == 3
+
+    prompt_service.invalidate()
+    await prompt_service.get_prompt(ctx, "b", "label", "chat")
+    assert mock_langfuse.get_prompt.call_count == 4
+
+
+def _write_bundle(path, version):
+    path.write_text(
+        json.dumps(
+            {
+                "format": BUNDLE_FORMAT_VERSION,
+                "prompts": [
+                    {
+                        "name": "name",
+                        "label": "label",
+                        "version": version,
+                        "config": {},
+                        "labels": ["label"],
+                        "tags": [],
+                        "prompt": [{"role": "system", "content": "bundled"}],
+                    }
+                ],
+            }
+        )
+    )
+
+
+async def test_bundled_prompt_is_served_then_refreshed(mocker, tmp_path):
+    bundle = tmp_path / "bundle.json"
+    _write_bundle(bundle, version=1)
+    mock_langfuse = MagicMock()
+    mock_langfuse.get_prompt.return_value = _langfuse_prompt(2)
+    prompt_service = _prompt_service(mocker, mock_langfuse, bundle_path=str(bundle))
+    ctx = MagicMock(logger=MagicMock())
+
+    bundled = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    await _wait_for_refreshes(prompt_service)
+    refreshed = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+
+    assert bundled.version == 1
+    assert bundled.chat_messages == [{"role": "system", "content": "bundled"}]
+    assert refreshed.version == 2
+
+
+async def test_offline_bundle_never_calls_langfuse(mocker, tmp_path):
+    bundle = tmp_path / "bundle.json"
+    _write_bundle(bundle, version=1)
+    mock_langfuse = MagicMock()
+    prompt_service = _prompt_service(
+        mocker,
+        mock_langfuse,
+        cache_ttl=0,
+        bundle_path=str(bundle),
+        bundle_offline=True,
+    )
+    ctx = MagicMock(logger=MagicMock())
+
+    await prompt_service.get_prompt(ctx, "name", "label", "chat")
+    prompt = await prompt_service.get_prompt(ctx, "name", "label", "chat")
+
+    assert prompt.version == 1
+    assert prompt_service._fetches == {}
+    mock_langfuse.get_prompt.assert_not_called()
+
+
+def test_missing_bundle_does_not_stop_the_service(mocker, tmp_path):
+    prompt_service = _prompt_service(
+        mocker, MagicMock(), bundle_path=str(tmp_path / "missing.json")
+    )
+
+    assert prompt_service._cache == {}
@@ -1,8 +1,9 @@
 import uuid
-from typing import Annotated, Optional
+from typing import Annotated, AsyncIterator, Optional
 
 from dependency_injector.wiring import Provide, inject
 from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from app.assistant_v2.primary.controller import AssistantController
@@ -12,13 +13,38 @@ from app.core import RequestContext
 from app.entity.api import ApiHeader
 from app.entity.chat_request import ChatReqDto
 from app.entity.chat_response import ChatRespDto
+from app.entity.chat_stream import ChatStreamEvent, ChatStreamEventType
 from app.entity.error import EbpInternalError
+from app.utils.misc import filter_disabled_choices
 from app.utils.modified_langfuse_decorator import observe  # type: ignore
 
 assistant_chat_router = APIRouter()
 auth_scheme = HTTPBearer(auto_error=False)
 
 
+def _build_header(
+    request: Request,
+    token: Optional[HTTPAuthorizationCredentials],
+) -> ApiHeader:
+    if not token:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid credentials data",
+            headers={"www-authenticate": 'Bearer error="invalid_token"'},
+        )
+
+    cookie = ""
+    for k, v in request.cookies.items():
+        if k in COOKIE_KEYS:
+            cookie += f"{k}={v}; "
+    cookie = cookie.strip().strip(";")
+
+    return ApiHeader(
+        cookie=cookie,
+        token=token.credentials,
+    )
+
+
 @observe()
 @assistant_chat_router.post(
     "/v1/assistant/chat",
@@ -53,23 +79,7 @@ async def assistant_chat(
     ctx = RequestContext(x_request_id)
     logger = ctx.logger()
 
-    if not token:
-        raise HTTPException(
-            status_code=401,
-            detail="Invalid credentials data",
-            headers={"www-authenticate": 'Bearer error="invalid_token"'},
-        )
-
-    cookie = ""
-    for k, v in request.cookies.items():
-        if k in COOKIE_KEYS:
-            cookie += f"{k}={v}; "
-    cookie = cookie.strip().strip(";")
-
-    header = ApiHeader(
-        cookie=cookie,
-        token=token.credentials,
-    )
+    header = _build_header(request, token)
 
     req.metadata.thread_id = req.metadata.thread_id or x_request_id
     logger.info(f'Received request for: "{req.model_dump()}"')
@@ -86,3 +96,58 @@ async def assistant_chat(
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise e
+
+
+@assistant_chat_router.post(
+    "/v1/assistant/chat/stream",
+    summary="Streaming variant of the assistant chat API, using server-sent events",
+    response_description="A text/event-stream ending with the ChatRespDto object",
+)
+@inject
+async def assistant_chat_stream(
+    req: ChatReqDto,
+    request: Request,
+    token: HTTPAuthorizationCredentials = Depends(auth_scheme),
+    ctrl: AssistantController = Depends(
+        Provide[ServerContainer.assistant_module().controller],
+    ),
+    x_request_id: Annotated[str, Header()] = str(uuid.uuid4()),
+) -> StreamingResponse:
+    """
+    LOGIN REQUIRED: Make sure you use login API first!
+
+    Same as /v1/assistant/chat, but streams the answer as server-sent events:
+    - progress: a graph node started, e.g. {"node": "TRANSFER_AGENT"}
+    - token: a piece of the assistant reply, with its node and run_id
+    - response: the final ChatRespDto, always the last event
+    - error: the request failed, with status_code and detail
+
+    Headers:
+    - x-request-id (str): (OPTIONAL) The request ID.
+
+    Args:
+    - request (ChatReqDto): The user request object
+
+    Returns:
+    - Server-sent events from the assistant
+    """
+    ctx = RequestContext(x_request_id)
+    logger = ctx.logger()
+    header = _build_header(request, token)
+
+    req.metadata.thread_id = req.metadata.thread_id or x_request_id
+    logger.info(f'Received stream request for: "{req.model_dump()}"')
+
+    async def event_stream() -> AsyncIterator[str]:
+        event: ChatStreamEvent
+        async for event in ctrl.chat_stream(ctx, header, req):
+            if event.event == ChatStreamEventType.RESPONSE:
+                response = filter_disabled_choices(ChatRespDto(**event.data))
+                event.data = response.model_dump(mode="json")
+            yield event.to_sse()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
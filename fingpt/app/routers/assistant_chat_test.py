@@ -11,8 +11,9 @@ from app.entity import (
     ChatRespAction,
     ChatRespDto,
 )
+from app.entity.chat_stream import ChatStreamEvent, ChatStreamEventType
 from app.entity.error import EbpInternalError
-from app.routers.assistant_chat import assistant_chat
+from app.routers.assistant_chat import assistant_chat, assistant_chat_stream
 
 
 @pytest.mark.asyncio
@@ -112,3 +113,65 @@ async def test_assistant_chat_ebp_internal_error(mock_http_request: Request):
     assert exc_info.value.detail == "Test EbpInternalError"
 
     mock_assistant_ctrl.chat.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_assistant_chat_stream(mock_http_request: Request, mock_token):
+    mock_assistant_ctrl = AsyncMock()
+    mock_req = ChatReqDto(
+        action=ChatReqAction.QUERY,
+        metadata=ChatReqMetadataForQuery(
+            thread_id="test_thread", user_query="Test query"
+        ),
+    )
+    mock_chat_resp = ChatRespDto(
+        response="Test response", action=ChatRespAction.SHOW_REPLY, metadata=None
+    )
+
+    async def chat_stream(*args):
+        yield ChatStreamEvent(
+            event=ChatStreamEventType.TOKEN,
+            data={"node": "PRIMARY_ASSISTANT", "run_id": "1", "content": "Test"},
+        )
+        yield ChatStreamEvent(
+            event=ChatStreamEventType.RESPONSE,
+            data=mock_chat_resp.model_dump(mode="json"),
+        )
+
+    mock_assistant_ctrl.chat_stream = chat_stream
+
+    with patch("app.routers.assistant_chat.RequestContext") as _:
+        result = await assistant_chat_stream(
+            req=mock_req,
+            request=mock_http_request,
+            token=mock_token,
+            ctrl=mock_assistant_ctrl,
+            x_request_id="test_request_id",
+        )
+        chunks = [chunk async for chunk in result.body_iterator]
+
+    assert result.media_type == "text/event-stream"
+    assert chunks[0].startswith("event: token\n")
+    assert chunks[-1].startswith("event: response\n")
+    assert '"response": "Test response"' in chunks[-1]
+
+
+@pytest.mark.asyncio
+async def test_assistant_chat_stream_no_token(mock_http_request: Request):
+    mock_req = ChatReqDto(
+        action=ChatReqAction.QUERY,
+        metadata=ChatReqMetadataForQuery(
+            thread_id="test_thread", user_query="Test query"
+        ),
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        await assistant_chat_stream(
+            req=mock_req,
+            request=mock_http_request,
+            token=None,
+            ctrl=AsyncMock(),
+            x_request_id="test_request_id",
+        )
+
+    assert exc_info.value.status_code == 401
@@ -1,6 +1,9 @@
+import asyncio
 import logging
 import os
 import socket
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 import sentry_sdk
 import yfinance as yf  # type: ignore
@@ -12,8 +15,13 @@ from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.integrations.starlette import StarletteIntegration
 from urllib3.connection import HTTPConnection
 
+from app.assistant_v2.util.context_window import warm_up_tokenizer
 from app.container import ServerContainer
 from app.core.config import settings
+from app.core.context import RequestContext
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.llm.llm_registry import llm_registry
+from app.llm.model_routing import shadow_pipeline
 from app.routers.assistant_chat import assistant_chat_router
 from app.routers.backbase_auth import backbase_auth_router
 from app.routers.command import command_router
@@ -28,6 +36,8 @@ container = ServerContainer()
 
 if settings.enable_semantic_cache:
     set_llm_cache(container.semantic_cache())
+elif settings.llm_cache_backend == "sqlite":
+    set_llm_cache(container.llm_cache())
 else:
     set_llm_cache(InMemoryCache())
 
@@ -40,7 +50,7 @@ yf.set_tz_cache_location(tmp_dir)
 # Define the filter
 class EndpointFilter(logging.Filter):
     def filter(self, record: logging.LogRecord) -> bool:
-        return record.args and len(record.args) >= 3 and record.args[2] != "/health"  # type: ignore
+        return record.args and len(record.args) >= 3 and record.args[2] not in ("/health", "/metrics")  # type: ignore
 
 
 # Add filter to the logger
@@ -79,12 +89,51 @@ if (
         ],
     )
 
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    ctx = RequestContext("startup")
+    logger = ctx.logger()
+    checkpointer_manager = container.assistant_module.checkpointer_manager()
+    # Startup is best effort: the checkpointer and the graph are also created
+    # lazily on the first chat request, so a failure here must not stop the
+    # other routers from serving.
+    try:
+        await checkpointer_manager.start()
+    except Exception as e:
+        logger.error(f"Failed to open assistant state storage: {e}")
+    try:
+        await asyncio.wait_for(
+            container.assistant_module.graph().get_compiled_graph(ctx),
+            timeout=settings.assistant_graph_warmup_timeout,
+        )
+    except Exception as e:
+        logger.error(f"Failed to warm up assistant graph: {e}")
+    try:
+        await asyncio.to_thread(warm_up_tokenizer)
+    except Exception as e:
+        logger.error(f"Failed to load tokenizer: {e}")
+    try:
+        yield
+    finally:
+        await container.assistant_module.controller().stop()
+        await container.llm_module.evaluation_pipeline().stop(
+            settings.evaluation_drain_timeout
+        )
+        await shadow_pipeline.stop(settings.evaluation_drain_timeout)
+        await checkpointer_manager.stop()
+        await llm_registry.aclose()
+        container.llm_cache().close()
+
+
 app = FastAPI(
     root_path=settings.root_path,
     version=settings.app_version,
+    lifespan=lifespan,
 )
 app.add_middleware(RequestLoggingMiddleware)
 app.add_middleware(ResponseSortingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Initialize the dependency container
 
@@ -106,6 +155,16 @@ async def version():
     return {"version": app.version}
 
 
+@app.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    response_description="Metrics in the Prometheus text format",
+    include_in_schema=False,
+)
+def metrics():
+    return render_metrics()
+
+
 @app.get(
     "/health",
     summary="Health Check",
@@ -1,5 +1,13 @@
 from .cache_manager import CacheManager
+from .embeddings import CachedEmbeddings
+from .llm_cache import SqliteLlmCache
 from .misc import RequestLoggingMiddleware
 from .semantic_cache import SemanticCache
 
-__all__ = ["CacheManager", "RequestLoggingMiddleware", "SemanticCache"]
+__all__ = [
+    "CacheManager",
+    "CachedEmbeddings",
+    "RequestLoggingMiddleware",
+    "SemanticCache",
+    "SqliteLlmCache",
+]
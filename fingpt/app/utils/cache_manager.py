@@ -4,6 +4,7 @@ from typing import Generic, Optional, TypeVar
 
 import aiofiles
 
+from app.core.metrics import record_cache
 from app.entity.finance_service import CachedReport, StockData
 
 T = TypeVar("T")
@@ -16,8 +17,9 @@ if not os.path.exists(CACHE_DIR):
 
 
 class CacheManager(Generic[T]):
-    def __init__(self, cache_dir: str = CACHE_DIR):
+    def __init__(self, cache_dir: str = CACHE_DIR, name: str = "default"):
         self.cache_dir = cache_dir
+        self.name = name
         self.memory: dict[str, T] = {}
 
     def cache_file_path(self, symbol: str, kind: str) -> str:
@@ -26,9 +28,11 @@ class CacheManager(Generic[T]):
 
     async def load_cache(self, file_path: str) -> Optional[T]:
         if os.path.exists(file_path):
+            record_cache(f"{self.name}_file", True)
             async with aiofiles.open(file_path, "rb") as f:
                 data = await f.read()
                 return pickle.loads(data)
+        record_cache(f"{self.name}_file", False)
         return None
 
     async def save_cache(self, data: T, file_path: str) -> None:
@@ -39,10 +43,12 @@ class CacheManager(Generic[T]):
         self.memory[key] = data
 
     def load_memory(self, key: str) -> Optional[T]:
-        return self.memory.get(key, None)
+        data = self.memory.get(key, None)
+        record_cache(f"{self.name}_memory", data is not None)
+        return data
 
 
-url_cache = CacheManager[str](CACHE_DIR)
-section_cache = CacheManager[str](CACHE_DIR)
-report_cache = CacheManager[CachedReport](CACHE_DIR)
-stock_cache = CacheManager[StockData](CACHE_DIR)
+url_cache = CacheManager[str](CACHE_DIR, "url")
+section_cache = CacheManager[str](CACHE_DIR, "section")
+report_cache = CacheManager[CachedReport](CACHE_DIR, "report")
+stock_cache = CacheManager[StockData](CACHE_DIR, "stock")
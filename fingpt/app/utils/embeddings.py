@@ -0,0 +1,110 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.metrics import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CALL_DURATION,
+    record_cache,
+)
+from app.utils.lru import LruCache
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class _Batch:
+    def __init__(self) -> None:
+        self.texts: list[str] = []
+        self.full = threading.Event()
+        self.vectors: Future[list[list[float]]] = Future()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings with an LRU of the recent vectors, in front of a service.
+
+    Queries that miss the LRU wait up to `max_wait` seconds for concurrent
+    ones and are embedded together, in one `embed_documents` call of at most
+    `max_batch_size` texts. The first query of a batch makes the call from
+    its own thread, the others wait for its result.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_size: int = 4096,
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+    ):
+        self._embeddings = embeddings
+        self._vectors = LruCache[str, list[float]](cache_size)
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self._lock = threading.Lock()
+        self._open: Optional[_Batch] = None
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            return self._embeddings.embed_documents(texts)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            EMBEDDING_CALL_DURATION.labels(status=status).observe(
+                time.perf_counter() - start
+            )
+
+    def _batched(self, text: str) -> list[float]:
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if batch is None:
+                batch = self._open = _Batch()
+            if text in batch.texts:
+                index = batch.texts.index(text)
+            else:
+                index = len(batch.texts)
+                batch.texts.append(text)
+            if len(batch.texts) >= self._max_batch_size:
+                self._open = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self._max_wait)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            try:
+                batch.vectors.set_result(self._embed(batch.texts))
+            except Exception as e:
+                batch.vectors.set_exception(e)
+        return batch.vectors.result()[index]
+
+    def embed_query(self, text: str) -> list[float]:
+        key = _hash(text)
+        vector = self._vectors.get(key)
+        record_cache("embedding", vector is not None)
+        if vector is None:
+            vector = self._batched(text)
+            self._vectors.put(key, vector)
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        # Already a batch, only the texts that miss the LRU are sent.
+        vectors = {text: self._vectors.get(_hash(text)) for text in texts}
+        for vector in vectors.values():
+            record_cache("embedding", vector is not None)
+        missing = [text for text, vector in vectors.items() if vector is None]
+        if missing:
+            for text, vector in zip(missing, self._embed(missing)):
+                vectors[text] = vector
+                self._vectors.put(_hash(text), vector)
+        return [vectors[text] for text in texts]  # type: ignore[misc]
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.utils.embeddings import CachedEmbeddings
+
+
+@pytest.fixture
+def service():
+    return MagicMock(wraps=DeterministicFakeEmbedding(size=4))
+
+
+def _embed_concurrently(embeddings, texts):
+    with ThreadPoolExecutor(len(texts)) as pool:
+        return list(pool.map(embeddings.embed_query, texts))
+
+
+def test_embed_query_serves_repeats_from_the_cache(service):
+    embeddings = CachedEmbeddings(service, max_wait=0)
+
+    first = embeddings.embed_query("AAPL revenue")
+    second = embeddings.embed_query("AAPL revenue")
+
+    assert first == second
+    service.embed_documents.assert_called_once_with(["AAPL revenue"])
+
+
+def test_concurrent_queries_are_embedded_in_one_call(service):
+    embeddings = CachedEmbeddings(service, max_wait=0.2)
+
+    vectors = _embed_concurrently(embeddings, ["a", "b", "c", "a"])
+
+    service.embed_documents.assert_called_once()
+    assert sorted(service.embed_documents.call_args.args[0]) == ["a", "b", "c"]
+    assert vectors == [service.embed_query(text) for text in ["a", "b", "c", "a"]]
+
+
+def test_full_batch_is_sent_without_waiting(service):
+    embeddings = CachedEmbeddings(service, max_batch_size=2, max_wait=10)
+
+    start = time.perf_counter()
+    _embed_concurrently(embeddings, ["a", "b"])
+
+    assert time.perf_counter() - start < 5
+    service.embed_documents.assert_called_once()
+
+
+def test_batch_error_is_raised_to_every_query():
+    service = MagicMock()
+    service.embed_documents.side_effect = RuntimeError("rate limited")
+    embeddings = CachedEmbeddings(service, max_wait=0.2)
+
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(embeddings.embed_query, text) for text in "ab"]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result()
+    service.embed_documents.assert_called_once()
+
+
+def test_embed_documents_only_sends_the_texts_not_cached(service):
+    embeddings = CachedEmbeddings(service, max_wait=0)
+    cached = embeddings.embed_query("a")
+
+    vectors = embeddings.embed_documents(["a", "b"])
+
+    assert vectors[0] == cached
+    service.embed_documents.assert_called_with(["b"])
@@ -0,0 +1,184 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load.dump import dumps
+from langchain_core.load.load import loads
+from langchain_core.runnables.config import run_in_executor
+from loguru import logger
+
+from app.core.metrics import LLM_CACHE_BYTES, LLM_CACHE_EVICTIONS, record_cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_created_at ON llm_cache (created_at);
+CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at);
+CREATE TABLE IF NOT EXISTS llm_cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO llm_cache_size (id, bytes)
+    SELECT 0, COALESCE(SUM(size), 0) FROM llm_cache;
+CREATE TRIGGER IF NOT EXISTS llm_cache_inserted AFTER INSERT ON llm_cache BEGIN
+    UPDATE llm_cache_size SET bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS llm_cache_deleted AFTER DELETE ON llm_cache BEGIN
+    UPDATE llm_cache_size SET bytes = bytes - OLD.size WHERE id = 0;
+END;
+"""
+
+# Hits refresh the LRU position at most this often, so most lookups only read.
+ACCESS_RESOLUTION = 60.0
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """The prompt is the serialized messages, the LLM string has the model
+    config and the call kwargs, the bound tools among them."""
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode()).hexdigest()
+
+
+class SqliteLlmCache(BaseCache):
+    """Exact-match LLM cache in a SQLite file.
+
+    Every worker that opens the same file shares the entries, and they
+    survive restarts. Entries expire `ttl` seconds after they were written.
+    Once the entries take more than `max_bytes`, the least recently used ones
+    are evicted, so the file stays bounded. The running total of the entry
+    sizes is kept by triggers, in the file itself. A database error is
+    logged and served as a miss, it never fails the LLM call.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 86400.0,
+        max_bytes: int = 268435456,
+        busy_timeout_ms: int = 5000,
+    ):
+        self._path = path
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._busy_timeout_ms = busy_timeout_ms
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use, not when the server module is imported.
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.executescript(
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                f"PRAGMA busy_timeout={self._busy_timeout_ms};"
+                f"{SCHEMA}"
+            )
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        now = time.time()
+        try:
+            with self._lock, self._connection() as conn:
+                row = conn.execute(
+                    "SELECT value, created_at, accessed_at FROM llm_cache "
+                    "WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and row[1] < now - self._ttl:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    LLM_CACHE_EVICTIONS.labels(reason="expired").inc()
+                    row = None
+                elif row is not None and row[2] < now - ACCESS_RESOLUTION:
+                    conn.execute(
+                        "UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+                        (now, key),
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            row = None
+        record_cache("llm", row is not None)
+        return loads(row[0]) if row is not None else None
+
+    async def alookup(
+        self,
+        prompt: str,
+        llm_string: str,
+    ) -> Optional[RETURN_VAL_TYPE]:
+        return await run_in_executor(None, self.lookup, prompt, llm_string)
+
+    def update(
+        self,
+        prompt: str,
+        llm_string: str,
+        return_val: RETURN_VAL_TYPE,
+    ) -> None:
+        key = cache_key(prompt, llm_string)
+        value = dumps(list(return_val))
+        size = len(key) + len(value.encode())
+        if size > self._max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._lock, self._connection() as conn:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.execute(
+                    "INSERT INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache update failed: {e}")
+
+    async def aupdate(
+        self,
+        prompt: str,
+        llm_string: str,
+        return_val: RETURN_VAL_TYPE,
+    ) -> None:
+        await run_in_executor(None, self.update, prompt, llm_string, return_val)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        expired = conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (now - self._ttl,)
+        ).rowcount
+        if expired:
+            LLM_CACHE_EVICTIONS.labels(reason="expired").inc(expired)
+        (total,) = conn.execute("SELECT bytes FROM llm_cache_size").fetchone()
+        excess = total - self._max_bytes
+        if excess > 0:
+            evicted = []
+            for key, size in conn.execute(
+                "SELECT key, size FROM llm_cache ORDER BY accessed_at"
+            ):
+                evicted.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", evicted)
+            LLM_CACHE_EVICTIONS.labels(reason="size").inc(len(evicted))
+            (total,) = conn.execute("SELECT bytes FROM llm_cache_size").fetchone()
+        LLM_CACHE_BYTES.set(total)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock, self._connection() as conn:
+            conn.execute("DELETE FROM llm_cache")
+        LLM_CACHE_BYTES.set(0)
+
+    async def aclear(self, **kwargs: Any) -> None:
+        await run_in_executor(None, self.clear, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
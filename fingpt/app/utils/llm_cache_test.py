@@ -0,0 +1,130 @@
+from itertools import cycle
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+from prometheus_client import REGISTRY
+
+from app.utils.llm_cache import SqliteLlmCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(mocker):
+    clock = Clock()
+    mocker.patch("app.utils.llm_cache.time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SqliteLlmCache(str(tmp_path / "llm_cache.db"), ttl=3600, max_bytes=10**6)
+    yield cache
+    cache.close()
+
+
+def _generation(content="AAPL"):
+    message = AIMessage(
+        content,
+        tool_calls=[{"name": "report", "args": {"ticker": content}, "id": "1"}],
+    )
+    return [ChatGeneration(message=message)]
+
+
+def test_lookup_returns_cached_generations(cache):
+    cache.update("prompt", "llm", _generation())
+
+    [generation] = cache.lookup("prompt", "llm")
+
+    assert generation.message.content == "AAPL"
+    assert generation.message.tool_calls[0]["args"] == {"ticker": "AAPL"}
+    assert cache.lookup("prompt", "other llm") is None
+    assert cache.lookup("other prompt", "llm") is None
+
+
+def test_entries_are_shared_through_the_file(tmp_path, cache):
+    cache.update("prompt", "llm", _generation())
+    other_worker = SqliteLlmCache(str(tmp_path / "llm_cache.db"))
+
+    assert other_worker.lookup("prompt", "llm")[0].message.content == "AAPL"
+    other_worker.close()
+
+
+def test_entries_expire_after_ttl(clock, cache):
+    cache.update("prompt", "llm", _generation())
+    clock.now += 3599
+    assert cache.lookup("prompt", "llm") is not None
+
+    clock.now += 2
+    assert cache.lookup("prompt", "llm") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    probe = SqliteLlmCache(":memory:", max_bytes=10**6)
+    probe.update("0", "llm", _generation())
+    (size,) = probe._connection().execute("SELECT size FROM llm_cache").fetchone()
+    cache = SqliteLlmCache(":memory:", max_bytes=int(size * 3.5))
+    evictions = REGISTRY.get_sample_value(
+        "fingpt_llm_cache_evictions_total", {"reason": "size"}
+    )
+
+    for prompt in "abc":
+        cache.update(prompt, "llm", _generation())
+        clock.now += 100
+    cache.lookup("a", "llm")
+    clock.now += 100
+    cache.update("d", "llm", _generation())
+
+    assert cache.lookup("b", "llm") is None
+    assert all(cache.lookup(prompt, "llm") for prompt in "acd")
+    assert (
+        REGISTRY.get_sample_value(
+            "fingpt_llm_cache_evictions_total", {"reason": "size"}
+        )
+        == (evictions or 0) + 1
+    )
+    assert REGISTRY.get_sample_value("fingpt_llm_cache_bytes") <= size * 3.5
+
+
+def test_entries_larger_than_the_budget_are_not_cached():
+    cache = SqliteLlmCache(":memory:", max_bytes=100)
+
+    cache.update("prompt", "llm", _generation("x" * 200))
+
+    assert cache.lookup("prompt", "llm") is None
+
+
+async def test_chat_model_reuses_cached_answer(cache):
+    hits = REGISTRY.get_sample_value(
+        "fingpt_cache_requests_total", {"cache": "llm", "result": "hit"}
+    )
+    model = GenericFakeChatModel(
+        messages=cycle([AIMessage("first"), AIMessage("second")]), cache=cache
+    )
+
+    first = await model.ainvoke("Analyze AAPL")
+    second = await model.ainvoke("Analyze AAPL")
+
+    assert first.content == second.content == "first"
+    assert (
+        REGISTRY.get_sample_value(
+            "fingpt_cache_requests_total", {"cache": "llm", "result": "hit"}
+        )
+        == (hits or 0) + 1
+    )
+
+
+async def test_aclear_removes_entries(cache):
+    await cache.aupdate("prompt", "llm", _generation())
+
+    await cache.aclear()
+
+    assert await cache.alookup("prompt", "llm") is None
@@ -0,0 +1,21 @@
+from app.utils.lru import LruCache
+
+
+def test_evicts_least_recently_used():
+    cache = LruCache[str, int](2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_zero_size_keeps_nothing():
+    cache = LruCache[str, int](0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
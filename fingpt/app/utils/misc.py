@@ -26,6 +26,15 @@ def read_yaml(clazz: Type[T], file_path: str) -> T:
     return clazz(**_config)
 
 
+def filter_disabled_choices(response: ChatRespDto) -> ChatRespDto:
+    if response.action == ChatRespAction.SHOW_CHOICES:
+        # Filter out disabled choices instead of sorting
+        response.metadata.choices = [
+            choice for choice in response.metadata.choices if choice.is_enabled
+        ]
+    return response
+
+
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(
         self,
@@ -57,6 +66,9 @@ class ResponseSortingMiddleware(BaseHTTPMiddleware):
         call_next: Any,
     ):
         response = await call_next(request)
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            # Server-sent events must reach the client as they are produced.
+            return response
         response_body = b""
         async for chunk in response.body_iterator:
             response_body += chunk
@@ -66,13 +78,7 @@ class ResponseSortingMiddleware(BaseHTTPMiddleware):
             response_json = json.loads(decoded_body)
             reverted_response = ChatRespDto(**response_json)
             if reverted_response.action == ChatRespAction.SHOW_CHOICES:
-                # Filter out disabled choices instead of sorting
-                reverted_response.metadata.choices = [
-                    choice
-                    for choice in reverted_response.metadata.choices
-                    if choice.is_enabled
-                ]
-                response_json = reverted_response.model_dump()
+                response_json = filter_disabled_choices(reverted_response).model_dump()
             modified_response = json.dumps(response_json).encode("utf-8")
             response.headers["Content-Length"] = str(len(modified_response))
             return Response(
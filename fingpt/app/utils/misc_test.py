@@ -174,3 +174,23 @@ async def test_response_sorting_html_middleware():
 
     # Check that the response is modified
     assert response.body.decode("utf-8") == response_data
+
+
+@pytest.mark.asyncio
+async def test_response_sorting_skips_event_stream():
+    request = Request(
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/test",
+            "headers": [],
+        }
+    )
+    middleware = ResponseSortingMiddleware(app=None)
+    mock_response = MagicMock()
+    mock_response.headers = {"content-type": "text/event-stream; charset=utf-8"}
+    call_next = AsyncMock(return_value=mock_response)
+
+    response = await middleware.dispatch(request, call_next)
+
+    assert response is mock_response
@@ -6,14 +6,16 @@ from typing import Any, List, Optional
 
 from langchain_chroma.vectorstores import Chroma
 from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.embeddings import Embeddings
 from langchain_core.load.dump import dumps
 from langchain_core.load.load import loads
 from langchain_core.messages import ToolMessage
 from langchain_core.outputs import Generation
 from langchain_core.runnables.config import run_in_executor
-from langchain_openai.embeddings import AzureOpenAIEmbeddings
 
 from app.core.context import RequestContext
+from app.core.metrics import record_cache
+from app.utils.lru import LruCache
 
 
 def _hash(_input: str) -> str:
@@ -22,12 +24,22 @@ def _hash(_input: str) -> str:
 
 
 class SemanticCache(BaseCache):
+    """Answers conversations similar to ones already answered.
+
+    An in-process tier keyed by the hash of the conversation is checked
+    first, the embeddings and the vector store are only queried when it
+    misses. Both it and the parsed conversations of the recent prompts are
+    bounded LRUs.
+    """
+
     def __init__(
         self,
         vector_store_srv: Chroma,
-        emb_srv: AzureOpenAIEmbeddings,
+        emb_srv: Embeddings,
         cache_type: List[str] = ["message", "tool_call", "tool_message"],
         score_threshold: float = 0.5,
+        exact_size: int = 1024,
+        conversation_size: int = 1024,
     ) -> None:
         self._vector_store = vector_store_srv
         self._emb_srv = emb_srv
@@ -39,6 +51,10 @@ class SemanticCache(BaseCache):
         self.sigma = 1.0
         self.epsilon = 1e-10
         self.cache_type = cache_type
+        # Serialized return values by conversation hash.
+        self._exact = LruCache[str, str](exact_size)
+        # Conversations by prompt hash.
+        self._conversations = LruCache[str, str](conversation_size)
 
     def _update_sigma(self, score: float):
         self.min_score = min(self.min_score, score)
@@ -56,9 +72,15 @@ class SemanticCache(BaseCache):
         prompt: str,
         llm_string: str,
     ) -> Optional[RETURN_VAL_TYPE]:
+        conversation = self._conversation(prompt)
+        key = _hash(conversation)
+        exact = self._exact.get(key)
+        record_cache("semantic_exact", exact is not None)
+        if exact is not None:
+            return self._generations(exact)
 
         results = self._vector_store.similarity_search_with_score(
-            query=self._conversation(prompt),
+            query=conversation,
             k=1,
         )
         generations: list[Generation] = []
@@ -74,20 +96,27 @@ class SemanticCache(BaseCache):
                 )
                 self._logger.debug(f"Confidence score: {confidence_score}")
 
-                generation = loads(document.metadata["return_val"])
-                generation[0]["message"]["response_metadata"]["token_usage"][
-                    "total_tokens"
-                ] = 0
-                generation[0]["message"]["usage_metadata"]["total_tokens"] = 0
+                generation = self._generations(document.metadata["return_val"])
+                # Answers stored by another worker or before a restart.
+                if document.metadata.get("conversation") == conversation:
+                    self._exact.put(key, document.metadata["return_val"])
             if generation:
                 generations.extend(generation)
 
+        record_cache("semantic", bool(generations))
         return generations if generations else None
 
+    def _generations(self, return_val: str) -> RETURN_VAL_TYPE:
+        generation = loads(return_val)
+        generation[0]["message"]["response_metadata"]["token_usage"]["total_tokens"] = 0
+        generation[0]["message"]["usage_metadata"]["total_tokens"] = 0
+        return generation
+
     async def alookup(self, prompt: str, llm_string: str):
         return await run_in_executor(None, self.lookup, prompt, llm_string)
 
     def clear(self, **kwargs: Any) -> None:
+        self._exact.clear()
         return self._vector_store.delete_collection()
 
     async def aclear(self, **kwargs: Any) -> None:
@@ -121,6 +150,7 @@ class SemanticCache(BaseCache):
                         metadatas=[metadata],
                         ids=[_hash(conversation)],
                     )
+                    self._exact.put(_hash(conversation), metadata["return_val"])
                 else:
                     self._logger.info("Not cache empty conversation")
                     pass
@@ -134,6 +164,14 @@ class SemanticCache(BaseCache):
         await run_in_executor(None, self.update, prompt, llm_string, return_val)
 
     def _conversation(self, prompt: str) -> str:
+        key = _hash(prompt)
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            conversation = self._parse_conversation(prompt)
+            self._conversations.put(key, conversation)
+        return conversation
+
+    def _parse_conversation(self, prompt: str) -> str:
         conversation = ""
         load_prompt = loads(prompt)
         if len(load_prompt) > 10:
@@ -3,7 +3,7 @@ from unittest.mock import MagicMock, Mock
 import pytest
 
 from app.core.context import RequestContext
-from app.utils.semantic_cache import SemanticCache
+from app.utils.semantic_cache import SemanticCache, _hash
 
 
 @pytest.fixture
@@ -65,6 +65,20 @@ def test_conversation(semantic_cache):
     assert result == "\n- HUMAN: test question\n- SYSTEM: test answer"
 
 
+def test_conversation_is_parsed_once(semantic_cache, mocker):
+    parse = mocker.spy(semantic_cache, "_parse_conversation")
+    prompt = (
+        '[{"lc": 1, "type": "constructor", "id": ["langchain", "schema", "messages", "SystemMessage"], '
+        '"kwargs": {"content": "test prompt", "type": "system"}},'
+        '{"lc": 1, "type": "constructor", "id": ["langchain", "schema", "messages", "HumanMessage"], '
+        '"kwargs": {"content": "test question", "type": "human"}}]'
+    )
+
+    assert semantic_cache._conversation(prompt) == "\n- HUMAN: test question"
+    assert semantic_cache._conversation(prompt) == "\n- HUMAN: test question"
+    parse.assert_called_once()
+
+
 @pytest.fixture
 def setup_semantic_cache():
     vector_store_mock = MagicMock()
@@ -104,6 +118,50 @@ async def test_alookup(setup_semantic_cache):
     assert result[0]["message"]["usage_metadata"]["total_tokens"] == 0
 
 
+@pytest.mark.asyncio
+async def test_alookup_serves_repeats_from_the_exact_tier(setup_semantic_cache):
+    instance, mock_vector_store = setup_semantic_cache
+    mock_document = MagicMock()
+    mock_document.metadata = {
+        "conversation": "mocked_conversation",
+        "return_val": (
+            '[{"message": {"content": "value", '
+            '"response_metadata": {"token_usage": {"total_tokens": 10}}, '
+            '"usage_metadata": {"total_tokens": 10}}}]'
+        ),
+    }
+    mock_vector_store.similarity_search_with_score.return_value = [(mock_document, 0.3)]
+    instance._distance_to_confidence = MagicMock(return_value=0.6)
+
+    first = await instance.alookup("test prompt", "llm_string")
+    second = await instance.alookup("test prompt", "llm_string")
+
+    assert second == first
+    assert second[0]["message"]["usage_metadata"]["total_tokens"] == 0
+    mock_vector_store.similarity_search_with_score.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_alookup_does_not_promote_similar_conversations(setup_semantic_cache):
+    instance, mock_vector_store = setup_semantic_cache
+    mock_document = MagicMock()
+    mock_document.metadata = {
+        "conversation": "another_conversation",
+        "return_val": (
+            '[{"message": {"content": "value", '
+            '"response_metadata": {"token_usage": {"total_tokens": 10}}, '
+            '"usage_metadata": {"total_tokens": 10}}}]'
+        ),
+    }
+    mock_vector_store.similarity_search_with_score.return_value = [(mock_document, 0.3)]
+    instance._distance_to_confidence = MagicMock(return_value=0.6)
+
+    await instance.alookup("test prompt", "llm_string")
+    await instance.alookup("test prompt", "llm_string")
+
+    assert mock_vector_store.similarity_search_with_score.call_count == 2
+
+
 class MockGeneration:
     def __init__(self, message_content, tool_calls=None):
         self.message = MagicMock()
@@ -133,6 +191,7 @@ async def test_update_without_tool_calls(setup_semantic_cache):
 
     # Assertions
     mock_vector_store.add_texts.assert_called_once()
+    assert instance._exact.get(_hash("mocked_conversation")) is not None
 
 
 def test_check_if_list(semantic_cache):
@@ -7,6 +7,8 @@ from unittest.mock import AsyncMock, MagicMock
 import pytest
 import sentry_sdk
 from aioresponses import aioresponses
+from langchain_core.caches import InMemoryCache
+from langchain_core.globals import set_llm_cache
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import AzureChatOpenAI
 from langfuse.model import ChatMessageDict
@@ -32,6 +34,9 @@ from app.prompt.prompt_service import PromptService
 @pytest.fixture(scope="session", autouse=True)
 def setup():
     sentry_sdk.init(dsn="")
+    # The server sets the persistent LLM cache on import, answers cached by a
+    # previous run must not leak into the tests.
+    set_llm_cache(InMemoryCache())
 
 
 @pytest.fixture
@@ -4,6 +4,7 @@ from typing import Any, Awaitable, Callable
 from langchain_openai import AzureChatOpenAI
 
 from app.core.context import RequestContext
+from app.llm.model_routing import model_tier_override
 from app.prompt.prompt_module import PromptModule
 
 module = PromptModule()
@@ -25,10 +26,12 @@ async def generic_agent_router(
         prompt_label,
     )
 
-    result = await agent.ainvoke(
-        {"messages": messages},
-        temperature=0.0,
-    )
+    # A provider config with a `tier` evaluates the prompt on that model tier.
+    with model_tier_override(options.get("config", {}).get("tier")):
+        result = await agent.ainvoke(
+            {"messages": messages},
+            temperature=0.0,
+        )
 
     return {
         "output": {
@@ -64,9 +67,13 @@ async def common_call_api(
     logger.info(f"Prompt: {prompt}")
     prompt_name, prompt_label = prompt.split(":")
 
-    response = await call_model_func(
-        state=state, config=config, prompt_name=prompt_name, prompt_label=prompt_label
-    )
+    with model_tier_override(options.get("config", {}).get("tier")):
+        response = await call_model_func(
+            state=state,
+            config=config,
+            prompt_name=prompt_name,
+            prompt_label=prompt_label,
+        )
 
     logger.info(f"call model response {response.get('messages')[-1]}")
     result = response.get("messages")[-1]
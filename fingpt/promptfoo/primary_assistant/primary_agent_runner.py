@@ -3,6 +3,7 @@ from typing import Any
 
 from app.assistant_v2.primary.assistant import Assistant
 from app.core.context import RequestContext
+from app.llm.model_routing import model_tier_override
 from app.prompt.prompt_module import PromptModule
 
 module = PromptModule()
@@ -26,12 +27,13 @@ async def call_api(
     )
 
     start = timeit.default_timer()
-    result = await agent.ainvoke(
-        {
-            "messages": messages,
-        },
-        temperature=0.01,
-    )
+    with model_tier_override(options.get("config", {}).get("tier")):
+        result = await agent.ainvoke(
+            {
+                "messages": messages,
+            },
+            temperature=0.01,
+        )
     stop = timeit.default_timer()
 
     return {